@@ -0,0 +1,22 @@
+from django.contrib import admin
+from .models import GenerationJob, LLMTrace
+
+@admin.register(GenerationJob)
+class GenerationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'user', 'status', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    search_fields = ('user__username', 'error')
+    readonly_fields = ('created_at', 'updated_at', 'finished_at', 'locked_by', 'locked_at')
+
+
+@admin.register(LLMTrace)
+class LLMTraceAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'task', 'model', 'status', 'cache', 'latency_ms', 'ttft_ms', 'retrieval_ms',
+                    'prompt_tokens', 'completion_tokens')
+    list_filter = ('task', 'status', 'cache', 'model')
+    search_fields = ('name', 'model', 'error')
+    date_hierarchy = 'created_at'
+    readonly_fields = [field.name for field in LLMTrace._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
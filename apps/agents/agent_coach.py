@@ -2,35 +2,52 @@
 
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
-from apps.agents.tools.llm_loader import get_llm
-from langchain_community.vectorstores import Chroma
-from apps.rag.utils import load_embedding_function
-from apps.agents.utils import load_prompt, parse_text_quiz
-import json
+from apps.agents.tools.context_packing import is_context_packing_enabled, pack_documents
+from apps.agents.tools.model_router import get_context_budget, get_task_llm, task_route_key, track_routes
+from apps.agents.tools.response_cache import cached_generation, get_cached, store_cached
+from apps.agents.tools.streaming import stream_chain, astream_chain
+from apps.agents.tools.telemetry import note_cache
+from apps.rag.utils import get_vectorstore
+from apps.agents.tools.json_extract import extract_json_object, loads_tolerant
+from apps.agents.utils import load_prompt, parse_text_quiz, QuizStreamParser
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
+import asyncio
+import contextvars
+import os
+import queue
 import random
+import re
+import threading
 
-def get_coach_chain(model_name="meta-llama/llama-4-scout-17b-16e-instruct"):
+QUIZ_EXCLUSIONS_TEMPLATE = """
+
+⛔ The quiz already contains the questions below. Do not repeat or rephrase them,
+write {num_questions} NEW questions:
+{excluded_questions}
+"""
+
+def get_coach_chain(model_name=None, with_exclusions=False, streaming=False):
     """
     AI Coach Agent: generates MCQs and exercises from a given topic.
+    With with_exclusions=True, the prompt also takes the questions not to repeat.
+    Without model_name, each call is routed to the model serving the "quiz" task.
     """
-    llm = get_llm(model_name=model_name)
+    llm = get_task_llm("quiz", streaming=streaming, model_name=model_name)
     
     # Prompt for generating MCQs
+    input_variables = ["topic", "num_questions", "language"]
+    template = load_prompt("coach")
+    if with_exclusions:
+        input_variables.append("excluded_questions")
+        template += QUIZ_EXCLUSIONS_TEMPLATE
     quiz_prompt = PromptTemplate(
-        input_variables=["topic", "num_questions", "language"],
-        template=load_prompt("coach")
+        input_variables=input_variables,
+        template=template
     )
     return LLMChain(llm=llm, prompt=quiz_prompt)
 
-def get_code_exercise_chain(model_name="meta-llama/llama-4-scout-17b-16e-instruct"):
-    """
-    AI Coach Agent: generates code completion exercises.
-    """
-    llm = get_llm(model_name=model_name)
-    
-    code_prompt = PromptTemplate(
-        input_variables=["topic"],
-        template="""
+CODE_EXERCISE_TEMPLATE = """
 You are a programming expert who creates code exercises.
 
 TOPIC: {topic}
@@ -56,26 +73,332 @@ RESPONSE FORMAT (strict JSON):
 
 Respond ONLY with JSON, no additional text.
 """
+
+def get_code_exercise_chain(model_name=None):
+    """
+    AI Coach Agent: generates code completion exercises.
+    """
+    llm = get_task_llm("exercise", model_name=model_name)
+    
+    code_prompt = PromptTemplate(
+        input_variables=["topic"],
+        template=CODE_EXERCISE_TEMPLATE
     )
     
     return LLMChain(llm=llm, prompt=code_prompt)
 
-def generate_quiz(topic, num_questions=5, language="fr"):
+def _format_exclusions(questions):
+    """First line of each question, enough for the model to avoid it"""
+    return "\n".join(f"- {question['question'].strip().splitlines()[0][:120]}" for question in questions)
+
+def _run_quiz_batch(topic, num_questions, language, exclude=None):
+    """
+    Runs the coach chain once, returns the parsed questions (possibly none).
+    Errors of the model call (provider down, admission...) are raised to the caller.
+    """
+    inputs = {"topic": topic, "num_questions": num_questions, "language": language}
+    if exclude:
+        inputs["excluded_questions"] = _format_exclusions(exclude)
+    chain = get_coach_chain(with_exclusions=bool(exclude))
+    result = chain.run(**inputs)
     try:
-        chain = get_coach_chain()
-        result = chain.run(
-            topic=topic,
-            num_questions=num_questions,
-            language=language
-        )
-        print("🧠 Raw model output:", result)
-
-        quiz_data = parse_text_quiz(result)
-        if quiz_data and quiz_data.get("questions"):
-            return quiz_data
+        return parse_text_quiz(result)["questions"]
+    except (TypeError, ValueError, KeyError, IndexError) as e:
+        print(f"❌ Unreadable quiz output: {e}")
+    return []
 
-    except Exception as e:
-        print(f"❌ Quiz generation failed: {e}")
+def _split_batches(total, batch_size):
+    """Ex: _split_batches(12, 5) => [5, 5, 2]"""
+    return [min(batch_size, total - start) for start in range(0, total, batch_size)]
+
+def _batch_topic(topic, index, count):
+    """Steers parallel batches towards different questions"""
+    return (f"{topic} (question set {index + 1} of {count}: cover different sub-topics "
+            f"and question types than the other sets)")
+
+def _normalize_question(question):
+    text = question["question"] + " " + " ".join(question["options"])
+    return re.sub(r"\W+", " ", text.lower()).strip()
+
+def _is_duplicate(normalized, seen, threshold=0.9):
+    for other in seen:
+        matcher = SequenceMatcher(None, normalized, other)
+        # Cheap upper bounds first, full ratio only for close candidates
+        if matcher.real_quick_ratio() >= threshold and matcher.quick_ratio() >= threshold \
+                and matcher.ratio() >= threshold:
+            return True
+    return False
+
+def dedupe_questions(questions, threshold=0.9):
+    """Drops questions nearly identical (text and options) to an earlier one"""
+    kept = []
+    seen = []
+    for question in questions:
+        normalized = _normalize_question(question)
+        if not _is_duplicate(normalized, seen, threshold):
+            kept.append(question)
+            seen.append(normalized)
+    return kept
+
+def _generate_questions(topic, num_questions, language, exclude=None):
+    """
+    Large requests are split into batches of AI_QUIZ_BATCH_SIZE questions generated
+    concurrently (at most AI_QUIZ_MAX_PARALLEL at a time), then merged:
+    wall-clock time stays close to that of a single batch.
+    """
+    batch_size = max(1, int(os.getenv("AI_QUIZ_BATCH_SIZE", "5")))
+    max_parallel = max(1, int(os.getenv("AI_QUIZ_MAX_PARALLEL", "4")))
+    batches = _split_batches(num_questions, batch_size)
+
+    if len(batches) <= 1:
+        return _run_quiz_batch(topic, num_questions, language, exclude)
+
+    print(f"🧩 Generating {num_questions} questions in {len(batches)} parallel batches")
+    with ThreadPoolExecutor(max_workers=min(max_parallel, len(batches)), thread_name_prefix="quiz-batch") as pool:
+        # Each batch in a copy of the caller's context, so its calls are tracked (track_routes)
+        futures = [
+            pool.submit(contextvars.copy_context().run, _run_quiz_batch,
+                        _batch_topic(topic, i, len(batches)), size, language, exclude)
+            for i, size in enumerate(batches)
+        ]
+        return [question for future in futures for question in future.result()]
+
+def _run_quiz_chain(topic, num_questions, language):
+    """
+    Runs the coach chain, returns parsed quiz data or None.
+    Questions are deduplicated; if some blocks were malformed or duplicated, only the
+    missing count is requested again (excluding the accepted questions), at most
+    AI_QUIZ_TOPUP_RETRIES times.
+    """
+    # List order is the question numbering
+    questions = dedupe_questions(_generate_questions(topic, num_questions, language))[:num_questions]
+
+    max_topups = max(0, int(os.getenv("AI_QUIZ_TOPUP_RETRIES", "2")))
+    topups = 0
+    # Nothing accepted at all means the model is failing: don't insist
+    while questions and len(questions) < num_questions and topups < max_topups:
+        topups += 1
+        missing = num_questions - len(questions)
+        print(f"🩹 Quiz short by {missing} question(s), top-up {topups}/{max_topups}")
+        extra = _generate_questions(topic, missing, language, exclude=questions)
+        questions = dedupe_questions(questions + extra)[:num_questions]
+
+    if questions:
+        return {"questions": questions}
+    return None
+
+def _stream_quiz_batch(topic, num_questions, language, exclude, cancel_event, output):
+    """Streams one coach call, putting each question into `output` as soon as it is parsed"""
+    inputs = {"topic": topic, "num_questions": num_questions, "language": language}
+    if exclude:
+        inputs["excluded_questions"] = _format_exclusions(exclude)
+    chain = get_coach_chain(with_exclusions=bool(exclude), streaming=True)
+    parser = QuizStreamParser()
+    streamed = False
+    for event, data in stream_chain(chain, inputs, cancel_event):
+        if event == 'token':
+            streamed = True
+            for question in parser.feed(data):
+                output.put(question)
+        elif event == 'result' and not streamed:
+            # The model did not stream: parse the whole output at once
+            for question in parser.feed(data.get('text', '')):
+                output.put(question)
+    for question in parser.close():
+        output.put(question)
+
+def _stream_questions(topic, num_questions, language, exclude=None):
+    """
+    Streaming variant of _generate_questions: yields questions (not deduplicated)
+    as soon as any batch completes one. Closing the generator cancels the batches.
+    """
+    batch_size = max(1, int(os.getenv("AI_QUIZ_BATCH_SIZE", "5")))
+    max_parallel = max(1, int(os.getenv("AI_QUIZ_MAX_PARALLEL", "4")))
+    batches = _split_batches(num_questions, batch_size)
+    output = queue.Queue()
+    cancel_event = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=min(max_parallel, len(batches)), thread_name_prefix="quiz-stream")
+
+    def run(batch_topic, size):
+        try:
+            if not cancel_event.is_set():
+                _stream_quiz_batch(batch_topic, size, language, exclude, cancel_event, output)
+        except Exception as e:
+            print(f"❌ Quiz batch failed: {e}")
+        finally:
+            output.put(None)
+
+    for i, size in enumerate(batches):
+        batch_topic = topic if len(batches) == 1 else _batch_topic(topic, i, len(batches))
+        pool.submit(contextvars.copy_context().run, run, batch_topic, size)
+
+    try:
+        remaining = len(batches)
+        while remaining:
+            question = output.get()
+            if question is None:
+                remaining -= 1
+            else:
+                yield question
+    finally:
+        cancel_event.set()
+        pool.shutdown(wait=False)
+
+def _quiz_cache_args(topic, num_questions, language):
+    return ("quiz", task_route_key("quiz"), load_prompt("coach"),
+            {"topic": topic, "num_questions": num_questions, "language": language})
+
+def stream_quiz(topic, num_questions=5, language="fr", use_cache=True):
+    """
+    Streaming variant of generate_quiz: yields each question as soon as it is generated,
+    deduplicated and topped up like generate_quiz. The complete quiz is stored in the
+    response cache, and served from it when already there.
+    """
+    cache_args = _quiz_cache_args(topic, num_questions, language)
+    cached = get_cached(*cache_args) if use_cache else None
+    if use_cache:
+        note_cache("response", "hit" if cached else "miss")
+    if cached:
+        print("⚡ Response cache hit (quiz)")
+        yield from cached["questions"]
+        return
+
+    accepted = []
+    seen = []
+    max_topups = max(0, int(os.getenv("AI_QUIZ_TOPUP_RETRIES", "2")))
+    attempt = 0
+    with track_routes() as served:
+        while len(accepted) < num_questions and attempt <= max_topups:
+            if attempt and not accepted:
+                # Nothing accepted at all means the model is failing: don't insist
+                break
+            if attempt:
+                print(f"🩹 Quiz short by {num_questions - len(accepted)} question(s), top-up {attempt}/{max_topups}")
+            questions = _stream_questions(topic, num_questions - len(accepted), language, exclude=list(accepted) or None)
+            try:
+                for question in questions:
+                    normalized = _normalize_question(question)
+                    if _is_duplicate(normalized, seen):
+                        continue
+                    accepted.append(question)
+                    seen.append(normalized)
+                    yield question
+                    if len(accepted) == num_questions:
+                        break
+            finally:
+                questions.close()
+            attempt += 1
+
+    if use_cache and accepted:
+        store_cached(*cache_args, {"questions": accepted}, served)
+
+async def _astream_quiz_batch(topic, num_questions, language, exclude, output):
+    """Async variant of _stream_quiz_batch, putting questions into an asyncio.Queue"""
+    inputs = {"topic": topic, "num_questions": num_questions, "language": language}
+    if exclude:
+        inputs["excluded_questions"] = _format_exclusions(exclude)
+    chain = get_coach_chain(with_exclusions=bool(exclude), streaming=True)
+    parser = QuizStreamParser()
+    streamed = False
+    async for event, data in astream_chain(chain, inputs):
+        if event == 'token':
+            streamed = True
+            for question in parser.feed(data):
+                output.put_nowait(question)
+        elif event == 'result' and not streamed and data:
+            for question in parser.feed(data.get('text', '')):
+                output.put_nowait(question)
+    for question in parser.close():
+        output.put_nowait(question)
+
+async def _astream_questions(topic, num_questions, language, exclude=None):
+    """
+    Async variant of _stream_questions: batches run as tasks on the event loop
+    (at most AI_QUIZ_MAX_PARALLEL at a time) instead of worker threads.
+    """
+    batch_size = max(1, int(os.getenv("AI_QUIZ_BATCH_SIZE", "5")))
+    max_parallel = max(1, int(os.getenv("AI_QUIZ_MAX_PARALLEL", "4")))
+    batches = _split_batches(num_questions, batch_size)
+    output = asyncio.Queue()
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def run(batch_topic, size):
+        try:
+            async with semaphore:
+                await _astream_quiz_batch(batch_topic, size, language, exclude, output)
+        except Exception as e:
+            print(f"❌ Quiz batch failed: {e}")
+        finally:
+            output.put_nowait(None)
+
+    tasks = [
+        asyncio.create_task(run(topic if len(batches) == 1 else _batch_topic(topic, i, len(batches)), size))
+        for i, size in enumerate(batches)
+    ]
+    try:
+        remaining = len(batches)
+        while remaining:
+            question = await output.get()
+            if question is None:
+                remaining -= 1
+            else:
+                yield question
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def astream_quiz(topic, num_questions=5, language="fr", use_cache=True):
+    """Async variant of stream_quiz (same deduplication, top-ups and caching)"""
+    cache_args = _quiz_cache_args(topic, num_questions, language)
+    cached = await asyncio.to_thread(get_cached, *cache_args) if use_cache else None
+    if use_cache:
+        note_cache("response", "hit" if cached else "miss")
+    if cached:
+        print("⚡ Response cache hit (quiz)")
+        for question in cached["questions"]:
+            yield question
+        return
+
+    accepted = []
+    seen = []
+    max_topups = max(0, int(os.getenv("AI_QUIZ_TOPUP_RETRIES", "2")))
+    attempt = 0
+    with track_routes() as served:
+        while len(accepted) < num_questions and attempt <= max_topups:
+            if attempt and not accepted:
+                break
+            if attempt:
+                print(f"🩹 Quiz short by {num_questions - len(accepted)} question(s), top-up {attempt}/{max_topups}")
+            questions = _astream_questions(topic, num_questions - len(accepted), language, exclude=list(accepted) or None)
+            try:
+                async for question in questions:
+                    normalized = _normalize_question(question)
+                    if _is_duplicate(normalized, seen):
+                        continue
+                    accepted.append(question)
+                    seen.append(normalized)
+                    yield question
+                    if len(accepted) == num_questions:
+                        break
+            finally:
+                await questions.aclose()
+            attempt += 1
+
+    if use_cache and accepted:
+        await asyncio.to_thread(store_cached, *cache_args, {"questions": accepted}, served)
+
+def generate_quiz_questions(topic, num_questions=5, language="fr", use_cache=True):
+    """Quiz data {"questions": [...]} through the response cache, or None if generation failed"""
+    return cached_generation(
+        *_quiz_cache_args(topic, num_questions, language),
+        lambda: _run_quiz_chain(topic, num_questions, language),
+        use_cache=use_cache
+    )
+
+def generate_quiz(topic, num_questions=5, language="fr", use_cache=True):
+    quiz_data = generate_quiz_questions(topic, num_questions, language, use_cache=use_cache)
+    if quiz_data:
+        return quiz_data
 
     # Fallback with language support
     fallback_text = {
@@ -104,25 +427,168 @@ def generate_quiz(topic, num_questions=5, language="fr"):
         ]
     }
 
-def generate_code_exercise(topic):
+# === Exercise generation service ===
+# The model is asked for a JSON object (provider JSON mode), parsed tolerantly,
+# validated, and sent back once for a targeted repair if still unusable.
+
+EXERCISE_FIELDS = ("title", "description", "starter_code", "solution", "tests")
+
+_exercise_stats_lock = threading.Lock()
+_exercise_stats = {
+    'direct': 0,     # Valid JSON as returned
+    'extracted': 0,  # Needed the tolerant extractor (prose, fences, truncation...)
+    'repaired': 0,   # Needed the repair retry
+    'failed': 0,     # Unusable even after repair
+    'errors': 0,     # LLM call failed
+}
+
+def _count_exercise_path(path):
+    with _exercise_stats_lock:
+        _exercise_stats[path] += 1
+
+def get_exercise_generation_stats():
+    """How often each exercise parsing path is taken"""
+    with _exercise_stats_lock:
+        return dict(_exercise_stats)
+
+def _clean_code(code):
+    # Some models double-escape line breaks inside JSON strings
+    if "\n" not in code and "\\n" in code:
+        code = code.replace("\\n", "\n").replace("\\t", "\t")
+    return code.strip()
+
+def validate_exercise(data):
+    """Returns (exercise, problem): a normalized exercise dict, or None and what is wrong"""
+    if not isinstance(data, dict):
+        return None, "the answer is not a JSON object"
+    missing = [field for field in EXERCISE_FIELDS if not data.get(field)]
+    if missing:
+        return None, f"missing or empty fields: {', '.join(missing)}"
+    for field in EXERCISE_FIELDS[:4]:
+        if not isinstance(data[field], str):
+            return None, f'"{field}" must be a string'
+    tests = [
+        {"input": str(test["input"]), "expected": str(test["expected"])}
+        for test in data["tests"] if isinstance(test, dict) and "input" in test and "expected" in test
+    ] if isinstance(data["tests"], list) else []
+    if not tests:
+        return None, '"tests" must be a non-empty list of {"input", "expected"} objects'
+    return {
+        "title": data["title"].strip(),
+        "description": data["description"].strip(),
+        "starter_code": _clean_code(data["starter_code"]),
+        "solution": _clean_code(data["solution"]),
+        "tests": tests,
+    }, None
+
+def _parse_exercise(text):
+    """Returns (exercise, path, problem) with path 'direct' or 'extracted'"""
+    try:
+        exercise, problem = validate_exercise(loads_tolerant(text.strip()))
+        if exercise:
+            return exercise, 'direct', None
+    except ValueError:
+        pass
+    try:
+        data, exact = extract_json_object(text)
+    except ValueError as e:
+        return None, None, f"no valid JSON object found ({e})"
+    exercise, problem = validate_exercise(data)
+    if exercise:
+        return exercise, 'extracted', None
+    if not exact:
+        problem = f"the JSON object was cut off ({problem})"
+    return None, None, problem
+
+def _exercise_context(topic, k=3):
+    """Knowledge base excerpts for the exercise prompt (empty if unavailable)"""
+    try:
+        docs = get_vectorstore().similarity_search(topic, k=k)
+        if is_context_packing_enabled():
+            docs = pack_documents(docs, get_context_budget("exercise"))
+        return "\n\n".join(doc.page_content for doc in docs) or "(none)"
+    except Exception as e:
+        print(f"⚠️ No reference material for exercise: {e}")
+        return "(none)"
+
+def _invoke_json(template, inputs):
+    prompt = PromptTemplate(input_variables=list(inputs), template=template)
+    result = (prompt | get_task_llm("exercise", json_mode=True)).invoke(inputs)
+    return getattr(result, 'content', str(result))
+
+def run_exercise_generation(template, inputs):
     """
-    Generates a code exercise on a given topic.
+    Generates an exercise from a prompt template asking for EXERCISE_FIELDS as JSON.
+    Returns the validated exercise dict, or None.
     """
     try:
-        chain = get_code_exercise_chain()
-        result = chain.run(topic=topic)
-        
-        # Parse the JSON
-        exercise_data = json.loads(result)
-        return exercise_data
-        
+        text = _invoke_json(template, inputs)
+    except Exception as e:
+        print(f"❌ Exercise generation failed: {e}")
+        _count_exercise_path('errors')
+        return None
+    print(f"🔍 Raw exercise output: {text[:500]}...")
+
+    exercise, path, problem = _parse_exercise(text)
+    if exercise:
+        _count_exercise_path(path)
+        return exercise
+
+    # One targeted repair: the model fixes its own output instead of starting over
+    print(f"🔧 Repairing exercise output: {problem}")
+    try:
+        repaired = _invoke_json(load_prompt("exercise_repair"), {"problem": problem, "previous": text[:6000]})
+        exercise, _, problem = _parse_exercise(repaired)
     except Exception as e:
-        print(f"Error during exercise generation: {e}")
-        # Fallback with example exercise
-        return {
-            "title": f"Exercise on {topic}",
-            "description": f"Practical exercise on {topic}",
-            "starter_code": f"# TODO: Implement {topic}\npass",
-            "solution": f"# Solution for {topic}\nprint('Hello World')",
-            "tests": [{"input": "test", "expected": "result"}]
-        }
\ No newline at end of file
+        print(f"❌ Exercise repair failed: {e}")
+        exercise = None
+    _count_exercise_path('repaired' if exercise else 'failed')
+    if not exercise:
+        print(f"❌ Unusable exercise output: {problem}")
+    return exercise
+
+def generate_exercise(topic, difficulty="beginner", from_course=False, use_cache=True):
+    """
+    Generates a Python exercise (EXERCISE_FIELDS) on a topic, or on a course topic
+    with from_course=True. Returns the exercise dict, or None if generation failed.
+    """
+    template = load_prompt("exercise_from_course" if from_course else "exercise")
+    return cached_generation(
+        "exercise",
+        task_route_key("exercise"),
+        template,
+        {"topic": topic, "difficulty": difficulty},
+        lambda: run_exercise_generation(
+            template,
+            {"topic": topic, "difficulty": difficulty, "context": _exercise_context(topic)}
+        ),
+        use_cache=use_cache
+    )
+
+def _run_code_exercise_chain(topic):
+    """Runs the code exercise prompt, returns exercise data or None"""
+    return run_exercise_generation(CODE_EXERCISE_TEMPLATE, {"topic": topic})
+
+def generate_code_exercise(topic, use_cache=True):
+    """
+    Generates a code exercise on a given topic.
+    """
+    exercise_data = cached_generation(
+        "code_exercise",
+        task_route_key("exercise"),
+        CODE_EXERCISE_TEMPLATE,
+        {"topic": topic},
+        lambda: _run_code_exercise_chain(topic),
+        use_cache=use_cache
+    )
+    if exercise_data:
+        return exercise_data
+
+    # Fallback with example exercise
+    return {
+        "title": f"Exercise on {topic}",
+        "description": f"Practical exercise on {topic}",
+        "starter_code": f"# TODO: Implement {topic}\npass",
+        "solution": f"# Solution for {topic}\nprint('Hello World')",
+        "tests": [{"input": "test", "expected": "result"}]
+    }
\ No newline at end of file
@@ -1,71 +1,124 @@
 # apps/agents/agent_orchestrator.py
 
-from .agent_researcher import get_researcher_chain
-from .agent_pedagogue import get_pedagogue_chain
-from .agent_coach import generate_quiz, generate_code_exercise
+from .engine import get_engine
+from .agent_researcher import with_history
+from .agent_coach import generate_quiz, generate_code_exercise, stream_quiz, astream_quiz, generate_exercise
 from .agent_watcher import get_watcher_agent
+from .prefetch import take_prefetched_quiz
+from .tools.model_router import task_route_key, track_routes
+from .tools.response_cache import Uncached, cached_generation, acached_generation, get_cached, store_cached
+from .tools.semantic_cache import get_semantic_cache, is_semantic_cache_enabled
+from .tools.single_flight import get_single_flight
+from .tools.streaming import stream_chain
+from .tools.telemetry import note_cache
+from .tools.conversation_memory import get_conversation_memory
+from .utils import load_prompt, MarkdownSectionStream
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 class AIOrchestrator:
     """
-    Main orchestrator that coordinates all AI agents
+    Main orchestrator that coordinates all AI agents.
+    Cheap per-request facade: chains live in the shared AIEngine,
+    only per-user state (the watcher) is kept here.
     """
     
-    def __init__(self, user=None):
+    def __init__(self, user=None, engine=None):
         self.user = user
-        self.researcher = get_researcher_chain()
-        self.pedagogue = get_pedagogue_chain()
-        if user:
-            self.watcher = get_watcher_agent(user)
+        self.engine = engine or get_engine()
+        self._watcher = None
     
-    def generate_course(self, topic, difficulty="intermediate"):
+    @property
+    def researcher(self):
+        return self.engine.researcher
+    
+    @property
+    def pedagogue(self):
+        return self.engine.pedagogue
+    
+    @property
+    def watcher(self):
+        if self._watcher is None and self.user:
+            self._watcher = get_watcher_agent(self.user)
+        return self._watcher
+    
+    def _enhanced_topic(self, topic):
+        """Enhance prompt with module context"""
+        current_module = getattr(self, 'current_module', None)
+        if current_module:
+            return f"{topic} (dans le contexte de {current_module})"
+        return topic
+    
+    def _course_cache_args(self, topic, difficulty):
+        """Response cache arguments shared by generate_course and stream_course"""
+        return (
+            "course",
+            task_route_key("course"),
+            load_prompt("pedagogue"),
+            {"topic": topic, "difficulty": difficulty, "module": getattr(self, 'current_module', None)},
+        )
+    
+    def _track_course_session(self, topic):
+        """Session tracking if user is connected"""
+        if not self.user:
+            return None
+        try:
+            return self.watcher.track_session(
+                topic=topic,
+                activity_type='course_generation',
+                metadata={}
+            )
+        except Exception as e:
+            print(f"⚠️ Tracking disabled (missing table): {e}")
+            # Continue without tracking if tables don't exist yet
+            return None
+    
+    def _run_course_chain(self, enhanced_topic):
+        """
+        Runs the pedagogue chain, returns {'content', 'sources'}.
+        The course generated without RAG when retrieval fails is not cached.
+        """
+        # 1. Generate structured course
+        try:
+            # Enhance context for pedagogue
+            if hasattr(self.pedagogue, 'invoke'):
+                # With RAG
+                course_result = self.pedagogue.invoke({"query": enhanced_topic})
+            else:
+                # Without RAG
+                course_result = self.pedagogue.invoke({"question": enhanced_topic})
+                
+            content = course_result.get('result', course_result)
+            sources = [doc.metadata.get('source', 'Unknown') for doc in course_result.get('source_documents', [])]
+        except Exception as e:
+            print(f"Error with RAG, using fallback: {e}")
+            # Fallback without RAG
+            try:
+                course_result = self.pedagogue.invoke({"question": enhanced_topic})
+            except:
+                course_result = self.pedagogue.run(question=enhanced_topic)
+            content = course_result.get('text', str(course_result))
+            return Uncached({'content': content, 'sources': ["Generative AI"]})
+        return {'content': content, 'sources': sources}
+    
+    def generate_course(self, topic, difficulty="intermediate", use_cache=True):
         """
         Generates a complete course using Researcher + Pedagogue
         """
         try:
             print(f"🎓 Generating course on: {topic}")
             
-            # Enhance prompt with module context
-            enhanced_topic = topic
-            if hasattr(self, 'current_module') and self.current_module:
-                enhanced_topic = f"{topic} (dans le contexte de {self.current_module})"
+            course = cached_generation(
+                *self._course_cache_args(topic, difficulty),
+                lambda: self._run_course_chain(self._enhanced_topic(topic)),
+                use_cache=use_cache
+            )
+            content = course['content']
+            sources = course['sources']
             
-            # 1. Generate structured course
-            try:
-                # Enhance context for pedagogue
-                if hasattr(self.pedagogue, 'invoke'):
-                    # With RAG
-                    course_result = self.pedagogue.invoke({"query": enhanced_topic})
-                else:
-                    # Without RAG
-                    course_result = self.pedagogue.invoke({"question": enhanced_topic})
-                    
-                content = course_result.get('result', course_result)
-                sources = [doc.metadata.get('source', 'Unknown') for doc in course_result.get('source_documents', [])]
-            except Exception as e:
-                print(f"Error with RAG, using fallback: {e}")
-                # Fallback without RAG
-                try:
-                    course_result = self.pedagogue.invoke({"question": enhanced_topic})
-                except:
-                    course_result = self.pedagogue.run(question=enhanced_topic)
-                content = course_result.get('text', str(course_result))
-                sources = ["Generative AI"]
-            
-            # 3. Session tracking if user is connected
-            session = None
-            if self.user:
-                try:
-                    session = self.watcher.track_session(
-                        topic=topic,
-                        activity_type='course_generation',
-                        metadata={}
-                    )
-                except Exception as e:
-                    print(f"⚠️ Tracking disabled (missing table): {e}")
-                    # Continue without tracking if tables don't exist yet
+            session = self._track_course_session(topic)
             
             return {
                 'success': True,
@@ -85,44 +138,181 @@ class AIOrchestrator:
                 'topic': topic
             }
     
-    def answer_question(self, question):
+    async def _arun_course_chain(self, enhanced_topic):
+        """Async variant of _run_course_chain"""
+        try:
+            course_result = await self.pedagogue.ainvoke({"query": enhanced_topic})
+            content = course_result.get('result', course_result)
+            sources = [doc.metadata.get('source', 'Unknown') for doc in course_result.get('source_documents', [])]
+        except Exception as e:
+            print(f"Error with RAG, using fallback: {e}")
+            course_result = await self.pedagogue.ainvoke({"question": enhanced_topic})
+            content = course_result.get('text', str(course_result))
+            return Uncached({'content': content, 'sources': ["Generative AI"]})
+        return {'content': content, 'sources': sources}
+    
+    async def agenerate_course(self, topic, difficulty="intermediate", use_cache=True):
         """
-        Answers a question using the RAG system
+        Async variant of generate_course for async views:
+        retrieval and generation are awaited instead of blocking a worker thread.
+        """
+        try:
+            print(f"🎓 Generating course on: {topic}")
+            
+            course = await acached_generation(
+                *self._course_cache_args(topic, difficulty),
+                lambda: self._arun_course_chain(self._enhanced_topic(topic)),
+                use_cache=use_cache
+            )
+            session = await sync_to_async(self._track_course_session)(topic)
+            
+            return {
+                'success': True,
+                'topic': topic,
+                'content': course['content'],
+                'sources': course['sources'],
+                'session_id': session.id if session else None
+            }
+            
+        except Exception as e:
+            print(f"Error during course generation: {e}")
+            import traceback
+            traceback.print_exc()
+            return {
+                'success': False,
+                'error': str(e),
+                'topic': topic
+            }
+    
+    def stream_course(self, topic, difficulty="intermediate", use_cache=True):
+        """
+        Streaming variant of generate_course.
+        Yields ('title', str) as soon as the course title is known, ('section', markdown)
+        for each completed "## " section, then ('done', {...}) or ('error', message).
+        The complete course is stored in the response cache, so a later
+        generate_course call with the same arguments is served from it.
+        """
+        print(f"🎓 Streaming course on: {topic}")
+        cache_args = self._course_cache_args(topic, difficulty)
+        splitter = MarkdownSectionStream()
+        course = get_cached(*cache_args) if use_cache else None
+        if use_cache:
+            note_cache("response", "hit" if course else "miss")
+        
+        if course:
+            print("⚡ Response cache hit (course)")
+            for event in splitter.feed(course['content']) + splitter.close():
+                yield event
+        else:
+            chain = self.engine.get_chain('pedagogue_stream')
+            tokens = []
+            sources = []
+            result = None
+            with track_routes() as served:
+                for event, data in stream_chain(chain, {"query": self._enhanced_topic(topic)}):
+                    if event == 'sources':
+                        sources = data
+                    elif event == 'token':
+                        tokens.append(data)
+                        for section_event in splitter.feed(data):
+                            yield section_event
+                    elif event == 'result':
+                        result = data
+                    else:
+                        yield 'error', data
+                        return
+            
+            content = result.get('result') if isinstance(result, dict) else None
+            if not isinstance(content, str):
+                content = "".join(tokens)
+            pending = splitter.close()
+            if not tokens:
+                # The model did not stream: split the whole course at once
+                pending = splitter.feed(content) + splitter.close()
+            for event in pending:
+                yield event
+            
+            course = {'content': content, 'sources': sources}
+            if use_cache and content:
+                store_cached(*cache_args, course, served)
+        
+        session = self._track_course_session(topic)
+        yield 'done', {
+            'title': splitter.title,
+            'content': course['content'],
+            'sources': course['sources'],
+            'session_id': session.id if session else None
+        }
+    
+    def _user_language(self):
+        """User language preference, French by default"""
+        if self.user and hasattr(self.user, 'language_preference'):
+            return self.user.language_preference
+        return "fr"
+    
+    def answer_question(self, question, use_cache=True, conversation=None):
+        """
+        Answers a question using the RAG system.
+        Similar questions already answered in the same module and language
+        are served from the semantic cache unless use_cache is False.
+        With a conversation (see ConversationMemory), the question is answered
+        in the context of its bounded history and the turn is recorded.
         """
         try:
             print(f"🔍 Searching for: {question}")
             
-            # Use researcher to find and synthesize answer
-            try:
-                result = self.researcher.invoke(question)
-                answer = result.get('result', result)
-                sources = [doc.metadata.get('source', 'Unknown') for doc in result.get('source_documents', [])]
-            except Exception as e:
-                print(f"Error with RAG, using fallback: {e}")
-                # Fallback without RAG
-                result = self.researcher.invoke({"question": question})
-                answer = result.get('text', str(result))
-                sources = ["Generative AI"]
-            
-            # Session tracking if user is connected
-            session = None
-            if self.user:
-                try:
-                    session = self.watcher.track_session(
-                        topic=question[:100],  # Limit length
-                        activity_type='chat',
-                        metadata={'question': question}
-                    )
-                except Exception as e:
-                    print(f"⚠️ Tracking disabled (missing table): {e}")
-                    # Continue without tracking if tables don't exist yet
+            module = getattr(self, 'current_module', None)
+            language = self._user_language()
+            history = get_conversation_memory().format_history(conversation)
+            # Follow-up answers depend on the history: not shareable through the cache
+            semantic_cache = get_semantic_cache() if use_cache and is_semantic_cache_enabled() and not history else None
+            vector = semantic_cache.embed(question) if semantic_cache else None
+            cached = semantic_cache.lookup(vector, module, language) if vector is not None else None
+            
+            if cached:
+                print(f"⚡ Semantic cache hit (similarity {cached['similarity']})")
+                answer = cached['answer']
+                sources = cached['sources']
+            elif history:
+                result = with_history(self.researcher, history).invoke({"query": question})
+                answer = result.get('result', result.get('text'))
+                sources = [doc.metadata.get('source', 'Unknown') for doc in result.get('source_documents', [])] or ["Generative AI"]
+            else:
+                def run_researcher():
+                    # Use researcher to find and synthesize answer
+                    try:
+                        result = self.researcher.invoke(question)
+                        answer = result.get('result', result)
+                        sources = [doc.metadata.get('source', 'Unknown') for doc in result.get('source_documents', [])]
+                    except Exception as e:
+                        print(f"Error with RAG, using fallback: {e}")
+                        # Fallback without RAG
+                        result = self.researcher.invoke({"question": question})
+                        answer = result.get('text', str(result))
+                        sources = ["Generative AI"]
+                    
+                    if vector is not None and isinstance(answer, str):
+                        semantic_cache.store(vector, module, language, answer, sources)
+                    return answer, sources
+                
+                # Identical questions asked at the same time share one researcher call
+                answer, sources = get_single_flight().do(
+                    f"chat:{module}:{language}:{question}",
+                    run_researcher,
+                    distributed=False
+                )
+            
+            session = self._track_chat_session(question)
+            self._remember_turn(conversation, question, answer)
             
             return {
                 'success': True,
                 'question': question,
                 'answer': answer,
                 'sources': sources,
-                'session_id': session.id if session else None
+                'cached': bool(cached),
+                'session_id': session.id if session else None,
+                'conversation_id': conversation.id if conversation else None
             }
             
         except Exception as e:
@@ -135,29 +325,190 @@ class AIOrchestrator:
                 'question': question
             }
     
-    def create_quiz(self, topic, num_questions):
+    async def aanswer_question(self, question, use_cache=True, conversation=None):
+        """
+        Async variant of answer_question for async views: the embedding, the
+        vectorstore query and the LLM call are awaited (ainvoke), and database
+        writes go through the async ORM or a thread.
+        """
+        try:
+            print(f"🔍 Searching for: {question}")
+            
+            module = getattr(self, 'current_module', None)
+            language = self._user_language()
+            history = get_conversation_memory().format_history(conversation)
+            semantic_cache = get_semantic_cache() if use_cache and is_semantic_cache_enabled() and not history else None
+            vector = await semantic_cache.aembed(question) if semantic_cache else None
+            cached = semantic_cache.lookup(vector, module, language) if vector is not None else None
+            
+            if cached:
+                print(f"⚡ Semantic cache hit (similarity {cached['similarity']})")
+                answer = cached['answer']
+                sources = cached['sources']
+            elif history:
+                result = await with_history(self.researcher, history).ainvoke({"query": question})
+                answer = result.get('result', result.get('text'))
+                sources = [doc.metadata.get('source', 'Unknown') for doc in result.get('source_documents', [])] or ["Generative AI"]
+            else:
+                async def run_researcher():
+                    try:
+                        result = await self.researcher.ainvoke(question)
+                        answer = result.get('result', result)
+                        sources = [doc.metadata.get('source', 'Unknown') for doc in result.get('source_documents', [])]
+                    except Exception as e:
+                        print(f"Error with RAG, using fallback: {e}")
+                        result = await self.researcher.ainvoke({"question": question})
+                        answer = result.get('text', str(result))
+                        sources = ["Generative AI"]
+                    
+                    if vector is not None and isinstance(answer, str):
+                        semantic_cache.store(vector, module, language, answer, sources)
+                    return answer, sources
+                
+                answer, sources = await get_single_flight().ado(
+                    f"chat:{module}:{language}:{question}",
+                    run_researcher
+                )
+            
+            session = await sync_to_async(self._track_chat_session)(question)
+            await self._aremember_turn(conversation, question, answer)
+            
+            return {
+                'success': True,
+                'question': question,
+                'answer': answer,
+                'sources': sources,
+                'cached': bool(cached),
+                'session_id': session.id if session else None,
+                'conversation_id': conversation.id if conversation else None
+            }
+            
+        except Exception as e:
+            print(f"Error answering question: {e}")
+            import traceback
+            traceback.print_exc()
+            return {
+                'success': False,
+                'error': str(e),
+                'question': question
+            }
+    
+    def _track_chat_session(self, question):
+        """Session tracking if user is connected"""
+        if not self.user:
+            return None
+        try:
+            return self.watcher.track_session(
+                topic=question[:100],  # Limit length
+                activity_type='chat',
+                metadata={'question': question}
+            )
+        except Exception as e:
+            print(f"⚠️ Tracking disabled (missing table): {e}")
+            # Continue without tracking if tables don't exist yet
+            return None
+    
+    def _remember_turn(self, conversation, question, answer):
+        """Records a chat turn in the conversation memory, never failing the answer"""
+        if conversation is None or not isinstance(answer, str):
+            return
+        try:
+            get_conversation_memory().record(conversation, question, answer)
+        except Exception as e:
+            print(f"⚠️ Conversation memory disabled: {e}")
+    
+    async def _aremember_turn(self, conversation, question, answer):
+        """Async variant of _remember_turn"""
+        if conversation is None or not isinstance(answer, str):
+            return
+        try:
+            await get_conversation_memory().arecord(conversation, question, answer)
+        except Exception as e:
+            print(f"⚠️ Conversation memory disabled: {e}")
+    
+    def stream_answer(self, question, use_cache=True, cancel_event=None, conversation=None):
+        """
+        Streaming variant of answer_question.
+        Yields ('sources', [...]) once retrieval is done, then ('token', str)
+        as the answer is generated, and finally ('done', {...}) or ('error', message).
+        Setting `cancel_event` (a threading.Event) stops the generation early.
+        """
+        module = getattr(self, 'current_module', None)
+        language = self._user_language()
+        history = get_conversation_memory().format_history(conversation)
+        semantic_cache = get_semantic_cache() if use_cache and is_semantic_cache_enabled() and not history else None
+        vector = semantic_cache.embed(question) if semantic_cache else None
+        cached = semantic_cache.lookup(vector, module, language) if vector is not None else None
+        
+        if cached:
+            print(f"⚡ Semantic cache hit (similarity {cached['similarity']})")
+            answer = cached['answer']
+            sources = cached['sources']
+            yield 'sources', sources
+            yield 'token', answer
+        else:
+            chain = self.engine.get_chain('researcher_stream')
+            # Without RAG the researcher is a plain LLMChain on "question"
+            inputs = {"query": question} if hasattr(chain, 'retriever') else {"question": question}
+            if history:
+                chain = with_history(chain, history)
+                inputs = {"query": question}
+            tokens = []
+            sources = ["Generative AI"]
+            result = None
+            for event, data in stream_chain(chain, inputs, cancel_event):
+                if event == 'sources':
+                    sources = data
+                    yield event, data
+                elif event == 'token':
+                    tokens.append(data)
+                    yield event, data
+                elif event == 'result':
+                    result = data
+                else:
+                    yield 'error', data
+                    return
+            
+            if result is None:
+                # Cancelled: don't cache or track a partial answer
+                return
+            
+            answer = result.get('result', result.get('text')) if isinstance(result, dict) else None
+            if not isinstance(answer, str):
+                answer = "".join(tokens)
+            elif not tokens:
+                # The model did not stream: send the whole answer at once
+                yield 'token', answer
+            
+            if vector is not None and answer:
+                semantic_cache.store(vector, module, language, answer, sources)
+        
+        session = self._track_chat_session(question)
+        yield 'done', {
+            'answer': answer,
+            'sources': sources,
+            'cached': bool(cached),
+            'session_id': session.id if session else None,
+            'conversation_id': conversation.id if conversation else None
+        }
+        # After 'done' so that summarizing older turns doesn't delay the answer
+        self._remember_turn(conversation, question, answer)
+    
+    def create_quiz(self, topic, num_questions, use_cache=True):
         """
         Creates a quiz on a given topic and returns a directly usable dict.
         """
         try:
             # Get user language preference
-            user_language = "fr"  # Default
-            if self.user and hasattr(self.user, 'language_preference'):
-                user_language = self.user.language_preference
+            user_language = self._user_language()
             
-            quiz_data = generate_quiz(topic, num_questions, user_language)
+            banked = self._banked_questions(topic, num_questions, user_language) if use_cache else None
+            quiz_data = {"questions": banked} if banked else generate_quiz(
+                topic, num_questions, user_language, use_cache=use_cache
+            )
 
             # Session tracking (optional)
-            session = None
-            if self.user:
-                session = self.watcher.track_session(
-                    topic=topic,
-                    activity_type='quiz',
-                    metadata={
-                        'num_questions': num_questions,
-                        'language': user_language,
-                    }
-                )
+            session = self._track_quiz_session(topic, num_questions, user_language)
 
             # Add metadata directly to return
             return {
@@ -176,6 +527,127 @@ class AIOrchestrator:
             }
 
     
+    def _banked_questions(self, topic, num_questions, language):
+        """Questions drawn from the topic's pre-generated bank (see QuizBank), or None"""
+        from apps.quiz.models import QuizBank
+        try:
+            return QuizBank.draw(topic, language, num_questions)
+        except Exception as e:
+            print(f"⚠️ Quiz banks disabled (missing table): {e}")
+            return None
+    
+    def _track_quiz_session(self, topic, num_questions, language):
+        if not self.user:
+            return None
+        return self.watcher.track_session(
+            topic=topic,
+            activity_type='quiz',
+            metadata={
+                'num_questions': num_questions,
+                'language': language,
+            }
+        )
+    
+    def stream_quiz(self, topic, num_questions, use_cache=True):
+        """
+        Streaming variant of create_quiz.
+        Yields ('question', {...}) as soon as each question is generated,
+        then ('done', {...}) or ('error', message).
+        """
+        user_language = self._user_language()
+        count = 0
+        try:
+            banked = self._banked_questions(topic, num_questions, user_language) if use_cache else None
+            questions = banked or stream_quiz(topic, num_questions, user_language, use_cache=use_cache)
+            for question in questions:
+                count += 1
+                yield 'question', question
+        except Exception as e:
+            print(f"Error streaming quiz: {e}")
+            yield 'error', str(e)
+            return
+        
+        if not count:
+            yield 'error', "No quiz could be generated."
+            return
+        
+        try:
+            session = self._track_quiz_session(topic, num_questions, user_language)
+        except Exception as e:
+            print(f"⚠️ Tracking disabled (missing table): {e}")
+            session = None
+        yield 'done', {
+            'count': count,
+            'topic': topic,
+            'language': user_language,
+            'session_id': session.id if session else None
+        }
+    
+    async def astream_quiz(self, topic, num_questions, use_cache=True):
+        """Async variant of stream_quiz, generating the batches on the event loop"""
+        user_language = self._user_language()
+        count = 0
+        try:
+            banked = await sync_to_async(self._banked_questions)(topic, num_questions, user_language) if use_cache else None
+            if banked:
+                for question in banked:
+                    count += 1
+                    yield 'question', question
+            else:
+                async for question in astream_quiz(topic, num_questions, user_language, use_cache=use_cache):
+                    count += 1
+                    yield 'question', question
+        except Exception as e:
+            print(f"Error streaming quiz: {e}")
+            yield 'error', str(e)
+            return
+        
+        if not count:
+            yield 'error', "No quiz could be generated."
+            return
+        
+        try:
+            session = await sync_to_async(self._track_quiz_session)(topic, num_questions, user_language)
+        except Exception as e:
+            print(f"⚠️ Tracking disabled (missing table): {e}")
+            session = None
+        yield 'done', {
+            'count': count,
+            'topic': topic,
+            'language': user_language,
+            'session_id': session.id if session else None
+        }
+    
+    def take_ready_quiz(self, topic, num_questions):
+        """
+        Quiz that needs no generation: generated ahead after a course view (see
+        prefetch.py), else drawn from the topic's pre-generated bank (QuizBank).
+        Its session is tracked like a streamed quiz: {"questions", "language", "session_id"}, or None.
+        """
+        quiz = take_prefetched_quiz(self.user, topic, num_questions)
+        if not quiz:
+            language = self._user_language()
+            questions = self._banked_questions(topic, num_questions, language)
+            if not questions:
+                return None
+            quiz = {"questions": questions, "language": language}
+        try:
+            session = self._track_quiz_session(topic, num_questions, quiz['language'])
+        except Exception as e:
+            print(f"⚠️ Tracking disabled (missing table): {e}")
+            session = None
+        return dict(quiz, session_id=session.id if session else None)
+
+    def generate_exercise(self, topic, difficulty="beginner", from_course=False, use_cache=False):
+        """
+        Generates a Python exercise (title, description, starter_code, solution, tests).
+        Not cached by default: asking twice for the same topic should give a new exercise.
+        """
+        exercise = generate_exercise(topic, difficulty, from_course=from_course, use_cache=use_cache)
+        if not exercise:
+            return {'success': False, 'error': "The AI could not produce a valid exercise"}
+        return {'success': True, 'exercise': exercise}
+    
     def submit_quiz_results(self, session_id, answers, quiz_data):
         """
         Processes quiz results and updates statistics
@@ -265,5 +737,5 @@ class AIOrchestrator:
             }
 
 def get_orchestrator(user=None):
-    """Factory function to create an orchestrator"""
+    """Factory function to create a per-request orchestrator over the shared engine"""
     return AIOrchestrator(user)
\ No newline at end of file
@@ -2,25 +2,25 @@
 
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
-from apps.agents.tools.llm_loader import get_llm
+from apps.agents.tools.context_packing import packed_retriever
+from apps.agents.tools.model_router import get_context_budget, get_task_llm
 from apps.agents.utils import load_prompt
-from langchain_community.vectorstores import Chroma
-from apps.rag.utils import load_embedding_function
+from apps.rag.utils import get_vectorstore
 
 
-def get_pedagogue_chain(model_name="meta-llama/llama-4-scout-17b-16e-instruct"):
+def get_pedagogue_chain(model_name=None, streaming=False):
     """
     Pedagogue Agent: generates a structured course in flat JSON format.
+    With streaming=True, the LLM reports tokens to callbacks as they are generated.
+    Without model_name, each call is routed to the model serving the "course" task.
     """
     # Initialize LLM and vectorstore
-    embedding_fn = load_embedding_function()
-    vectorstore = Chroma(
-        persist_directory="apps/rag/chroma",
-        embedding_function=embedding_fn,
-        collection_name="eduai_knowledge_base"
+    vectorstore = get_vectorstore()
+    retriever = packed_retriever(
+        vectorstore.as_retriever(search_kwargs={"k": 5}),
+        get_context_budget("course", model_name)
     )
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 5})
-    llm = get_llm(model_name=model_name)
+    llm = get_task_llm("course", streaming=streaming, model_name=model_name)
 
     # Structured prompt for flat JSON
     prompt = PromptTemplate(
@@ -1,24 +1,25 @@
 # apps/agents/agent_researcher.py
 
 from langchain.chains import RetrievalQA
-from apps.agents.tools.llm_loader import get_llm
-from langchain_community.vectorstores import Chroma
-from apps.rag.utils import load_embedding_function
+from langchain_core.runnables import RunnableLambda
+from apps.agents.tools.context_packing import packed_retriever
+from apps.agents.tools.model_router import get_context_budget, get_task_llm
+from apps.rag.utils import get_vectorstore
 from apps.agents.utils import load_prompt
 
-def get_researcher_chain(model_name="meta-llama/llama-4-scout-17b-16e-instruct"):
+def get_researcher_chain(model_name=None, streaming=False):
     """
     Initialize RAG Researcher, compatible with Groq (or Ollama fallback).
+    With streaming=True, the LLM reports tokens to callbacks as they are generated.
+    Without model_name, each call is routed to the model serving the "chat" task.
     """
     try:
-        embedding_fn = load_embedding_function()
-        vectorstore = Chroma(
-            persist_directory="apps/rag/chroma",
-            embedding_function=embedding_fn,
-            collection_name="eduai_knowledge_base"
+        vectorstore = get_vectorstore()
+        retriever = packed_retriever(
+            vectorstore.as_retriever(search_kwargs={"k": 5}),
+            get_context_budget("chat", model_name)
         )
-        retriever = vectorstore.as_retriever(search_kwargs={"k": 5})
-        llm = get_llm(model_name=model_name)
+        llm = get_task_llm("chat", streaming=streaming, model_name=model_name)
         
         return RetrievalQA.from_chain_type(
             llm=llm,
@@ -28,7 +29,7 @@ def get_researcher_chain(model_name="meta-llama/llama-4-scout-17b-16e-instruct")
     except Exception as e:
         print(f"Error initializing researcher: {e}")
         # Fallback without RAG
-        llm = get_llm(model_name=model_name)
+        llm = get_task_llm("chat", streaming=streaming, model_name=model_name)
         from langchain.chains import LLMChain
         from langchain.prompts import PromptTemplate
         
@@ -37,3 +38,38 @@ def get_researcher_chain(model_name="meta-llama/llama-4-scout-17b-16e-instruct")
             template=load_prompt('researcher')
         )
         return LLMChain(llm=llm, prompt=prompt)
+
+
+def with_history(chain, history):
+    """
+    Wraps a researcher chain to answer a follow-up question of a conversation.
+    Documents are retrieved with the bare question (the history would blur the
+    embedding), while the LLM sees the history block before the question.
+    Returns a runnable taking {"query": question}, with the researcher's output format
+    (invoke() and ainvoke() both supported).
+    """
+    def run(inputs, config):
+        question = inputs["query"]
+        prompt_question = f"{history}\n\nCurrent question: {question}"
+        if not hasattr(chain, 'retriever'):
+            return chain.invoke({"question": prompt_question}, config=config)
+        docs = chain.retriever.invoke(question, config=config)
+        output = chain.combine_documents_chain.invoke(
+            {"input_documents": docs, "question": prompt_question},
+            config=config
+        )
+        return {"query": question, "result": output["output_text"], "source_documents": docs}
+
+    async def arun(inputs, config):
+        question = inputs["query"]
+        prompt_question = f"{history}\n\nCurrent question: {question}"
+        if not hasattr(chain, 'retriever'):
+            return await chain.ainvoke({"question": prompt_question}, config=config)
+        docs = await chain.retriever.ainvoke(question, config=config)
+        output = await chain.combine_documents_chain.ainvoke(
+            {"input_documents": docs, "question": prompt_question},
+            config=config
+        )
+        return {"query": question, "result": output["output_text"], "source_documents": docs}
+
+    return RunnableLambda(run, afunc=arun)
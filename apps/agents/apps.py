@@ -1,6 +1,53 @@
+import os
+import sys
 from django.apps import AppConfig
 
 
+# Entry points of the processes that serve requests
+SERVER_PROGRAMS = ("daphne", "uvicorn", "gunicorn", "hypercorn")
+
+
+def _is_server_process():
+    """
+    True for servers (runserver, daphne, uvicorn, gunicorn, hypercorn), not for
+    migrate/shell/tests/scripts. AI_SERVER_PROCESS=1 or 0 overrides the detection
+    (e.g. for a server started from a custom script).
+    """
+    forced = os.getenv("AI_SERVER_PROCESS")
+    if forced in ("0", "1"):
+        return forced == "1"
+    program = os.path.basename(sys.argv[0]) if sys.argv else ""
+    if program == "manage.py":
+        if sys.argv[1:2] != ["runserver"]:
+            return False
+        # With the autoreloader, only the serving child process
+        return "--noreload" in sys.argv or os.environ.get("RUN_MAIN") == "true"
+    if program == "__main__.py":
+        # python -m daphne / uvicorn / gunicorn: argv[0] is the package's __main__.py
+        program = os.path.basename(os.path.dirname(sys.argv[0]))
+    return any(program.startswith(server) for server in SERVER_PROGRAMS)
+
+
 class AgentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.agents'
+
+    def ready(self):
+        # Agent telemetry (metrics and sampled traces), in workers and commands too
+        from .tools.telemetry import install, is_telemetry_enabled
+        if is_telemetry_enabled():
+            from .traces import persist_trace
+            install(persist=persist_trace)
+
+        if not _is_server_process():
+            return
+
+        # Warm up the AI stack
+        if os.getenv("AI_WARMUP_ON_STARTUP", "1") == "1":
+            from .warmup import warm_up_in_background
+            warm_up_in_background()
+
+        # Opt-in: generation jobs are run by `manage.py run_generation_jobs` workers
+        if os.getenv("AI_JOBS_IN_PROCESS", "0") == "1":
+            from .jobs import get_job_pool
+            get_job_pool().start()
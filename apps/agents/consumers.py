@@ -0,0 +1,30 @@
+import asyncio
+import json
+from channels.generic.websocket import AsyncWebsocketConsumer
+from .jobs import job_group_name, register_notification_loop
+
+
+class JobConsumer(AsyncWebsocketConsumer):
+    """
+    Pushes the user's generation job updates (see apps.agents.jobs).
+    Server -> client: {"type": "job", "job": {id, kind, status, result, error, ...}}
+    on every state change: queued, running, retried, succeeded, failed.
+    """
+
+    async def connect(self):
+        self.user = self.scope['user']
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+
+        register_notification_loop(asyncio.get_running_loop())
+        self.group_name = job_group_name(self.user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def job_update(self, event):
+        await self.send(text_data=json.dumps({'type': 'job', 'job': event['job']}, ensure_ascii=False))
@@ -0,0 +1,64 @@
+# apps/agents/engine.py
+
+import threading
+from .agent_researcher import get_researcher_chain
+from .agent_pedagogue import get_pedagogue_chain
+
+
+class AIEngine:
+    """
+    Process-wide holder for the heavy AI objects (chains, vectorstore, embeddings).
+    Each chain is built at most once, on first use, and shared by all requests.
+    """
+
+    def __init__(self):
+        self._chains = {}
+        self._lock = threading.Lock()
+        self._factories = {
+            'researcher': get_researcher_chain,
+            'pedagogue': get_pedagogue_chain,
+            'researcher_stream': lambda: get_researcher_chain(streaming=True),
+            'pedagogue_stream': lambda: get_pedagogue_chain(streaming=True),
+        }
+
+    def get_chain(self, name):
+        """Returns the named chain, building it on first access"""
+        chain = self._chains.get(name)
+        if chain is None:
+            with self._lock:
+                chain = self._chains.get(name)
+                if chain is None:
+                    print(f"⚙️ Building {name} chain")
+                    chain = self._factories[name]()
+                    self._chains[name] = chain
+        return chain
+
+    @property
+    def researcher(self):
+        return self.get_chain('researcher')
+
+    @property
+    def pedagogue(self):
+        return self.get_chain('pedagogue')
+
+    def is_built(self, name):
+        return name in self._chains
+
+    def reset(self):
+        """Drops built chains so the next access rebuilds them"""
+        with self._lock:
+            self._chains.clear()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Returns the shared AI engine for this process"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = AIEngine()
+    return _engine
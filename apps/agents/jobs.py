@@ -0,0 +1,407 @@
+# apps/agents/jobs.py
+
+import asyncio
+import importlib
+import os
+import socket
+import threading
+import time
+import traceback
+from contextlib import contextmanager, nullcontext
+from datetime import timedelta
+from django.db import models, close_old_connections, connection
+from django.db.models import F
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+User = get_user_model()
+
+# Job kind => dotted path of its handler: handler(job) returns a JSON-serializable
+# result, or raises to have the job retried
+JOB_HANDLERS = {
+    'course': 'apps.courses.jobs.run_course_job',
+    'exercise': 'apps.exercises.jobs.run_exercise_job',
+    'quiz': 'apps.quiz.jobs.run_quiz_job',
+}
+
+
+class GenerationJob(models.Model):
+    """
+    Long AI generation run outside the HTTP request.
+    The table is the queue: workers claim queued jobs with a conditional UPDATE,
+    so any number of worker threads and processes can share it without a broker.
+    """
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    KIND_CHOICES = [(kind, kind.title()) for kind in JOB_HANDLERS]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='generation_jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        app_label = 'agents'
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+    def __str__(self):
+        return f"{self.kind} job #{self.id} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+# === Notifications (Channels) ===
+
+_notification_loop = None
+
+
+def job_group_name(user_id):
+    return f"generation_jobs_{user_id}"
+
+
+def register_notification_loop(loop):
+    """
+    Called by JobConsumer with the server's event loop: the in-memory channel
+    layer is not thread-safe, so worker threads schedule their sends on it.
+    """
+    global _notification_loop
+    _notification_loop = loop
+
+
+def notify_job(job):
+    """Pushes the job's state to the browser tabs of its user, never failing the job"""
+    from channels.layers import get_channel_layer
+    from asgiref.sync import async_to_sync
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    group = job_group_name(job.user_id)
+    message = {'type': 'job.update', 'job': job.to_dict()}
+    try:
+        loop = _notification_loop
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(channel_layer.group_send(group, message), loop)
+        else:
+            # No consumer in this process (e.g. standalone worker): works with shared layers (Redis)
+            async_to_sync(channel_layer.group_send)(group, message)
+    except Exception as e:
+        print(f"⚠️ Job notification failed: {e}")
+
+
+# === Queue ===
+
+def enqueue_job(user, kind, params, max_attempts=None):
+    """Creates a queued job and wakes up the local workers, returns the job"""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = GenerationJob.objects.create(
+        user=user,
+        kind=kind,
+        params=params,
+        max_attempts=max_attempts or int(os.getenv("AI_JOBS_MAX_ATTEMPTS", "3")),
+    )
+    print(f"📥 Queued {kind} job #{job.id}")
+    notify_job(job)
+    get_job_pool().wake()
+    return job
+
+
+def requeue_stale_jobs():
+    """
+    Jobs left running by a crashed worker go back to the queue: a live worker
+    refreshes locked_at every AI_JOBS_HEARTBEAT_SECONDS (see _heartbeat), so a
+    job not refreshed for AI_JOBS_STALE_SECONDS has lost its worker.
+    Returns the number of jobs requeued.
+    """
+    stale_after = int(os.getenv("AI_JOBS_STALE_SECONDS", "120"))
+    requeued = GenerationJob.objects.filter(
+        status='running',
+        locked_at__lt=timezone.now() - timedelta(seconds=stale_after)
+    ).update(status='queued', locked_by='', locked_at=None, updated_at=timezone.now())
+    if requeued:
+        print(f"♻️ Requeued {requeued} stale job(s)")
+    return requeued
+
+
+def start_stale_job_sweeper(stop_event, interval=None):
+    """
+    Runs requeue_stale_jobs() every `interval` seconds (AI_JOBS_SWEEP_INTERVAL)
+    on a daemon thread until `stop_event` is set, returns the thread
+    """
+    interval = interval or float(os.getenv("AI_JOBS_SWEEP_INTERVAL", "60"))
+
+    def sweep():
+        while not stop_event.wait(interval):
+            try:
+                requeue_stale_jobs()
+            except Exception as e:
+                print(f"⚠️ Stale job sweep failed: {e}")
+            finally:
+                close_old_connections()
+        connection.close()
+
+    thread = threading.Thread(target=sweep, name="job-sweeper", daemon=True)
+    thread.start()
+    return thread
+
+
+def claim_next_job(worker_name, job_ids=None):
+    """Atomically takes the oldest runnable job (among `job_ids` if given), returns it or None"""
+    now = timezone.now()
+    runnable = GenerationJob.objects.filter(status='queued', run_after__lte=now)
+    if job_ids is not None:
+        runnable = runnable.filter(id__in=job_ids)
+    candidates = runnable.order_by('created_at').values_list('id', flat=True)[:10]
+    for job_id in candidates:
+        # Only one worker can move a given job out of 'queued'
+        claimed = GenerationJob.objects.filter(id=job_id, status='queued').update(
+            status='running',
+            locked_by=worker_name,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+        if claimed:
+            return GenerationJob.objects.select_related('user').get(id=job_id)
+    return None
+
+
+def _load_handler(kind):
+    module_name, function_name = JOB_HANDLERS[kind].rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def _retry_delay(attempts):
+    """Exponential backoff: 5 s, 10 s, 20 s... capped at 5 minutes"""
+    base = float(os.getenv("AI_JOBS_RETRY_DELAY", "5"))
+    return min(base * 2 ** (attempts - 1), 300)
+
+
+def _touch(job):
+    """Refreshes the lock of a job still held by its worker, returns False once it lost it"""
+    return bool(GenerationJob.objects.filter(id=job.id, status='running', locked_by=job.locked_by).update(
+        locked_at=timezone.now()
+    ))
+
+
+@contextmanager
+def _heartbeat(job):
+    """Keeps the job's lock fresh while the block runs, so requeue_stale_jobs() leaves it alone"""
+    interval = float(os.getenv("AI_JOBS_HEARTBEAT_SECONDS", "30"))
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            try:
+                _touch(job)
+            except Exception as e:
+                print(f"⚠️ Job #{job.id} heartbeat failed: {e}")
+            finally:
+                close_old_connections()
+        connection.close()
+
+    thread = threading.Thread(target=beat, name=f"job-heartbeat-{job.id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _admit(job):
+    """
+    Takes a model slot from the admission controller, like a request would.
+    The user's rate limit was already charged when the job was enqueued.
+    """
+    from apps.agents.tools.admission import get_admission_controller, is_admission_enabled, user_key
+
+    if not is_admission_enabled():
+        return nullcontext()
+    # Job kinds are the agent tasks generating them
+    return get_admission_controller().admit(user_key(job.user), job.kind, rate_limited=False)
+
+
+def run_job(job):
+    """Runs a claimed job, then records success, a retry or the final failure"""
+    from apps.agents.tools.admission import AdmissionRejected
+
+    try:
+        slot = _admit(job)
+    except AdmissionRejected as e:
+        # Model saturated: back to the queue, this attempt doesn't count
+        print(f"⏳ Job #{job.id} postponed {e.retry_after} s (model busy)")
+        GenerationJob.objects.filter(id=job.id).update(
+            status='queued',
+            attempts=F('attempts') - 1,
+            run_after=timezone.now() + timedelta(seconds=e.retry_after),
+            locked_by='',
+            locked_at=None,
+            updated_at=timezone.now(),
+        )
+        job.refresh_from_db()
+        return job
+
+    print(f"⚙️ Running {job.kind} job #{job.id} (attempt {job.attempts}/{job.max_attempts})")
+    notify_job(job)
+    try:
+        with slot, _heartbeat(job):
+            job.result = _load_handler(job.kind)(job)
+        job.status = 'succeeded'
+        job.error = ''
+        job.finished_at = timezone.now()
+        print(f"✅ Job #{job.id} succeeded")
+    except Exception as e:
+        traceback.print_exc()
+        job.error = str(e) or e.__class__.__name__
+        if job.attempts < job.max_attempts:
+            delay = _retry_delay(job.attempts)
+            job.status = 'queued'
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+            print(f"🔁 Job #{job.id} failed, retrying in {delay:.0f} s: {e}")
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            print(f"❌ Job #{job.id} failed: {e}")
+    job.locked_by = ''
+    job.locked_at = None
+    job.save()
+    notify_job(job)
+    return job
+
+
+# === Workers ===
+
+class JobWorkerPool:
+    """
+    Worker threads polling the job table. Enqueuing in the same process wakes
+    them up immediately; jobs enqueued elsewhere are picked up within `poll_interval`.
+    A sweeper thread requeues the jobs of crashed workers (see requeue_stale_jobs).
+    """
+
+    def __init__(self, workers=2, poll_interval=1.0):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._threads = []
+        self._sweeper = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {'succeeded': 0, 'failed': 0, 'retried': 0}
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._loop, args=(index,), name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._sweeper = start_stale_job_sweeper(self._stop)
+        print(f"👷 {self.workers} generation job worker(s) started")
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+            if self._sweeper is not None:
+                threads.append(self._sweeper)
+                self._sweeper = None
+        for thread in threads:
+            thread.join(timeout)
+
+    def wake(self):
+        self._wake.set()
+
+    def _loop(self, index):
+        worker_name = f"{self.name}:{index}"
+        while not self._stop.is_set():
+            try:
+                job = claim_next_job(worker_name)
+                if job is not None:
+                    job = run_job(job)
+                    self._count(job)
+            except Exception as e:
+                print(f"⚠️ Job worker error: {e}")
+                job = None
+            finally:
+                close_old_connections()
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _count(self, job):
+        with self._lock:
+            if job.status == 'queued':
+                self._stats['retried'] += 1
+            else:
+                self._stats[job.status] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['workers'] = len(self._threads)
+        return stats
+
+    def run_forever(self):
+        """Blocks until interrupted (standalone worker process)"""
+        self.start()
+        try:
+            while not self._stop.is_set():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("🛑 Stopping job workers")
+        finally:
+            self.stop(timeout=5)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_job_pool():
+    """Returns this process's job worker pool configured from environment (not started)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = JobWorkerPool(
+                    workers=max(1, int(os.getenv("AI_JOBS_WORKERS", "2"))),
+                    poll_interval=float(os.getenv("AI_JOBS_POLL_INTERVAL", "1.0")),
+                )
+    return _pool
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from langchain.prompts import PromptTemplate
+from apps.agents.tools.fake_llm import FakeChatModel
+from apps.agents.tools.llm_loader import get_llm
+
+
+def _default_threads():
+    # Sync views under ASGI run in asgiref's thread pool, sized like ThreadPoolExecutor's default
+    return int(os.getenv("ASGI_THREADS", min(32, (os.cpu_count() or 1) + 4)))
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares how many concurrent generation requests one worker serves "
+        "with the sync path (thread per request) and the async path (ainvoke)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help="Concurrent requests to send")
+        parser.add_argument('--threads', type=int, default=_default_threads(),
+                            help="Worker thread pool size for the sync path (default: ASGI_THREADS)")
+        parser.add_argument('--latency', type=float, default=1.0,
+                            help="Simulated LLM latency in seconds")
+        parser.add_argument('--tokens-per-second', type=float, default=0.0,
+                            help="Simulated LLM token rate after the first token (0: answer at once)")
+        parser.add_argument('--real', action='store_true',
+                            help="Call the configured LLM instead of the simulated one")
+
+    def handle(self, *args, **options):
+        llm = get_llm() if options['real'] else FakeChatModel(
+            latency=options['latency'], tokens_per_second=options['tokens_per_second']
+        )
+        chain = PromptTemplate.from_template("Answer in one sentence: {question}") | llm
+        questions = [{"question": f"What is a Python list? ({i})"} for i in range(options['requests'])]
+
+        model = "configured LLM" if options['real'] else f"simulated LLM ({options['latency']} s)"
+        self.stdout.write(f"⏱️ {len(questions)} concurrent requests, {options['threads']} worker threads, {model}")
+        results = {
+            'sync': self._run_sync(chain, questions, options['threads']),
+            'async': asyncio.run(self._run_async(chain, questions)),
+        }
+
+        for mode, (wall, latencies, errors) in results.items():
+            self.stdout.write(
+                f"{mode:>5}: {wall:6.2f} s total, {len(questions) / wall:6.1f} req/s, "
+                f"p50 {_percentile(latencies, 0.5):.2f} s, p95 {_percentile(latencies, 0.95):.2f} s, "
+                f"{errors} error(s)"
+            )
+        speedup = results['sync'][0] / results['async'][0]
+        self.stdout.write(self.style.SUCCESS(f"✅ Async path: {speedup:.1f}x the sync throughput per worker"))
+
+    def _run_sync(self, chain, questions, threads):
+        """Sync views: each request holds one pool thread for the whole LLM call"""
+        def timed(inputs, submitted):
+            try:
+                chain.invoke(inputs)
+                failed = False
+            except Exception:
+                failed = True
+            return time.perf_counter() - submitted, failed
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            futures = [pool.submit(timed, inputs, time.perf_counter()) for inputs in questions]
+            outcomes = [future.result() for future in futures]
+        return time.perf_counter() - start, [latency for latency, _ in outcomes], sum(failed for _, failed in outcomes)
+
+    async def _run_async(self, chain, questions):
+        """Async views: requests wait on the event loop, no thread held"""
+        errors = 0
+
+        async def timed(inputs):
+            nonlocal errors
+            submitted = time.perf_counter()
+            try:
+                await chain.ainvoke(inputs)
+            except Exception:
+                errors += 1
+            return time.perf_counter() - submitted
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(timed(inputs) for inputs in questions))
+        return time.perf_counter() - start, latencies, errors
@@ -0,0 +1,200 @@
+import os
+import socket
+import threading
+from datetime import date
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+from apps.agents.jobs import GenerationJob, claim_next_job, run_job, start_stale_job_sweeper
+from apps.exercises.models import Exercise
+from apps.rag.module_loader import module_loader
+
+KINDS = ['course', 'quiz', 'exercise']
+
+
+def _checkpoint_key(kind, params):
+    return kind, params['section'], params.get('language')
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-generates a course, quiz question banks and an exercise for every section "
+        "of the module catalog, a few at a time. Progress is checkpointed in the job "
+        "table: running the same --run again resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modules', nargs='+', help="Module ids (default: all)")
+        parser.add_argument('--kinds', nargs='+', choices=KINDS, default=KINDS, help="What to generate")
+        parser.add_argument('--languages', nargs='+', default=['fr', 'en'], help="Quiz languages")
+        parser.add_argument('--num-questions', type=int, default=20,
+                            help="Questions per quiz bank: quizzes of up to this many questions are drawn from it")
+        parser.add_argument('--difficulty', choices=[choice for choice, _ in Exercise.DIFFICULTY_CHOICES],
+                            default='intermediate', help="Exercise difficulty")
+        parser.add_argument('--workers', type=int, default=2, help="Generations running at once")
+        parser.add_argument('--run', default=date.today().isoformat(),
+                            help="Checkpoint name (default: today's date, so each nightly run starts over)")
+        parser.add_argument('--user', help="Username owning the stored content (default: first superuser)")
+        parser.add_argument('--dry-run', action='store_true', help="Only show what would be generated")
+
+    def handle(self, *args, **options):
+        owner = self._owner(options['user'])
+        items = self._items(options)
+        pending, new_jobs, skipped = self._plan(owner, items, options)
+
+        self.stdout.write(
+            f"📚 {len(items)} item(s) in run {options['run']}: {len(pending) + len(new_jobs)} to generate, "
+            f"{skipped} already done"
+        )
+        if options['dry_run'] or not (pending or new_jobs):
+            return
+
+        job_ids = self._save(pending, new_jobs)
+
+        errors = self._run(job_ids, max(1, options['workers']), options['run'])
+
+        jobs = GenerationJob.objects.filter(id__in=job_ids)
+        succeeded = jobs.filter(status='succeeded').count()
+        failed = jobs.filter(status='failed')
+        for job in failed:
+            self.stdout.write(self.style.ERROR(f"❌ {job.kind} {job.params['section']}: {job.error}"))
+        if errors:
+            self.stdout.write(self.style.WARNING(f"⚠️ {errors} worker error(s), see above"))
+        style = self.style.SUCCESS if not (failed or errors) else self.style.WARNING
+        self.stdout.write(style(f"✅ {succeeded} generated, {failed.count()} failed"))
+
+    def _owner(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"Unknown user: {username}")
+        owner = User.objects.filter(is_superuser=True).order_by('id').first()
+        if owner is None:
+            raise CommandError("No superuser to own the content: create one or pass --user")
+        return owner
+
+    def _items(self, options):
+        """(kind, params) of everything to generate, in catalog order"""
+        items = []
+        for module in module_loader.get_available_modules():
+            if module['id'] == 'general' or (options['modules'] and module['id'] not in options['modules']):
+                continue
+            for section_key in module_loader.get_module_sections(module['id']):
+                # The topic a student gets when picking the section (see get_sections_api)
+                topic = module_loader.format_section_name(section_key)
+                common = {'topic': topic, 'section': f"{module['id']}/{section_key}",
+                          'run': options['run'], 'pregenerated': True}
+                if 'course' in options['kinds']:
+                    items.append(('course', dict(common, module=module['id'])))
+                if 'quiz' in options['kinds']:
+                    items.extend(
+                        ('quiz', dict(common, num_questions=options['num_questions'], language=language))
+                        for language in options['languages']
+                    )
+                if 'exercise' in options['kinds']:
+                    items.append(('exercise', dict(common, difficulty=options['difficulty'], from_course=False)))
+        return items
+
+    def _plan(self, owner, items, options):
+        """
+        Checkpoint lookup: (unfinished jobs of the run, jobs to create, items already done).
+        Jobs of the same run are reused, so a second invocation only does what is left.
+        """
+        run = options['run']
+        existing = {
+            _checkpoint_key(job.kind, job.params): job
+            for job in GenerationJob.objects.filter(user=owner, kind__in=options['kinds'])
+            if job.params.get('run') == run
+        }
+        max_attempts = int(os.getenv("AI_JOBS_MAX_ATTEMPTS", "3"))
+        pending, new_jobs, skipped = [], [], 0
+        for kind, params in items:
+            job = existing.get(_checkpoint_key(kind, params))
+            if job is not None and job.status == 'succeeded':
+                skipped += 1
+            elif job is not None:
+                pending.append(job)
+            elif kind == 'exercise' and Exercise.objects.filter(
+                created_by=owner, topic=params['topic'], difficulty=params['difficulty'], is_active=True
+            ).exists():
+                # Stored by an earlier run: exercises are not replaced every night
+                skipped += 1
+            else:
+                new_jobs.append(GenerationJob(user=owner, kind=kind, params=params, max_attempts=max_attempts))
+        return pending, new_jobs, skipped
+
+    def _save(self, pending, new_jobs):
+        """Requeues failed or interrupted jobs of the run, creates the new ones, returns all their ids"""
+        interrupted_prefix = f"pregenerate@{socket.gethostname()}"
+        for job in pending:
+            # Failed last time, or left running by an interrupted invocation of this command
+            if job.status == 'failed' or (job.status == 'running' and job.locked_by.startswith(interrupted_prefix)):
+                GenerationJob.objects.filter(id=job.id).update(
+                    status='queued', attempts=0, error='', run_after=timezone.now(),
+                    locked_by='', locked_at=None, finished_at=None, updated_at=timezone.now(),
+                )
+        created = GenerationJob.objects.bulk_create(new_jobs)
+        if any(job.id is None for job in created):
+            # bulk_create doesn't return primary keys on every database
+            keys = {_checkpoint_key(job.kind, job.params) for job in new_jobs}
+            created = [
+                job for job in GenerationJob.objects.filter(user=new_jobs[0].user, status='queued')
+                if job.params.get('run') == new_jobs[0].params['run'] and _checkpoint_key(job.kind, job.params) in keys
+            ]
+        return [job.id for job in pending] + [job.id for job in created]
+
+    def _run(self, job_ids, workers, run):
+        """Runs the jobs on `workers` threads until all are finished, returns the number of worker errors"""
+        stop = threading.Event()
+        lock = threading.Lock()
+        progress = {'done': 0, 'errors': 0}
+        worker_prefix = f"pregenerate@{socket.gethostname()}:{os.getpid()}"
+
+        def work(index):
+            while not stop.is_set():
+                try:
+                    job = claim_next_job(f"{worker_prefix}:{index}", job_ids)
+                    if job is None:
+                        pending = GenerationJob.objects.filter(id__in=job_ids, status__in=('queued', 'running'))
+                        if not pending.exists():
+                            return
+                        # Retries waiting for their backoff, or jobs taken by another worker
+                        stop.wait(2.0)
+                        continue
+                    job = run_job(job)
+                    if job.is_finished:
+                        with lock:
+                            progress['done'] += 1
+                            done = progress['done']
+                        icon = "✅" if job.status == 'succeeded' else "❌"
+                        self.stdout.write(f"{icon} [{done}/{len(job_ids)}] {job.kind} {job.params['section']}")
+                except Exception as e:
+                    # e.g. the database went away: a job left running is requeued by the sweeper once stale
+                    with lock:
+                        progress['errors'] += 1
+                    self.stderr.write(f"⚠️ Worker {index} error: {e}")
+                    stop.wait(2.0)
+                finally:
+                    close_old_connections()
+
+        threads = [
+            threading.Thread(target=work, args=(index,), name=f"pregenerate-{index}", daemon=True)
+            for index in range(workers)
+        ]
+        self.stdout.write(f"👷 Generating with {workers} worker(s), Ctrl+C to stop")
+        for thread in threads:
+            thread.start()
+        # Jobs of a crashed worker (here or elsewhere) go back to the queue
+        start_stale_job_sweeper(stop)
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(1.0)
+        except KeyboardInterrupt:
+            raise CommandError(f"Interrupted: run again with --run {run} to resume")
+        finally:
+            stop.set()
+        return progress['errors']
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from apps.agents.jobs import JobWorkerPool, get_job_pool
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs generation job workers in this process until interrupted. This is how "
+        "jobs are run: start one or more next to the server (AI_JOBS_IN_PROCESS=1 "
+        "only suits single-process development)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help="Worker threads (default: AI_JOBS_WORKERS)")
+
+    def handle(self, *args, **options):
+        pool = get_job_pool()
+        if options['workers']:
+            pool = JobWorkerPool(workers=options['workers'], poll_interval=pool.poll_interval)
+        self.stdout.write(self.style.SUCCESS(f"👷 Running generation jobs with {pool.workers} worker(s), Ctrl+C to stop"))
+        pool.run_forever()
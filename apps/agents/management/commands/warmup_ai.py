@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from apps.agents.warmup import COMPONENTS, warm_up
+
+
+class Command(BaseCommand):
+    help = "Preloads the Chroma collection, the embedding model and the default LLM"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only',
+            nargs='+',
+            choices=COMPONENTS,
+            help="Warm up only these components"
+        )
+
+    def handle(self, *args, **options):
+        report = warm_up(options['only'])
+
+        for name, state in report['components'].items():
+            if options['only'] and name not in options['only']:
+                continue
+            if state['ready']:
+                self.stdout.write(self.style.SUCCESS(f"✅ {name} ({state['duration_ms']} ms)"))
+            else:
+                self.stdout.write(self.style.ERROR(f"❌ {name}: {state['error']}"))
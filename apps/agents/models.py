@@ -0,0 +1,7 @@
+# apps/agents/models.py
+# The agents app defines its models next to the code using them;
+# importing them here registers them with Django (migrations, admin).
+
+from .agent_watcher import LearningSession, UserMistake
+from .jobs import GenerationJob
+from .traces import LLMTrace
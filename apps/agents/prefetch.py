@@ -0,0 +1,237 @@
+# apps/agents/prefetch.py
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from apps.agents.agent_coach import generate_exercise, stream_quiz
+from apps.agents.tools.admission import get_admission_controller, is_admission_enabled
+from apps.agents.tools.response_cache import get_response_cache, is_cache_enabled
+
+# What the course page links lead to (quiz_start and generate_exercise_from_course defaults)
+COURSE_QUIZ_QUESTIONS = 10
+COURSE_EXERCISE_DIFFICULTY = 'intermediate'
+
+
+class PrefetchCancelled(Exception):
+    """Interactive load went up while speculative work was running"""
+
+
+class Prefetcher:
+    """
+    Speculative generation of what a student usually asks for after reading a
+    course: a quiz and an exercise on the same topic. Tasks run one at a time
+    on a background thread, only when the model has spare capacity: a task
+    starts if, with it, at most `max_load` of the model's admission slots are
+    in use and nobody is waiting for one, and it is dropped (or stopped between
+    two quiz questions) as soon as interactive requests need the room.
+    Results are kept per user for `ttl_seconds` in the response cache database
+    (shared by all worker processes) and consumed by take().
+    """
+
+    def __init__(self, ttl_seconds=900, max_pending=20, max_load=0.5):
+        self.ttl_seconds = ttl_seconds
+        self.max_load = max_load
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = set()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'scheduled': 0,
+            'dropped_full': 0,
+            'completed': 0,
+            'failed': 0,
+            'cancelled_load': 0,
+            'expired': 0,
+            'hits': 0,
+            'misses': 0,
+        }
+
+    @staticmethod
+    def _key(kind, user_id, params):
+        # Not keyed on the model: whichever route produced it, the prefetched result
+        # is what the student's next request is served (routing may change in between)
+        return get_response_cache().make_key("prefetch", None, kind, dict(params, user=user_id))
+
+    def _bump(self, counter):
+        with self._lock:
+            self._stats[counter] += 1
+
+    # === Scheduling ===
+
+    def schedule(self, kind, user_id, **params):
+        """Queues a speculative generation, never blocking the request"""
+        key = self._key(kind, user_id, params)
+        with self._lock:
+            if key in self._pending:
+                return
+            try:
+                self._queue.put_nowait((key, kind, params, time.monotonic()))
+            except queue.Full:
+                self._stats['dropped_full'] += 1
+                return
+            self._pending.add(key)
+            self._stats['scheduled'] += 1
+        self._start()
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="ai-prefetch", daemon=True)
+                    self._thread.start()
+
+    # === Load ===
+
+    def _has_room(self, kind, extra=0):
+        """True while the used slots (plus `extra`) of the model serving `kind` stay within max_load, nobody waiting"""
+        if not is_admission_enabled():
+            return True
+        active, limit, queued = get_admission_controller().load(kind)
+        return not queued and (active + extra) / limit <= self.max_load
+
+    def _check_load(self, kind):
+        if not self._has_room(kind):
+            raise PrefetchCancelled()
+
+    # === Worker ===
+
+    def _loop(self):
+        while True:
+            key, kind, params, scheduled_at = self._queue.get()
+            try:
+                self._run(key, kind, params, scheduled_at)
+            except Exception as e:
+                self._bump('failed')
+                print(f"⚠️ Prefetch of {kind} failed: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+    def _run(self, key, kind, params, scheduled_at):
+        if time.monotonic() - scheduled_at > self.ttl_seconds:
+            # The student has moved on
+            self._bump('expired')
+            return
+        cache = get_response_cache()
+        if cache.get(key) is not None:
+            return
+        if not self._has_room(kind, extra=1):
+            self._bump('cancelled_load')
+            print(f"⏭️ Prefetch of {kind} skipped: interactive load is high")
+            return
+        slot = None
+        if is_admission_enabled():
+            # Never queued: a model without a free slot is needed by interactive requests
+            slot = get_admission_controller().try_admit("prefetch", kind)
+            if slot is None:
+                self._bump('cancelled_load')
+                return
+        try:
+            start = time.monotonic()
+            value = self._generate(kind, params)
+        except PrefetchCancelled:
+            self._bump('cancelled_load')
+            print(f"⏹️ Prefetch of {kind} cancelled: interactive load is high")
+            return
+        finally:
+            if slot is not None:
+                slot.release()
+        if value is None:
+            self._bump('failed')
+            return
+        cache.set(key, value, namespace="prefetch", ttl_seconds=self.ttl_seconds)
+        self._bump('completed')
+        print(f"🔮 Prefetched {kind} on \"{params.get('topic')}\" in {time.monotonic() - start:.1f} s")
+
+    def _generate(self, kind, params):
+        if kind == 'quiz':
+            questions = []
+            stream = stream_quiz(params['topic'], params['num_questions'], params['language'])
+            try:
+                for question in stream:
+                    questions.append(question)
+                    # Between two questions: give the model back to interactive requests
+                    self._check_load(kind)
+            finally:
+                stream.close()
+            return {"questions": questions, "language": params['language']} if questions else None
+        if kind == 'exercise':
+            # One LLM call (plus a possible repair): checked before and after only
+            exercise = generate_exercise(params['topic'], params['difficulty'], from_course=True, use_cache=False)
+            self._check_load(kind)
+            return exercise
+        raise ValueError(f"Unknown prefetch kind: {kind}")
+
+    # === Consumption ===
+
+    def take(self, kind, user_id, **params):
+        """Returns the prefetched result (once) or None"""
+        try:
+            value = get_response_cache().pop(self._key(kind, user_id, params))
+        except sqlite3.Error as e:
+            print(f"⚠️ Prefetch cache unavailable: {e}")
+            value = None
+        self._bump('hits' if value is not None else 'misses')
+        if value is not None:
+            print(f"⚡ Prefetched {kind} served")
+        return value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+        taken = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / taken, 3) if taken else 0.0
+        return stats
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def is_prefetch_enabled():
+    # Speculative work costs LLM calls that may never be used: opt-in
+    return os.getenv("AI_PREFETCH_ENABLED", "0") == "1" and is_cache_enabled()
+
+
+def get_prefetcher():
+    """Returns the process-wide prefetcher configured from environment"""
+    global _prefetcher
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = Prefetcher(
+                    ttl_seconds=int(os.getenv("AI_PREFETCH_TTL", "900")),
+                    max_pending=int(os.getenv("AI_PREFETCH_MAX_PENDING", "20")),
+                    max_load=float(os.getenv("AI_PREFETCH_MAX_LOAD", "0.5")),
+                )
+    return _prefetcher
+
+
+def _language(user):
+    return getattr(user, 'language_preference', None) or "fr"
+
+
+def prefetch_after_course(user, topic):
+    """Called once a course is shown: prepares the quiz and exercise its page links to"""
+    if not is_prefetch_enabled() or not getattr(user, 'is_authenticated', False) or not topic:
+        return
+    prefetcher = get_prefetcher()
+    prefetcher.schedule('quiz', user.id, topic=topic, num_questions=COURSE_QUIZ_QUESTIONS, language=_language(user))
+    prefetcher.schedule('exercise', user.id, topic=topic, difficulty=COURSE_EXERCISE_DIFFICULTY)
+
+
+def take_prefetched_quiz(user, topic, num_questions):
+    """{"questions", "language"} prefetched for this user and quiz, or None"""
+    if not is_prefetch_enabled() or not getattr(user, 'is_authenticated', False):
+        return None
+    return get_prefetcher().take('quiz', user.id, topic=topic, num_questions=num_questions, language=_language(user))
+
+
+def take_prefetched_exercise(user, topic, difficulty):
+    """Exercise dict prefetched for this user and course topic, or None"""
+    if not is_prefetch_enabled() or not getattr(user, 'is_authenticated', False):
+        return None
+    return get_prefetcher().take('exercise', user.id, topic=topic, difficulty=difficulty)
@@ -0,0 +1,103 @@
+# apps/agents/testing.py
+# Helpers shared by the test suites of the AI apps
+
+import json
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+
+from apps.agents.tools import admission, response_cache
+
+
+@contextmanager
+def temp_response_cache(**options):
+    """Enabled response cache in a temporary SQLite file, for the duration of the block"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = response_cache.ResponseCache(path=Path(tmp) / "responses.sqlite3", **options)
+        with mock.patch.object(response_cache, "_cache", cache), \
+                mock.patch.dict("os.environ", {"AI_RESPONSE_CACHE_ENABLED": "1"}):
+            yield cache
+        if cache._conn is not None:
+            cache._conn.close()
+
+
+@contextmanager
+def temp_admission_controller(**options):
+    """Fresh admission controller (own rate limits and slots) for the duration of the block"""
+    controller = admission.AdmissionController(**options)
+    with mock.patch.object(admission, "_controller", controller):
+        yield controller
+
+
+def wait_for(condition, timeout=5):
+    """Polls condition() until it holds, fails the test after `timeout` seconds"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+class FakeChain:
+    """
+    Chain double: invoke() fires the retriever and token callbacks of a real
+    streaming chain, then returns `result` (or raises `error`)
+    """
+
+    def __init__(self, tokens=(), sources=(), result=None, error=None):
+        self.tokens = list(tokens)
+        self.sources = list(sources)
+        self.result = result if result is not None else {'result': "".join(self.tokens)}
+        self.error = error
+        self.calls = []
+
+    def invoke(self, inputs, config=None):
+        from langchain_core.documents import Document
+        self.calls.append(inputs)
+        handlers = (config or {}).get("callbacks", [])
+        for handler in handlers:
+            if self.sources:
+                handler.on_retriever_end([Document(page_content="", metadata={'source': s}) for s in self.sources])
+            for token in self.tokens:
+                handler.on_llm_new_token(token)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def read_sse(response):
+    """Returns the [(event, data), ...] sent by a Server-Sent Events response"""
+    return _parse_sse(b"".join(response.streaming_content))
+
+
+async def aread_sse(response):
+    """read_sse for the streaming response of an async view"""
+    return _parse_sse(b"".join([chunk async for chunk in response.streaming_content]))
+
+
+def _parse_sse(body):
+    body = body.decode("utf-8")
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def question(text, options=("A1", "B1", "C1", "D1"), correct_answer=0, explanation=""):
+    """Quiz question dict as parsed from the model output"""
+    return {"question": text, "options": list(options), "correct_answer": correct_answer, "explanation": explanation}
+
+
+def quiz_text(questions):
+    """Model output for `questions`, in the text format of the coach prompt"""
+    blocks = []
+    for number, q in enumerate(questions, 1):
+        lines = [f"Q{number}. {q['question']}"]
+        lines += [f"{letter}. {option}" for letter, option in zip("ABCD", q["options"])]
+        lines.append(f"Answer: {'ABCD'[q['correct_answer']]}")
+        lines.append(f"Explanation: {q['explanation'] or 'Because.'}")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks) + "\n"
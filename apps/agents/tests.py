@@ -0,0 +1,1321 @@
+import asyncio
+import contextvars
+import json
+import threading
+import time
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse, StreamingHttpResponse
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel, generate_from_stream
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, LLMResult
+from langchain_core.retrievers import BaseRetriever
+
+from apps.agents import jobs, prefetch, warmup
+from apps.agents.traces import LLMTrace, TraceWriter
+from apps.agents.apps import _is_server_process
+from apps.agents.engine import AIEngine
+from apps.agents.testing import question, temp_admission_controller, temp_response_cache, wait_for
+from apps.agents.tools import llm_loader
+from apps.agents.tools import response_cache, semantic_cache, telemetry
+from apps.agents.tools.admission import AdmissionController, AdmissionRejected, TokenBucket, admission_controlled
+from apps.agents.tools.circuit_breaker import CircuitBreaker, CircuitOpen
+from apps.agents.tools.context_packing import (
+    PackedRetriever, context_budget, drop_near_duplicates, fit_budget, merge_adjacent, pack_documents,
+    packed_retriever, strip_repeated_lines,
+)
+from apps.agents.tools.fake_llm import FakeChatModel, prompt_key, prompt_text
+from apps.agents.tools.hedging import _DONE, HedgedChatModel, _Race
+from apps.agents.tools.metrics import Counter, Histogram, render
+from apps.agents.tools.model_router import ModelRouter, RoutedLLM, parse_routes, track_routes
+from apps.agents.tools.response_cache import Uncached, _producer, acached_generation, cached_generation
+from apps.agents.tools.single_flight import SingleFlight
+from apps.agents.utils import parse_text_quiz
+
+
+class LLMPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(llm_loader, "_build_llm", side_effect=lambda *args: object())
+        self.build = patcher.start()
+        self.addCleanup(patcher.stop)
+        env = mock.patch.dict("os.environ", {"GROQ_API_KEY": ""})
+        env.start()
+        self.addCleanup(env.stop)
+        llm_loader.reset_llm_pool()
+        self.addCleanup(llm_loader.reset_llm_pool)
+
+    def test_same_arguments_reuse_the_client(self):
+        first = llm_loader.get_llm("mistral", temperature=0.2)
+        self.assertIs(llm_loader.get_llm("mistral", temperature=0.2), first)
+        self.assertEqual(self.build.call_count, 1)
+
+    def test_other_model_or_params_build_another_client(self):
+        first = llm_loader.get_llm("mistral", temperature=0.2)
+        self.assertIsNot(llm_loader.get_llm("mistral", temperature=0.7), first)
+        self.assertIsNot(llm_loader.get_llm("llama3", temperature=0.2), first)
+        self.assertEqual(self.build.call_count, 3)
+
+    def test_unhashable_params_are_pooled(self):
+        first = llm_loader.get_llm("mistral", model_kwargs={"top_p": 0.9, "seed": 1}, stop=["\n"])
+        again = llm_loader.get_llm("mistral", stop=["\n"], model_kwargs={"seed": 1, "top_p": 0.9})
+        self.assertIs(again, first)
+
+    def test_stats_count_hits_and_creations(self):
+        before = llm_loader.get_pool_stats()
+        llm_loader.get_llm("mistral")
+        llm_loader.get_llm("mistral")
+        stats = llm_loader.get_pool_stats()
+        self.assertEqual(stats["creations"] - before["creations"], 1)
+        self.assertEqual(stats["hits"] - before["hits"], 1)
+        self.assertEqual(stats["clients"], 1)
+
+
+class AIEngineTests(SimpleTestCase):
+
+    def test_chains_are_built_once_on_first_access(self):
+        engine = AIEngine()
+        factory = mock.Mock(side_effect=lambda: object())
+        engine._factories['researcher'] = factory
+
+        self.assertFalse(engine.is_built('researcher'))
+        chain = engine.researcher
+        self.assertIs(engine.researcher, chain)
+        self.assertEqual(factory.call_count, 1)
+        self.assertFalse(engine.is_built('pedagogue'))
+
+    def test_reset_rebuilds_on_next_access(self):
+        engine = AIEngine()
+        engine._factories['pedagogue'] = lambda: object()
+        chain = engine.pedagogue
+        engine.reset()
+        self.assertIsNot(engine.pedagogue, chain)
+
+
+class WarmUpTests(SimpleTestCase):
+
+    def setUp(self):
+        saved = {name: dict(state) for name, state in warmup._state.items()}
+        self.addCleanup(warmup._state.update, saved)
+        warmers = mock.patch.dict(warmup._WARMERS, {name: (lambda: None) for name in warmup.COMPONENTS})
+        warmers.start()
+        self.addCleanup(warmers.stop)
+
+    def test_failing_component_is_reported_and_the_others_still_run(self):
+        def fail():
+            raise RuntimeError("ollama down")
+        warmup._WARMERS['embeddings'] = fail
+
+        report = warmup.warm_up()
+
+        self.assertFalse(report['ready'])
+        self.assertEqual(report['components']['embeddings']['error'], "ollama down")
+        self.assertTrue(report['components']['llm']['ready'])
+
+    def test_readiness_endpoint_answers_503_until_everything_is_warm(self):
+        warmup._state.update({name: {'ready': False, 'error': None, 'duration_ms': None}
+                              for name in warmup.COMPONENTS})
+        self.assertEqual(self.client.get(reverse('agents:readiness')).status_code, 503)
+
+        warmup.warm_up()
+        response = self.client.get(reverse('agents:readiness'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['ready'])
+
+
+class ServerProcessTests(SimpleTestCase):
+
+    def _detect(self, argv, **env):
+        env.setdefault("AI_SERVER_PROCESS", "")
+        with mock.patch("sys.argv", argv), mock.patch.dict("os.environ", env):
+            return _is_server_process()
+
+    def test_management_commands_are_not_servers(self):
+        self.assertFalse(self._detect(["manage.py", "migrate"]))
+        self.assertFalse(self._detect(["manage.py", "test"]))
+
+    def test_runserver_only_in_the_serving_child(self):
+        self.assertFalse(self._detect(["manage.py", "runserver"], RUN_MAIN=""))
+        self.assertTrue(self._detect(["manage.py", "runserver"], RUN_MAIN="true"))
+        self.assertTrue(self._detect(["manage.py", "runserver", "--noreload"], RUN_MAIN=""))
+
+    def test_asgi_and_wsgi_servers(self):
+        self.assertTrue(self._detect(["/venv/bin/daphne", "eduai_project.asgi:application"]))
+        self.assertTrue(self._detect(["/venv/lib/uvicorn/__main__.py", "eduai_project.asgi:application"]))
+        self.assertFalse(self._detect(["/venv/bin/pytest"]))
+
+    def test_environment_forces_the_detection(self):
+        self.assertTrue(self._detect(["script.py"], AI_SERVER_PROCESS="1"))
+        self.assertFalse(self._detect(["/venv/bin/daphne"], AI_SERVER_PROCESS="0"))
+
+
+class ResponseCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = self.enterContext(temp_response_cache(max_entries=2))
+
+    def _generate(self, topic, value, **kwargs):
+        compute = mock.Mock(return_value=value)
+        result = cached_generation("quiz", "mistral", "template", {"topic": topic}, compute, **kwargs)
+        return result, compute.call_count
+
+    def test_second_identical_call_is_served_from_the_cache(self):
+        self.assertEqual(self._generate("lists", {"q": 1}), ({"q": 1}, 1))
+        self.assertEqual(self._generate("lists", {"q": 2}), ({"q": 1}, 0))
+        self.assertEqual(self._generate("dicts", {"q": 3}), ({"q": 3}, 1))
+
+    def test_use_cache_false_bypasses_it(self):
+        self._generate("lists", {"q": 1})
+        self.assertEqual(self._generate("lists", {"q": 2}, use_cache=False), ({"q": 2}, 1))
+
+    def test_failures_and_uncached_values_are_not_stored(self):
+        self.assertEqual(self._generate("lists", None), (None, 1))
+        self.assertEqual(self._generate("lists", Uncached({"q": "fallback"})), ({"q": "fallback"}, 1))
+        self.assertEqual(self._generate("lists", {"q": 1}), ({"q": 1}, 1))
+
+    def test_async_variant_shares_the_cache_and_skips_uncached_values(self):
+        async def fallback():
+            return Uncached({"q": "fallback"})
+
+        async def compute():
+            return {"q": 1}
+
+        async def generate(acompute):
+            return await acached_generation("quiz", "mistral", "template", {"topic": "lists"}, acompute)
+
+        self.assertEqual(asyncio.run(generate(fallback)), {"q": "fallback"})
+        self.assertEqual(asyncio.run(generate(compute)), {"q": 1})
+        self.assertEqual(self._generate("lists", {"q": 2}), ({"q": 1}, 0))
+
+    def test_expired_entries_are_recomputed(self):
+        key = self.cache.make_key("quiz", "m", "t", {})
+        self.cache.set(key, {"q": 1}, ttl_seconds=60)
+        self.assertEqual(self.cache.get(key), {"q": 1})
+        with mock.patch("time.time", return_value=time.time() + 120):
+            self.assertIsNone(self.cache.get(key))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        keys = [self.cache.make_key("quiz", "m", "t", {"n": n}) for n in range(3)]
+        now = time.time()
+        for offset, key in enumerate(keys[:2]):
+            with mock.patch("time.time", return_value=now + offset):
+                self.cache.set(key, offset)
+        with mock.patch("time.time", return_value=now + 2):
+            self.cache.get(keys[0])
+        with mock.patch("time.time", return_value=now + 3):
+            self.cache.set(keys[2], 2)
+
+        self.assertEqual(self.cache.get(keys[0]), 0)
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertEqual(self.cache.get(keys[2]), 2)
+
+
+class _VectorEmbeddings:
+    """Embeds each known question to a fixed vector"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+
+class SemanticCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.embeddings = _VectorEmbeddings({
+            "What is a list?": [1.0, 0.0, 0.0],
+            "What's a list?": [0.99, 0.1, 0.0],
+            "What is a dict?": [0.6, 0.8, 0.0],
+        })
+        self.index_version = 1
+        for name, value in (("load_embedding_function", lambda: self.embeddings),
+                            ("get_index_version", lambda: self.index_version)):
+            patcher = mock.patch.object(semantic_cache, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.cache = semantic_cache.SemanticCache(threshold=0.92)
+        self.cache.store(self.cache.embed("What is a list?"), "python", "fr", "A sequence.", ["lists.md"])
+
+    def _lookup(self, question, module="python", language="fr"):
+        return self.cache.lookup(self.cache.embed(question), module, language)
+
+    def test_paraphrase_above_the_threshold_is_a_hit(self):
+        hit = self._lookup("What's a list?")
+        self.assertEqual(hit['answer'], "A sequence.")
+        self.assertGreaterEqual(hit['similarity'], 0.92)
+
+    def test_other_question_below_the_threshold_is_a_miss(self):
+        self.assertIsNone(self._lookup("What is a dict?"))
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 1))
+
+    def test_other_module_or_language_is_a_miss(self):
+        self.assertIsNone(self._lookup("What is a list?", module="java"))
+        self.assertIsNone(self._lookup("What is a list?", language="en"))
+
+    def test_index_change_drops_the_entries(self):
+        self.index_version = 2
+        self.assertIsNone(self._lookup("What is a list?"))
+        self.assertEqual(self.cache.stats()['invalidations'], 1)
+
+    def test_long_inputs_are_not_embedded(self):
+        self.assertIsNone(self.cache.embed("x" * 501))
+
+    def test_open_embeddings_circuit_skips_the_cache(self):
+        self.embeddings.embed_query = mock.Mock(side_effect=CircuitOpen("ollama", 30))
+
+        self.assertIsNone(self.cache.embed("What is a list?"))
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def _run_concurrently(self, flight, fn, callers=5):
+        """Calls flight.do() from `callers` threads while the leader is held, returns their outcomes"""
+        release = threading.Event()
+        outcomes = []
+
+        def call():
+            try:
+                outcomes.append(flight.do("key", lambda: fn(release)))
+            except Exception as e:
+                outcomes.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: flight.stats()['shared'] == callers - 1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        return outcomes
+
+    def test_concurrent_calls_share_one_result(self):
+        flight = SingleFlight()
+        calls = []
+
+        def compute(release):
+            calls.append(1)
+            release.wait(5)
+            return {"value": 42}
+
+        outcomes = self._run_concurrently(flight, compute)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(outcomes, [{"value": 42}] * 5)
+        self.assertEqual(flight.stats()['in_flight'], 0)
+
+    def test_leader_error_reaches_every_caller(self):
+        flight = SingleFlight()
+
+        def fail(release):
+            release.wait(5)
+            raise RuntimeError("model down")
+
+        outcomes = self._run_concurrently(flight, fail, callers=3)
+
+        self.assertEqual(len(outcomes), 3)
+        self.assertTrue(all(isinstance(outcome, RuntimeError) for outcome in outcomes))
+
+    def test_recheck_result_skips_the_call(self):
+        flight = SingleFlight()
+
+        result = flight.do("key", lambda: self.fail("should not run"), recheck=lambda: "stored")
+
+        self.assertEqual(result, "stored")
+        self.assertEqual(flight.stats()['rechecked'], 1)
+
+    def test_sequential_calls_each_run(self):
+        flight = SingleFlight()
+        calls = []
+
+        for _ in range(2):
+            flight.do("key", lambda: calls.append(1))
+
+        self.assertEqual(len(calls), 2)
+
+    def test_async_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def main():
+            return await asyncio.gather(*(flight.ado("key", compute) for _ in range(4)))
+
+        self.assertEqual(asyncio.run(main()), ["done"] * 4)
+        self.assertEqual(len(calls), 1)
+
+    def test_identical_cache_misses_make_one_generation(self):
+        self.enterContext(temp_response_cache())
+        flight = SingleFlight()
+        self.enterContext(mock.patch.object(response_cache, "get_single_flight", return_value=flight))
+        calls = []
+
+        def compute(release):
+            calls.append(1)
+            release.wait(5)
+            return {"quiz": "lists"}
+
+        def generate(release):
+            return cached_generation("quiz", "mistral", "t", {"topic": "lists"}, lambda: compute(release))
+
+        release = threading.Event()
+        outcomes = []
+        threads = [threading.Thread(target=lambda: outcomes.append(generate(release))) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: flight.stats()['shared'] == 2)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(outcomes, [{"quiz": "lists"}] * 3)
+
+
+class GenerationJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="ada", email="ada@example.com", password="pw")
+
+    def setUp(self):
+        self.enterContext(mock.patch.object(jobs, "notify_job"))
+
+    def test_a_job_is_claimed_by_one_worker_only(self):
+        job = jobs.enqueue_job(self.user, "course", {"topic": "lists"})
+
+        claimed = jobs.claim_next_job("host:1:0")
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual((claimed.status, claimed.locked_by, claimed.attempts), ("running", "host:1:0", 1))
+        self.assertIsNone(jobs.claim_next_job("host:2:0"))
+
+    def test_failed_attempts_are_retried_with_backoff_then_fail(self):
+        handler = mock.Mock(side_effect=RuntimeError("model down"))
+        self.enterContext(mock.patch.object(jobs, "_load_handler", return_value=handler))
+        jobs.enqueue_job(self.user, "course", {"topic": "lists"}, max_attempts=2)
+
+        job = jobs.run_job(jobs.claim_next_job("host:1:0"))
+        self.assertEqual((job.status, job.error, job.locked_by), ("queued", "model down", ""))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIsNone(jobs.claim_next_job("host:1:0"))
+
+        jobs.GenerationJob.objects.filter(id=job.id).update(run_after=timezone.now())
+        job = jobs.run_job(jobs.claim_next_job("host:1:0"))
+        self.assertEqual((job.status, job.attempts), ("failed", 2))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(handler.call_count, 2)
+
+    def test_job_is_postponed_without_using_an_attempt_when_the_model_is_busy(self):
+        handler = mock.Mock()
+        self.enterContext(mock.patch.object(jobs, "_load_handler", return_value=handler))
+        self.enterContext(mock.patch.object(jobs, "_admit", side_effect=AdmissionRejected('queue_full', 20)))
+        jobs.enqueue_job(self.user, "course", {"topic": "lists"})
+
+        job = jobs.run_job(jobs.claim_next_job("host:1:0"))
+        self.assertEqual((job.status, job.attempts, job.locked_by), ("queued", 0, ""))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=15))
+        handler.assert_not_called()
+
+    def test_successful_job_stores_its_result(self):
+        self.enterContext(mock.patch.object(jobs, "_load_handler", return_value=lambda job: {"course_id": 7}))
+        job = jobs.enqueue_job(self.user, "course", {"topic": "lists"})
+
+        job = jobs.run_job(jobs.claim_next_job("host:1:0"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), ("succeeded", {"course_id": 7}))
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse("agents:job_status", args=[job.id])).json()["status"], "succeeded")
+
+    def test_only_jobs_whose_lock_went_stale_are_requeued(self):
+        self.enterContext(mock.patch.dict("os.environ", {"AI_JOBS_STALE_SECONDS": "120"}))
+        alive = jobs.enqueue_job(self.user, "course", {"topic": "lists"})
+        crashed = jobs.enqueue_job(self.user, "exercise", {"topic": "loops"})
+        jobs.claim_next_job("host:1:0")
+        jobs.claim_next_job("host:2:0")
+        long_ago = timezone.now() - timedelta(minutes=10)
+        jobs.GenerationJob.objects.update(locked_at=long_ago)
+
+        # The live worker's heartbeat refreshes its lock, the crashed one's doesn't
+        alive.refresh_from_db()
+        self.assertTrue(jobs._touch(alive))
+        self.assertEqual(jobs.requeue_stale_jobs(), 1)
+
+        alive.refresh_from_db()
+        crashed.refresh_from_db()
+        self.assertEqual(alive.status, "running")
+        self.assertEqual((crashed.status, crashed.locked_by), ("queued", ""))
+        # A worker whose job was requeued has lost it
+        self.assertFalse(jobs._touch(jobs.GenerationJob(id=crashed.id, locked_by="host:2:0")))
+
+
+class JobThreadsTests(SimpleTestCase):
+
+    def test_heartbeat_touches_the_job_until_the_block_ends(self):
+        self.enterContext(mock.patch.dict("os.environ", {"AI_JOBS_HEARTBEAT_SECONDS": "0.01"}))
+        touch = self.enterContext(mock.patch.object(jobs, "_touch"))
+        job = jobs.GenerationJob(id=1, locked_by="host:1:0")
+
+        with jobs._heartbeat(job):
+            wait_for(lambda: touch.call_count >= 2)
+        beats = touch.call_count
+        time.sleep(0.05)
+        self.assertEqual(touch.call_count, beats)
+        touch.assert_called_with(job)
+
+    def test_sweeper_requeues_on_a_timer_until_stopped(self):
+        sweep = self.enterContext(mock.patch.object(jobs, "requeue_stale_jobs", side_effect=[RuntimeError, 0, 0, 0, 0]))
+        stop = threading.Event()
+
+        thread = jobs.start_stale_job_sweeper(stop, interval=0.01)
+        # A failed sweep doesn't stop the thread
+        wait_for(lambda: sweep.call_count >= 2)
+        stop.set()
+        thread.join(1)
+        self.assertFalse(thread.is_alive())
+
+    def test_claiming_does_not_sweep(self):
+        sweep = self.enterContext(mock.patch.object(jobs, "requeue_stale_jobs"))
+        with mock.patch.object(jobs.GenerationJob.objects, "filter") as query:
+            query.return_value.order_by.return_value.values_list.return_value = []
+            self.assertIsNone(jobs.claim_next_job("host:1:0"))
+        sweep.assert_not_called()
+
+
+class AdmissionTests(SimpleTestCase):
+    GATE = "test:model"
+
+    def test_token_bucket_allows_a_burst_then_waits_for_a_refill(self):
+        bucket = TokenBucket(rate=0.5, capacity=2)
+
+        self.assertEqual(bucket.take(), 0)
+        self.assertEqual(bucket.take(), 0)
+        self.assertAlmostEqual(bucket.take(), 2.0, delta=0.1)
+
+    def test_token_bucket_refills_over_time(self):
+        bucket = TokenBucket(rate=1000, capacity=1)
+        bucket.take()
+        time.sleep(0.01)
+
+        self.assertEqual(bucket.take(), 0)
+
+    def test_rate_limit_is_per_user(self):
+        controller = AdmissionController(rate_per_minute=1, burst=2)
+        controller.check_rate("user:1")
+        controller.check_rate("user:1")
+
+        with self.assertRaises(AdmissionRejected) as rejected:
+            controller.check_rate("user:1")
+        self.assertEqual(rejected.exception.reason, 'rate_limited')
+        self.assertGreaterEqual(rejected.exception.retry_after, 1)
+        controller.check_rate("user:2")
+
+    def test_freed_slots_go_round_robin_between_users(self):
+        controller = AdmissionController(max_concurrent=1, max_queued_per_user=3)
+        slot = controller.acquire(self.GATE, "user:a")
+        # user:a queues a burst before user:b asks once
+        waiters = [controller._enter(self.GATE, user) for user in ("user:a", "user:a", "user:b")]
+        granted = []
+
+        slot.release()
+        for _ in waiters:
+            winner = next(waiter for waiter in waiters if waiter.granted and waiter not in granted)
+            granted.append(winner)
+            controller._release(self.GATE)
+
+        self.assertEqual([waiter.user_key for waiter in granted], ["user:a", "user:b", "user:a"])
+        self.assertIs(granted[0], waiters[0])
+
+    def test_queue_is_bounded_per_user(self):
+        controller = AdmissionController(max_concurrent=1, max_queued_per_user=1)
+        controller.acquire(self.GATE, "user:a")
+        controller._enter(self.GATE, "user:a")
+
+        with self.assertRaises(AdmissionRejected) as rejected:
+            controller._enter(self.GATE, "user:a")
+        self.assertEqual(rejected.exception.reason, 'queue_full')
+        self.assertIsNotNone(controller._enter(self.GATE, "user:b"))
+
+    def test_wait_timeout_rejects_and_leaves_the_queue(self):
+        controller = AdmissionController(max_concurrent=1, max_wait=0.05)
+        controller.acquire(self.GATE, "user:a")
+
+        with self.assertRaises(AdmissionRejected) as rejected:
+            controller.acquire(self.GATE, "user:b")
+        self.assertEqual(rejected.exception.reason, 'wait_timeout')
+        self.assertEqual(controller.stats()['queue_depth'], 0)
+
+    def test_slot_release_is_idempotent(self):
+        controller = AdmissionController(max_concurrent=1)
+        slot = controller.acquire(self.GATE, "user:a")
+
+        slot.release()
+        slot.release()
+        self.assertEqual(controller.stats()['models'][self.GATE]['active'], 0)
+
+    def test_model_limits_override_the_default(self):
+        controller = AdmissionController(max_concurrent=4, model_limits={"model": 1})
+        controller.acquire(self.GATE, "user:a")
+
+        self.assertIsNotNone(controller._enter(self.GATE, "user:b"))
+
+
+class AdmissionControlledViewTests(SimpleTestCase):
+
+    def setUp(self):
+        self.controller = self.enterContext(temp_admission_controller(rate_per_minute=60, burst=1, max_concurrent=1))
+        self.enterContext(mock.patch.dict("os.environ", {"AI_ADMISSION_ENABLED": "1"}))
+        self.request = RequestFactory().post("/generate/")
+        self.request.user = AnonymousUser()
+
+    def active_slots(self):
+        return sum(model['active'] for model in self.controller.stats()['models'].values())
+
+    def test_rate_limited_request_gets_429_with_retry_after(self):
+        view = admission_controlled(lambda request: HttpResponse("ok"), task="chat")
+
+        self.assertEqual(view(self.request).status_code, 200)
+        response = view(self.request)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+
+    def test_streamed_response_holds_its_slot_until_sent(self):
+        view = admission_controlled(lambda request: StreamingHttpResponse(iter([b"a", b"b"])), task="chat")
+
+        response = view(self.request)
+        self.assertEqual(self.active_slots(), 1)
+        self.assertEqual(b"".join(response.streaming_content), b"ab")
+        self.assertEqual(self.active_slots(), 0)
+
+    def test_other_methods_are_not_controlled(self):
+        view = admission_controlled(lambda request: HttpResponse("ok"), task="chat", methods=("POST",))
+        request = RequestFactory().get("/generate/")
+        request.user = AnonymousUser()
+
+        for _ in range(3):
+            self.assertEqual(view(request).status_code, 200)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def _open_breaker(self, open_seconds):
+        breaker = CircuitBreaker("test", window=4, min_calls=4, open_seconds=open_seconds)
+        for ok in (True, False, True, False):
+            breaker.record(ok)
+        return breaker
+
+    def test_stays_closed_below_min_calls(self):
+        breaker = CircuitBreaker("test", window=4, min_calls=4)
+        for _ in range(3):
+            breaker.record(False)
+
+        self.assertEqual(breaker.state, 'closed')
+        breaker.before_call()
+
+    def test_opens_at_the_failure_threshold_and_refuses_calls(self):
+        breaker = self._open_breaker(open_seconds=60)
+
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.is_call_permitted())
+        with self.assertRaises(CircuitOpen) as refused:
+            breaker.before_call()
+        self.assertEqual(refused.exception.provider, "test")
+        self.assertGreaterEqual(refused.exception.retry_after, 59)
+
+    def test_opens_on_slow_calls(self):
+        breaker = CircuitBreaker("test", window=4, min_calls=4, slow_threshold=0.75)
+        for slow in (True, True, False, True):
+            breaker.record(True, slow=slow)
+
+        self.assertEqual(breaker.state, 'open')
+
+    def test_successful_probe_closes_the_circuit(self):
+        breaker = self._open_breaker(open_seconds=0)
+
+        self.assertEqual(breaker.state, 'half_open')
+        breaker.before_call()
+        breaker.record(True)
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_failed_probe_opens_it_again(self):
+        breaker = self._open_breaker(open_seconds=0)
+        breaker.before_call()
+        breaker.open_seconds = 60
+        breaker.record(False)
+
+        self.assertEqual(breaker.state, 'open')
+        self.assertEqual(breaker.stats()['opened'], 2)
+
+    def test_one_probe_at_a_time(self):
+        breaker = self._open_breaker(open_seconds=0)
+        breaker.open_seconds = 60
+        breaker.before_call()
+
+        with self.assertRaises(CircuitOpen):
+            breaker.before_call()
+
+
+class _ClosedBreaker:
+    state = 'closed'
+
+    def is_call_permitted(self):
+        return True
+
+    def before_call(self):
+        pass
+
+    def record(self, ok, slow=False):
+        pass
+
+    def retry_after(self):
+        return 0.0
+
+
+class ModelRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.breakers = {}
+        self.enterContext(mock.patch("apps.agents.tools.model_router.is_provider_available", return_value=True))
+        self.enterContext(mock.patch("apps.agents.tools.model_router.get_breaker",
+                                     side_effect=lambda provider: self.breakers.get(provider) or _ClosedBreaker()))
+
+    def _router(self, routes, **options):
+        options.setdefault('probe_rate', 0)
+        return ModelRouter({"chat": parse_routes(routes)}, max_p95={"chat": 5}, **options)
+
+    def _record(self, router, key, latency, ok=True, count=5):
+        route = next(route for route in router.routes["chat"] if route.key == key)
+        for _ in range(count):
+            router.record("chat", route, latency, ok)
+
+    def test_parse_routes(self):
+        routes = parse_routes("groq:meta-llama/llama-4-scout@3, ollama:llama3.2:3b@1, ollama:mistral")
+
+        self.assertEqual([(route.key, route.tier) for route in routes],
+                         [("groq:meta-llama/llama-4-scout", 3), ("ollama:llama3.2:3b", 1), ("ollama:mistral", 3)])
+
+    def test_healthy_primary_is_chosen(self):
+        router = self._router("a:big@3, b:fast@3")
+        self._record(router, "b:fast", 0.1)
+
+        self.assertEqual(router.choose("chat").key, "a:big")
+
+    def test_routes_below_the_task_tier_are_never_chosen(self):
+        router = self._router("a:big@3, b:small@1", min_tiers={"chat": 2})
+        self._record(router, "a:big", 1, ok=False)
+
+        self.assertEqual([route.key for route in router.candidates("chat")], ["a:big"])
+        self.assertEqual(router.choose("chat").key, "a:big")
+
+    def test_failing_primary_shifts_traffic_to_the_fastest_healthy_route(self):
+        router = self._router("a:big@3, b:slow@3, c:fast@3")
+        self._record(router, "a:big", 1, ok=False)
+        self._record(router, "b:slow", 3)
+        self._record(router, "c:fast", 1)
+
+        self.assertEqual(router.choose("chat").key, "c:fast")
+        self.assertEqual(router.current_key("chat"), "c:fast")
+
+    def test_slow_primary_is_degraded(self):
+        router = self._router("a:big@3, b:fast@3")
+        self._record(router, "a:big", 9)
+
+        self.assertEqual(router.choose("chat").key, "b:fast")
+
+    def test_open_circuit_skips_the_provider(self):
+        self.breakers["a"] = CircuitBreaker("a", window=1, min_calls=1, open_seconds=60)
+        self.breakers["a"].record(False)
+        router = self._router("a:big@3, b:fast@3")
+
+        self.assertEqual(router.choose("chat").key, "b:fast")
+
+    def test_all_circuits_open_raises(self):
+        self.breakers["a"] = CircuitBreaker("a", window=1, min_calls=1, open_seconds=60)
+        self.breakers["a"].record(False)
+        router = self._router("a:big@3")
+
+        with self.assertRaises(CircuitOpen):
+            router.choose("chat")
+
+    def test_current_key_defaults_to_the_first_candidate(self):
+        self.assertEqual(self._router("a:big@3, b:fast@3").current_key("chat"), "a:big")
+
+    def test_served_routes_are_tracked(self):
+        router = self._router("a:big@3, b:fast@3")
+        self._record(router, "a:big", 1, ok=False)
+        client = mock.Mock()
+        client.invoke.return_value = "answer"
+        llm = RoutedLLM("chat", router=router)
+
+        with mock.patch.object(RoutedLLM, "_client", return_value=client):
+            with track_routes() as served:
+                self.assertEqual(llm.invoke("question"), "answer")
+
+        self.assertEqual(served, {"b:fast"})
+
+    def test_generation_is_stored_under_the_route_that_served_it(self):
+        self.assertEqual(_producer("a:big", set()), "a:big")
+        self.assertEqual(_producer("a:big", {"b:fast"}), "b:fast")
+        self.assertIsNone(_producer("a:big", {"a:big", "b:fast"}))
+
+    def test_fallback_output_is_not_served_as_the_primary_s(self):
+        cache = self.enterContext(temp_response_cache())
+        router = self._router("a:big@3, b:fast@3")
+        self._record(router, "a:big", 1, ok=False)
+        client = mock.Mock()
+        client.invoke.return_value = "fallback answer"
+        llm = RoutedLLM("chat", router=router)
+
+        with mock.patch.object(RoutedLLM, "_client", return_value=client):
+            cached_generation("chat", "a:big", "t", {"q": "lists"}, lambda: llm.invoke("lists"))
+
+        self.assertIsNone(cache.get(cache.make_key("chat", "a:big", "t", {"q": "lists"})))
+        self.assertEqual(cache.get(cache.make_key("chat", "b:fast", "t", {"q": "lists"})), "fallback answer")
+
+    def test_warm_up_loads_every_routed_model_once(self):
+        router = ModelRouter({
+            "chat": parse_routes("groq:big@3, ollama:mistral@1"),
+            "quiz": parse_routes("groq:big@3, ollama:llama3@2"),
+        })
+        self.enterContext(mock.patch.object(warmup, "get_router", return_value=router))
+        get_llm = self.enterContext(mock.patch.object(warmup, "get_llm"))
+
+        warmup._warm_llm()
+
+        self.assertEqual(sorted(call.args[0] for call in get_llm.call_args_list), ["big", "llama3", "mistral"])
+        get_llm.return_value.invoke.assert_any_call("ping", max_tokens=1)
+        get_llm.return_value.invoke.assert_any_call("ping", num_predict=1)
+
+
+class HedgingRaceTests(SimpleTestCase):
+    """Bookkeeping of HedgedChatModel: when to hedge, who wins, what is cancelled and reported"""
+
+    def setUp(self):
+        self.clock = 0.0
+        self.launched = []
+        self.cancelled = []
+        self.attempts = []
+        self.winners = []
+        self.race = _Race(
+            delay=2.0,
+            on_attempt=lambda index, seconds, ok, first_token: self.attempts.append((index, ok)),
+            launch=self.launched.append,
+            cancel=self.cancelled.append,
+            now=lambda: self.clock,
+            on_win=self.winners.append,
+        )
+        self.race.start()
+
+    def test_hedges_once_the_delay_has_passed(self):
+        self.clock = 1.5
+        self.assertAlmostEqual(self.race.timeout(), 0.5)
+        self.clock = 2.0
+        self.race.hedge()
+
+        self.assertEqual(self.launched, [0, 1])
+        self.assertIsNone(self.race.timeout())
+
+    def test_first_token_wins_and_the_other_attempt_is_cancelled(self):
+        self.race.hedge()
+
+        self.assertTrue(self.race.accept(1, "token"))
+        self.assertFalse(self.race.accept(0, "late token"))
+        self.assertEqual(self.winners, [1])
+        self.assertEqual(self.cancelled, [0])
+        self.assertFalse(self.race.accept(1, _DONE))
+        self.assertTrue(self.race.finished)
+        self.assertEqual(sorted(self.attempts), [(0, True), (1, True)])
+
+    def test_primary_failure_before_any_token_hands_over_to_the_secondary(self):
+        self.assertFalse(self.race.accept(0, RuntimeError("timeout")))
+
+        self.assertEqual(self.launched, [0, 1])
+        self.assertTrue(self.race.accept(1, "token"))
+        self.assertEqual(self.winners, [1])
+        self.assertEqual(self.attempts, [(0, False)])
+
+    def test_both_attempts_failing_raises_the_primary_error(self):
+        self.race.accept(0, RuntimeError("primary"))
+
+        with self.assertRaisesRegex(RuntimeError, "primary"):
+            self.race.accept(1, RuntimeError("secondary"))
+
+
+class _DelayedChatModel(BaseChatModel):
+    """Streams `text` word by word after `latency` seconds"""
+
+    text: str
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "delayed"
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for word in self.text.split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return generate_from_stream(self._stream(messages))
+
+
+class HedgedCallTests(SimpleTestCase):
+
+    def test_slow_primary_is_overtaken_by_the_hedge(self):
+        winners = []
+        model = HedgedChatModel(
+            primary=_DelayedChatModel(text="slow answer", latency=2),
+            secondary=_DelayedChatModel(text="fast answer"),
+            delay=0.05,
+            on_win=winners.append,
+        )
+
+        started = time.monotonic()
+        self.assertEqual(model.invoke("question").content.strip(), "fast answer")
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(winners, [1])
+
+    def test_hedged_call_goes_to_another_provider_and_reports_the_winner(self):
+        self.enterContext(mock.patch("apps.agents.tools.model_router.is_provider_available", return_value=True))
+        self.enterContext(mock.patch("apps.agents.tools.model_router.get_breaker", return_value=_ClosedBreaker()))
+        router = ModelRouter({"chat": parse_routes("groq:big@3, groq:small@1, ollama:mistral@1")},
+                             hedge_tasks=["chat"], hedge_delay=0.05, hedge_delay_bounds=(0.05, 1))
+        models = {
+            "groq:big": _DelayedChatModel(text="slow answer", latency=2),
+            "ollama:mistral": _DelayedChatModel(text="local answer"),
+        }
+        self.assertEqual(router.hedge_route("chat", router.routes["chat"][0]).key, "ollama:mistral")
+
+        with mock.patch.object(RoutedLLM, "_client", side_effect=lambda route: models[route.key]), \
+                track_routes() as served:
+            answer = RoutedLLM("chat", router=router).invoke("question")
+
+        self.assertEqual(answer.content.strip(), "local answer")
+        self.assertEqual(served, {"ollama:mistral"})
+
+
+class ContextPackingTests(SimpleTestCase):
+    TEXT = " ".join(f"Sentence {i} explains how Python lists grow." for i in range(40))
+
+    def _doc(self, text, source="lists.md", **metadata):
+        return Document(page_content=text, metadata=dict(metadata, source=source))
+
+    def test_merges_overlapping_chunks_by_start_index(self):
+        first = self._doc(self.TEXT[:300], start_index=0)
+        second = self._doc(self.TEXT[250:600], start_index=250)
+
+        merged = merge_adjacent([second, first])
+
+        self.assertEqual(len(merged), 1)
+        self.assertEqual(merged[0].page_content, self.TEXT[:600])
+        self.assertEqual(merged[0].metadata['start_index'], 0)
+
+    def test_merges_overlapping_chunks_by_text(self):
+        merged = merge_adjacent([self._doc(self.TEXT[:300]), self._doc(self.TEXT[200:500])])
+
+        self.assertEqual([doc.page_content for doc in merged], [self.TEXT[:500]])
+
+    def test_keeps_chunks_of_other_sources_apart(self):
+        docs = [self._doc(self.TEXT[:300]), self._doc(self.TEXT[200:500], source="other.md")]
+
+        self.assertEqual(len(merge_adjacent(docs)), 2)
+
+    def test_drops_near_duplicates_of_better_ranked_passages(self):
+        best = self._doc(self.TEXT[:400])
+        duplicate = self._doc(self.TEXT[:380] + " Almost the same.", source="copy.md")
+        other = self._doc("Dictionaries map keys to values, and lookups are fast.", source="dicts.md")
+
+        self.assertEqual(drop_near_duplicates([best, duplicate, other]), [best, other])
+
+    def test_strips_lines_repeated_from_a_better_ranked_passage(self):
+        banner = "Python course - chapter 3 - all rights reserved"
+        docs = [self._doc(f"{banner}\nLists are mutable."), self._doc(f"{banner}\nTuples are not.\nNote"),
+                self._doc(banner)]
+
+        stripped = strip_repeated_lines(docs)
+
+        self.assertEqual([doc.page_content for doc in stripped],
+                         [f"{banner}\nLists are mutable.", "Tuples are not.\nNote"])
+
+    def test_fit_budget_keeps_rank_order_and_cuts_the_first_passage_that_does_not_fit(self):
+        docs = [self._doc("a" * 400, source="1"), self._doc(self.TEXT, source="2"), self._doc("c" * 40, source="3")]
+
+        packed = fit_budget(docs, token_budget=200)
+
+        self.assertEqual([doc.metadata['source'] for doc in packed], ["1", "2"])
+        self.assertEqual(packed[0].page_content, "a" * 400)
+        self.assertTrue(packed[1].page_content.endswith(" …"))
+        self.assertLessEqual(len(packed[1].page_content), 100 * 4 + 2)
+
+    def test_pack_documents_respects_the_budget(self):
+        docs = [self._doc(self.TEXT[:800], start_index=0), self._doc(self.TEXT[700:1500], start_index=700)]
+
+        packed = pack_documents(docs, token_budget=150)
+
+        self.assertEqual(len(packed), 1)
+        self.assertLessEqual(len(packed[0].page_content), 150 * 4 + 2)
+        self.assertEqual(pack_documents([], 150), [])
+
+    def test_context_budget_is_the_smallest_of_the_models(self):
+        env = {"AI_CONTEXT_TOKEN_BUDGET": "1500", "AI_CONTEXT_BUDGETS": "mistral=800,llama3.2:3b=600"}
+        with mock.patch.dict("os.environ", env):
+            self.assertEqual(context_budget(["mistral", "llama3.2:3b"]), 600)
+            self.assertEqual(context_budget(["mistral", "other"]), 800)
+            self.assertEqual(context_budget(["other"]), 1500)
+            self.assertEqual(context_budget(), 1500)
+
+
+class _ListRetriever(BaseRetriever):
+    """Returns the same documents for every query"""
+
+    docs: list
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return self.docs
+
+
+class PackedRetrieverTests(SimpleTestCase):
+    TEXT = ContextPackingTests.TEXT
+
+    def setUp(self):
+        self.inner = _ListRetriever(docs=[
+            Document(page_content=self.TEXT[:600], metadata={'source': "lists.md", 'start_index': 0}),
+            Document(page_content=self.TEXT[400:1200], metadata={'source': "lists.md", 'start_index': 400}),
+        ])
+
+    def test_chains_receive_merged_passages_within_the_budget(self):
+        retriever = packed_retriever(self.inner, token_budget=1500)
+
+        docs = retriever.invoke("lists")
+
+        self.assertIsInstance(retriever, PackedRetriever)
+        self.assertEqual([doc.page_content for doc in docs], [self.TEXT[:1200]])
+
+    async def test_async_retrieval_is_packed_too(self):
+        docs = await packed_retriever(self.inner, token_budget=100).ainvoke("lists")
+
+        self.assertEqual(len(docs), 1)
+        self.assertLessEqual(len(docs[0].page_content), 100 * 4 + 2)
+
+    def test_disabled_packing_returns_the_retriever_as_is(self):
+        with mock.patch.dict("os.environ", {"AI_CONTEXT_PACKING": "0"}):
+            self.assertIs(packed_retriever(self.inner, 1500), self.inner)
+
+
+class MetricsTests(SimpleTestCase):
+
+    def test_counters_and_histograms_render_in_prometheus_format(self):
+        calls = Counter("eduai_test_calls_total", "Test calls", ("task", "model"))
+        calls.inc("chat", 'llama "3"')
+        calls.inc("chat", 'llama "3"', amount=2)
+        latency = Histogram("eduai_test_seconds", "Test latency", ("task",), buckets=(0.5, 1))
+        latency.observe(0.2, "chat")
+        latency.observe(0.7, "chat")
+        empty = Counter("eduai_test_unused_total", "Never incremented")
+
+        text = render([calls, latency, empty])
+
+        self.assertIn("# TYPE eduai_test_calls_total counter\n", text)
+        self.assertIn('eduai_test_calls_total{task="chat",model="llama \\"3\\""} 3\n', text)
+        self.assertIn('eduai_test_seconds_bucket{task="chat",le="0.5"} 1\n', text)
+        self.assertIn('eduai_test_seconds_bucket{task="chat",le="1"} 2\n', text)
+        self.assertIn('eduai_test_seconds_bucket{task="chat",le="+Inf"} 2\n', text)
+        self.assertIn('eduai_test_seconds_count{task="chat"} 2\n', text)
+        self.assertNotIn("eduai_test_unused_total", text)
+
+    def test_endpoint_takes_the_scraper_token_or_a_staff_session(self):
+        from apps.agents.views import metrics
+        factory = RequestFactory()
+        self.enterContext(mock.patch.dict("os.environ", {"AI_METRICS_TOKEN": "secret"}))
+
+        def get(user=None, **headers):
+            request = factory.get("/metrics", headers=headers)
+            request.user = user or AnonymousUser()
+            return metrics(request)
+
+        self.assertEqual(get().status_code, 403)
+        self.assertEqual(get(Authorization="Bearer wrong").status_code, 403)
+        response = get(Authorization="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"# TYPE eduai_llm_calls_total counter", response.content)
+        self.assertEqual(get(user=mock.Mock(is_authenticated=True, is_staff=True)).status_code, 200)
+
+
+class TelemetryHandlerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.calls = Counter("calls", "", ("task", "model", "status"))
+        self.enterContext(mock.patch.object(telemetry, "LLM_CALLS", self.calls))
+        self.enterContext(mock.patch.object(telemetry, "_cache_outcome", contextvars.ContextVar("cache", default="none")))
+        self.records = []
+
+    def _handler(self, sample_rate=1.0):
+        return telemetry.TelemetryHandler(persist=self.records.append, sample_rate=sample_rate)
+
+    def _llm_call(self, handler, parent, error=None):
+        run_id = uuid.uuid4()
+        handler.on_chat_model_start(
+            {"name": "ChatGroq"}, [[HumanMessage(content="What is a list?")]], run_id=run_id, parent_run_id=parent,
+            metadata={"agent_task": "chat", "ls_model_name": "llama3"},
+        )
+        if error is not None:
+            handler.on_llm_error(error, run_id=run_id)
+            return
+        handler.on_llm_new_token("A", run_id=run_id)
+        handler.on_llm_end(LLMResult(generations=[[ChatGeneration(message=AIMessage(content="A sequence."))]],
+                                     llm_output={"token_usage": {"prompt_tokens": 12, "completion_tokens": 3}}),
+                           run_id=run_id)
+
+    def test_agent_call_is_recorded_with_its_llm_calls(self):
+        handler = self._handler()
+        telemetry.note_cache("semantic", "miss")
+        root = uuid.uuid4()
+        handler.on_chain_start({"name": "RetrievalQA"}, {}, run_id=root)
+        self._llm_call(handler, root)
+        handler.on_chain_end({}, run_id=root)
+
+        [record] = self.records
+        self.assertEqual((record['task'], record['model'], record['status']), ("chat", "llama3", "ok"))
+        self.assertEqual((record['name'], record['cache']), ("RetrievalQA", "semantic:miss"))
+        self.assertEqual((record['llm_calls'], record['prompt_tokens'], record['completion_tokens']), (1, 12, 3))
+        self.assertIsNotNone(record['ttft_ms'])
+        self.assertEqual(self.calls.samples(), [("calls", '{task="chat",model="llama3",status="ok"}', 1)])
+
+    def test_failures_are_always_kept_successes_sampled(self):
+        handler = self._handler(sample_rate=0)
+        self._llm_call(handler, None)
+        self._llm_call(handler, None, error=RuntimeError("model down"))
+
+        [record] = self.records
+        self.assertEqual((record['status'], record['error']), ("error", "model down"))
+
+    def test_chain_without_llm_calls_is_not_an_agent_call(self):
+        handler = self._handler()
+        root = uuid.uuid4()
+        handler.on_chain_start({"name": "cached"}, {}, run_id=root)
+        handler.on_chain_end({}, run_id=root)
+
+        self.assertEqual(self.records, [])
+
+
+class TraceWriterTests(TestCase):
+
+    def _record(self, **fields):
+        return dict({'task': "chat", 'name': "RetrievalQA", 'model': "llama3", 'status': "ok", 'latency_ms': 900},
+                    **fields)
+
+    def test_batches_are_written_and_old_traces_pruned(self):
+        old = LLMTrace.objects.create(**self._record())
+        LLMTrace.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=8))
+
+        writer = TraceWriter(retention_days=7)
+        writer._write([self._record(), self._record(status="error", error="model down")])
+
+        self.assertEqual(sorted(LLMTrace.objects.values_list('status', flat=True)), ["error", "ok"])
+        self.assertEqual(writer.stats()['written'], 2)
+
+    def test_traces_are_dropped_when_the_queue_is_full(self):
+        writer = TraceWriter(max_queue=1)
+        with mock.patch.object(writer, "_start"):
+            writer.put(self._record())
+            writer.put(self._record())
+
+        self.assertEqual(writer.stats(), {'written': 0, 'dropped': 1, 'queued': 1})
+
+
+class FakeLLMTests(SimpleTestCase):
+
+    def _model(self, **options):
+        return FakeChatModel(latency=0, **options)
+
+    def test_quiz_prompt_gets_a_parseable_quiz_in_the_asked_language(self):
+        prompt = "TOPIC: lists\nNUMBER OF QUESTIONS: 3\nLANGUAGE: en"
+
+        answer = self._model().invoke(prompt).content
+
+        questions = parse_text_quiz(answer)['questions']
+        self.assertEqual(len(questions), 3)
+        self.assertEqual(len({question['question'] for question in questions}), 3)
+        self.assertIn("Answer: A", answer)
+
+    def test_exercise_prompt_gets_exercise_json(self):
+        exercise = json.loads(self._model().invoke('Return JSON with "starter_code" for topic: "loops"').content)
+
+        self.assertEqual(exercise['title'], "Exercise: loops")
+        self.assertEqual(len(exercise['tests']), 3)
+
+    def test_answers_are_deterministic_and_stream_word_by_word(self):
+        model = self._model(streaming=True)
+
+        chunks = [chunk.content for chunk in model.stream("What is a list?")]
+
+        self.assertGreater(len(chunks), 5)
+        self.assertEqual("".join(chunks), self._model().invoke("What is a list?").content)
+
+    def test_recorded_answer_is_replayed(self):
+        key = prompt_key(prompt_text([HumanMessage(content="What is a list?")]))
+        model = self._model(recordings={key: "A mutable sequence."})
+
+        self.assertEqual(model.invoke("What is a list?").content, "A mutable sequence.")
+
+    async def test_awaited_calls_sleep_without_blocking_the_loop(self):
+        model = FakeChatModel(latency=0.2, tokens_per_second=0)
+
+        started = time.monotonic()
+        await asyncio.gather(*(model.ainvoke(f"question {i}") for i in range(5)))
+
+        self.assertLess(time.monotonic() - started, 0.6)
+
+    def test_enabled_fake_llm_takes_precedence_over_the_providers(self):
+        with mock.patch.dict("os.environ", {"AI_FAKE_LLM": "1", "GROQ_API_KEY": "key"}):
+            self.assertEqual(llm_loader.get_provider(), "fake")
+            self.assertTrue(llm_loader.is_provider_available("fake"))
+            model = llm_loader._build_llm("fake", "llama3", None, {})
+
+        self.assertIsInstance(model, FakeChatModel)
+        self.assertEqual(model.model_name, "llama3")
+
+
+class PrefetchTests(SimpleTestCase):
+    QUIZ = {'topic': "lists", 'num_questions': 2, 'language': "fr"}
+
+    def setUp(self):
+        self.enterContext(temp_response_cache())
+        self.enterContext(mock.patch.dict("os.environ", {"AI_ADMISSION_ENABLED": "1", "GROQ_API_KEY": ""}))
+        self.controller = self.enterContext(temp_admission_controller(max_concurrent=4))
+        self.questions = [question("What does len() return?"), question("Which brackets make a list?")]
+        self.stream_quiz = self.enterContext(mock.patch.object(
+            prefetch, "stream_quiz", side_effect=lambda *args: (q for q in self.questions)))
+        self.prefetcher = prefetch.Prefetcher(max_load=0.5)
+
+    def _run(self, kind='quiz', **params):
+        params = params or self.QUIZ
+        self.prefetcher._run(self.prefetcher._key(kind, 1, params), kind, params, time.monotonic())
+
+    def _take(self, kind='quiz', **params):
+        return self.prefetcher.take(kind, 1, **(params or self.QUIZ))
+
+    def _busy(self, slots):
+        return [self.controller.admit(f"user:{i}", "quiz", rate_limited=False) for i in range(slots)]
+
+    def test_prefetched_quiz_is_served_once(self):
+        self._run()
+
+        self.assertEqual(self._take(), {"questions": self.questions, "language": "fr"})
+        self.assertIsNone(self._take())
+        stats = self.prefetcher.stats()
+        self.assertEqual((stats['completed'], stats['hits'], stats['misses']), (1, 1, 1))
+
+    def test_result_is_served_whichever_route_serves_the_quiz_now(self):
+        self._run()
+
+        with mock.patch.dict("os.environ", {"GROQ_API_KEY": "key"}):
+            self.assertIsNotNone(self._take())
+
+    def test_nothing_starts_when_interactive_load_is_high(self):
+        self._busy(2)
+
+        self._run()
+
+        self.stream_quiz.assert_not_called()
+        self.assertEqual(self.prefetcher.stats()['cancelled_load'], 1)
+        self.assertIsNone(self._take())
+
+    def test_quiz_stops_between_questions_when_load_rises(self):
+        slots = []
+
+        def stream_quiz(*args):
+            yield self.questions[0]
+            slots.extend(self._busy(2))
+            yield self.questions[1]
+        self.stream_quiz.side_effect = stream_quiz
+
+        self._run()
+
+        self.assertIsNone(self._take())
+        self.assertEqual(self.prefetcher.stats()['cancelled_load'], 1)
+        # The prefetch slot was given back: only the interactive ones are in use
+        self.assertEqual(self.controller.load("quiz")[0], 2)
+
+    def test_the_same_task_is_scheduled_once_while_pending(self):
+        with mock.patch.object(self.prefetcher, "_start"):
+            self.prefetcher.schedule('quiz', 1, **self.QUIZ)
+            self.prefetcher.schedule('quiz', 1, **self.QUIZ)
+            self.prefetcher.schedule('quiz', 2, **self.QUIZ)
+
+        self.assertEqual(self.prefetcher.stats()['scheduled'], 2)
+
+
+class PregenerateContentTests(TransactionTestCase):
+
+    def setUp(self):
+        self.owner = get_user_model().objects.create_superuser(username="admin", email="admin@example.com", password="pw")
+        self.enterContext(mock.patch.object(jobs, "notify_job"))
+        self.enterContext(temp_admission_controller())
+        catalog = mock.Mock()
+        catalog.get_available_modules.return_value = [{'id': "python"}, {'id': "general"}]
+        catalog.get_module_sections.return_value = {"python_lists": [], "python_loops": []}
+        catalog.format_section_name.side_effect = lambda key: key.split("_", 1)[1].title()
+        self.enterContext(mock.patch("apps.agents.management.commands.pregenerate_content.module_loader", catalog))
+        self.handled = []
+        self.fail_section = None
+
+        def handler(job):
+            if job.params['section'] == self.fail_section:
+                raise RuntimeError("model down")
+            self.handled.append((job.kind, job.params['topic'], job.params.get('language')))
+            return {}
+        self.enterContext(mock.patch.object(jobs, "_load_handler", return_value=handler))
+
+    def _run(self, *args):
+        call_command("pregenerate_content", "--run", "nightly", "--workers", "2", "--kinds", "quiz",
+                     "--languages", "fr", "en", *args, stdout=StringIO(), stderr=StringIO())
+
+    def test_every_section_gets_a_quiz_bank_per_language(self):
+        self._run()
+
+        self.assertEqual(sorted(self.handled), [
+            ("quiz", "Lists", "en"), ("quiz", "Lists", "fr"), ("quiz", "Loops", "en"), ("quiz", "Loops", "fr"),
+        ])
+        job = jobs.GenerationJob.objects.filter(kind="quiz").first()
+        self.assertEqual((job.user, job.params['num_questions'], job.params['pregenerated']), (self.owner, 20, True))
+
+    def test_same_run_resumes_with_what_is_left(self):
+        self.enterContext(mock.patch.dict("os.environ", {"AI_JOBS_MAX_ATTEMPTS": "1"}))
+        self.fail_section = "python/python_loops"
+        self._run()
+        self.assertEqual(len(self.handled), 2)
+
+        self.fail_section = None
+        self._run()
+
+        self.assertEqual(len(self.handled), 4)
+        self.assertEqual(jobs.GenerationJob.objects.filter(status='succeeded').count(), 4)
+
+    def test_dry_run_generates_nothing(self):
+        self._run("--dry-run")
+
+        self.assertEqual(self.handled, [])
+        self.assertFalse(jobs.GenerationJob.objects.exists())
+
+    def test_content_needs_an_owner(self):
+        self.owner.delete()
+
+        with self.assertRaises(CommandError):
+            self._run()
+
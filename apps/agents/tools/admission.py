@@ -0,0 +1,509 @@
+# apps/agents/tools/admission.py
+
+import asyncio
+import functools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from inspect import iscoroutinefunction
+from apps.agents.tools.model_router import task_route_key
+
+
+class AdmissionRejected(Exception):
+    """Raised when a generation is not admitted; `retry_after` is in seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class TokenBucket:
+    """Allows `capacity` requests at once, refilled at `rate` requests per second"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Takes one token, returns 0 on success or the seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class _Waiter:
+    """A queued request, woken through a threading.Event or an asyncio future"""
+
+    def __init__(self, user_key, loop=None):
+        self.user_key = user_key
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+
+    def grant(self):
+        """Wakes the waiter up, returns False if it can no longer be woken"""
+        if self.future is not None:
+            try:
+                self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(True))
+            except RuntimeError:
+                # Its event loop is closed
+                return False
+        else:
+            self.event.set()
+        self.granted = True
+        return True
+
+
+class _ModelGate:
+    """Concurrency slots of one model, with one wait queue per user served round-robin"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.queues = OrderedDict()  # user_key => deque of waiters, in round-robin order
+        self.queued = 0
+
+    def pop_next(self):
+        """Next waiter in round-robin order over users"""
+        user_key, waiters = next(iter(self.queues.items()))
+        waiter = waiters.popleft()
+        if waiters:
+            # The user goes to the back of the line for their next request
+            self.queues.move_to_end(user_key)
+        else:
+            del self.queues[user_key]
+        self.queued -= 1
+        return waiter
+
+    def remove(self, waiter):
+        waiters = self.queues.get(waiter.user_key)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            self.queued -= 1
+            if not waiters:
+                del self.queues[waiter.user_key]
+
+
+class Slot:
+    """An admitted generation: release() (idempotent) frees its model slot"""
+
+    def __init__(self, controller, gate_key):
+        self._controller = controller
+        self._gate_key = gate_key
+        self._started = time.monotonic()
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._controller._release(self._gate_key, time.monotonic() - self._started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class AdmissionController:
+    """
+    Central admission for LLM generations.
+    - Per-user token bucket: `rate_per_minute` generations, bursts up to `burst`.
+    - Per-model concurrency limit: at most `max_concurrent` generations at once
+      (per-model overrides in `model_limits`), so a local Ollama is not flooded.
+    - Bounded wait queue per model, dispatched round-robin between users so that
+      one user's burst cannot starve the others; at most `max_queued_per_user`
+      waiting requests per user and `max_queue` in total.
+    Requests that cannot be served are rejected right away with a retry delay
+    (AdmissionRejected) instead of piling up.
+    """
+
+    def __init__(self, rate_per_minute=10, burst=5, max_concurrent=4, max_queue=50,
+                 max_queued_per_user=2, max_wait=30, model_limits=None):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queued_per_user = max_queued_per_user
+        self.max_wait = max_wait
+        self.model_limits = model_limits or {}
+        self._buckets = {}
+        self._gates = {}
+        self._lock = threading.Lock()
+        self._wait_times = deque(maxlen=1000)
+        # Moving average of how long a generation holds its slot, for Retry-After estimates
+        self._service_time = 10.0
+        self._stats = {
+            'admitted': 0,
+            'admitted_after_wait': 0,
+            'rejected_rate_limited': 0,
+            'rejected_queue_full': 0,
+            'rejected_wait_timeout': 0,
+        }
+
+    # === Rate limiting ===
+
+    def check_rate(self, user_key):
+        """Takes a token from the user's bucket, raises AdmissionRejected when empty"""
+        with self._lock:
+            bucket = self._buckets.get(user_key)
+            if bucket is None:
+                self._prune_buckets()
+                bucket = self._buckets[user_key] = TokenBucket(self.rate, self.burst)
+            wait = bucket.take()
+            if wait:
+                self._stats['rejected_rate_limited'] += 1
+        if wait:
+            raise AdmissionRejected('rate_limited', wait)
+
+    def _prune_buckets(self):
+        """Forgets full buckets (idle users) so the dict doesn't grow forever"""
+        if len(self._buckets) < 10000:
+            return
+        now = time.monotonic()
+        idle = [key for key, bucket in self._buckets.items()
+                if bucket.tokens + (now - bucket.updated) * self.rate >= bucket.capacity]
+        for key in idle:
+            del self._buckets[key]
+
+    # === Concurrency slots ===
+
+    def _gate(self, gate_key):
+        gate = self._gates.get(gate_key)
+        if gate is None:
+            model = gate_key.split(":", 1)[-1]
+            gate = self._gates[gate_key] = _ModelGate(self.model_limits.get(model, self.max_concurrent))
+        return gate
+
+    def _estimated_wait(self, gate):
+        return self._service_time * (gate.queued + 1) / gate.limit
+
+    def _enter(self, gate_key, user_key, loop=None):
+        """Takes a free slot (returns None) or queues a waiter (returned)"""
+        with self._lock:
+            gate = self._gate(gate_key)
+            if gate.active < gate.limit and not gate.queued:
+                gate.active += 1
+                self._stats['admitted'] += 1
+                self._wait_times.append(0.0)
+                return None
+            user_queue = gate.queues.get(user_key)
+            if gate.queued >= self.max_queue or (user_queue and len(user_queue) >= self.max_queued_per_user):
+                self._stats['rejected_queue_full'] += 1
+                raise AdmissionRejected('queue_full', self._estimated_wait(gate))
+            waiter = _Waiter(user_key, loop)
+            gate.queues.setdefault(user_key, deque()).append(waiter)
+            gate.queued += 1
+            return waiter
+
+    def _after_wait(self, gate_key, waiter):
+        """Settles a waiter whose wait ended: admitted, or removed and rejected"""
+        with self._lock:
+            gate = self._gate(gate_key)
+            if waiter.granted:
+                # Counted as active by _release when it granted the slot
+                self._stats['admitted'] += 1
+                self._stats['admitted_after_wait'] += 1
+                self._wait_times.append(time.monotonic() - waiter.enqueued_at)
+                return
+            gate.remove(waiter)
+            self._stats['rejected_wait_timeout'] += 1
+            retry_after = self._estimated_wait(gate)
+        raise AdmissionRejected('wait_timeout', retry_after)
+
+    def _abandon(self, gate_key, waiter):
+        """The waiting client went away: leave the queue, or give back a slot granted meanwhile"""
+        with self._lock:
+            if not waiter.granted:
+                self._gate(gate_key).remove(waiter)
+                return
+        self._release(gate_key)
+
+    def _release(self, gate_key, held_seconds=None):
+        with self._lock:
+            if held_seconds is not None:
+                self._service_time = 0.9 * self._service_time + 0.1 * held_seconds
+            gate = self._gate(gate_key)
+            gate.active -= 1
+            # Hand the freed slots over, round-robin between waiting users
+            while gate.queued and gate.active < gate.limit:
+                if gate.pop_next().grant():
+                    gate.active += 1
+
+    def acquire(self, gate_key, user_key):
+        """Blocks until a slot of the model is free, returns a Slot"""
+        waiter = self._enter(gate_key, user_key)
+        if waiter is not None:
+            waiter.event.wait(self.max_wait)
+            self._after_wait(gate_key, waiter)
+        return Slot(self, gate_key)
+
+    async def aacquire(self, gate_key, user_key):
+        """Async variant of acquire(): waits on the event loop"""
+        waiter = self._enter(gate_key, user_key, loop=asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                self._abandon(gate_key, waiter)
+                raise
+            self._after_wait(gate_key, waiter)
+        return Slot(self, gate_key)
+
+    def try_acquire(self, gate_key, user_key):
+        """Takes a free slot of the model without waiting: a Slot, or None when none is free"""
+        with self._lock:
+            gate = self._gate(gate_key)
+            if gate.active >= gate.limit or gate.queued:
+                return None
+            gate.active += 1
+            self._stats['admitted'] += 1
+        return Slot(self, gate_key)
+
+    def load(self, task):
+        """(slots in use of the model serving the task, its slot limit, requests waiting for one)"""
+        gate_key = task_route_key(task)
+        with self._lock:
+            gate = self._gate(gate_key)
+            return gate.active, gate.limit, gate.queued
+
+    # === Entry points ===
+
+    def admit(self, user_key, task, rate_limited=True):
+        """
+        Rate limit check then slot acquisition on the model the task is routed
+        to (see model_router.task_route_key); returns a Slot to release when done
+        """
+        if rate_limited:
+            self.check_rate(user_key)
+        return self.acquire(task_route_key(task), user_key)
+
+    async def aadmit(self, user_key, task, rate_limited=True):
+        """Async variant of admit()"""
+        if rate_limited:
+            self.check_rate(user_key)
+        return await self.aacquire(task_route_key(task), user_key)
+
+    def try_admit(self, user_key, task):
+        """Slot for background work: never rate limited, never queued (None when the model is busy)"""
+        return self.try_acquire(task_route_key(task), user_key)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            waits = sorted(self._wait_times)
+            stats['models'] = {
+                gate_key: {
+                    'active': gate.active,
+                    'limit': gate.limit,
+                    'queued': gate.queued,
+                    'waiting_users': len(gate.queues),
+                }
+                for gate_key, gate in self._gates.items()
+            }
+            stats['tracked_users'] = len(self._buckets)
+            stats['avg_service_seconds'] = round(self._service_time, 2)
+        stats['queue_depth'] = sum(model['queued'] for model in stats['models'].values())
+        stats['wait_seconds'] = {
+            'p50': round(waits[len(waits) // 2], 3) if waits else 0.0,
+            'p95': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+            'max': round(waits[-1], 3) if waits else 0.0,
+        }
+        return stats
+
+
+def _parse_model_limits(value):
+    """Ex: "mistral=1,llama3=2" => {"mistral": 1, "llama3": 2}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        model, _, limit = item.rpartition("=")
+        if model and limit.isdigit():
+            limits[model] = int(limit)
+    return limits
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def is_admission_enabled():
+    return os.getenv("AI_ADMISSION_ENABLED", "1") == "1"
+
+
+def get_admission_controller():
+    """Returns the process-wide admission controller configured from environment"""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(
+                    rate_per_minute=float(os.getenv("AI_ADMISSION_RATE_PER_MINUTE", "10")),
+                    burst=int(os.getenv("AI_ADMISSION_BURST", "5")),
+                    max_concurrent=int(os.getenv("AI_ADMISSION_MAX_CONCURRENT", "4")),
+                    max_queue=int(os.getenv("AI_ADMISSION_MAX_QUEUE", "50")),
+                    max_queued_per_user=int(os.getenv("AI_ADMISSION_MAX_QUEUED_PER_USER", "2")),
+                    max_wait=float(os.getenv("AI_ADMISSION_MAX_WAIT", "30")),
+                    model_limits=_parse_model_limits(os.getenv("AI_ADMISSION_MODEL_LIMITS", "")),
+                )
+    return _controller
+
+
+def user_key(user):
+    """Admission identity: the user id, or one shared key for anonymous users"""
+    return f"user:{user.id}" if getattr(user, 'is_authenticated', False) else "anonymous"
+
+
+# === Views ===
+
+def too_many_requests(rejection):
+    """429 response for a rejected generation, with Retry-After"""
+    from django.http import JsonResponse
+
+    messages = {
+        'rate_limited': "You are sending too many requests, please wait a moment.",
+        'queue_full': "The AI is very busy right now, please try again shortly.",
+        'wait_timeout': "The AI is very busy right now, please try again shortly.",
+    }
+    response = JsonResponse({
+        'error': messages.get(rejection.reason, "Too many requests."),
+        'reason': rejection.reason,
+        'retry_after': rejection.retry_after,
+    }, status=429)
+    response['Retry-After'] = str(rejection.retry_after)
+    return response
+
+
+class _ReleasingIterator:
+    """Streamed content that frees its slot once consumed or closed"""
+
+    def __init__(self, iterator, slot):
+        self._iterator = iter(iterator)
+        self._slot = slot
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self._slot.release()
+            raise
+
+    def close(self):
+        self._slot.release()
+
+
+class _ReleasingAsyncIterator:
+    """Async variant of _ReleasingIterator"""
+
+    def __init__(self, iterator, slot):
+        self._iterator = iterator.__aiter__()
+        self._slot = slot
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._iterator.__anext__()
+        except StopAsyncIteration:
+            self._slot.release()
+            raise
+
+    def close(self):
+        self._slot.release()
+
+
+def _hold_until_sent(response, slot):
+    """Releases the slot now, or when a streaming response has been sent"""
+    if not getattr(response, 'streaming', False):
+        slot.release()
+    elif response.is_async:
+        response.streaming_content = _ReleasingAsyncIterator(response.streaming_content, slot)
+    else:
+        response.streaming_content = _ReleasingIterator(response.streaming_content, slot)
+    return response
+
+
+class _NoSlot:
+    def release(self):
+        pass
+
+
+def admission_controlled(view=None, *, task, methods=None, concurrency=True):
+    """
+    Admission control for an LLM-backed view (sync or async, streaming or not).
+    Rejected requests get a 429 with Retry-After; admitted ones hold a slot of
+    the model serving `task` (see model_router.TASKS) until their response is
+    complete, streamed content included.
+    `methods` limits control to the generating HTTP methods (e.g. ("POST",)).
+    With concurrency=False only the rate limit applies (e.g. to enqueue a job
+    whose worker takes the slot itself).
+    """
+    if view is None:
+        return functools.partial(admission_controlled, task=task, methods=methods, concurrency=concurrency)
+
+    def applies(request):
+        return is_admission_enabled() and (methods is None or request.method in methods)
+
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if not applies(request):
+                return await view(request, *args, **kwargs)
+            controller = get_admission_controller()
+            key = user_key(await request.auser())
+            try:
+                if concurrency:
+                    slot = await controller.aadmit(key, task)
+                else:
+                    controller.check_rate(key)
+                    slot = _NoSlot()
+            except AdmissionRejected as e:
+                return too_many_requests(e)
+            try:
+                response = await view(request, *args, **kwargs)
+            except BaseException:
+                slot.release()
+                raise
+            return _hold_until_sent(response, slot)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not applies(request):
+            return view(request, *args, **kwargs)
+        controller = get_admission_controller()
+        key = user_key(request.user)
+        try:
+            if concurrency:
+                slot = controller.admit(key, task)
+            else:
+                controller.check_rate(key)
+                slot = _NoSlot()
+        except AdmissionRejected as e:
+            return too_many_requests(e)
+        try:
+            response = view(request, *args, **kwargs)
+        except BaseException:
+            slot.release()
+            raise
+        return _hold_until_sent(response, slot)
+    return wrapper
@@ -0,0 +1,148 @@
+# apps/agents/tools/circuit_breaker.py
+
+import os
+import threading
+import time
+from collections import deque
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a provider whose circuit is open"""
+
+    def __init__(self, provider, retry_after):
+        self.provider = provider
+        self.retry_after = max(1, int(retry_after + 0.999))
+        super().__init__(f"AI provider {provider} is unavailable, retry in {self.retry_after} s")
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of one LLM provider.
+    closed: calls go through, their outcomes fill a window of the last
+    `window` calls. Once it holds `min_calls`, a failure rate of
+    `failure_threshold` or a slow call rate of `slow_threshold` opens it.
+    open: calls are refused for `open_seconds`.
+    half_open: one probe call goes through every `open_seconds`; its success
+    closes the circuit, its failure (or slowness) opens it again.
+    """
+
+    def __init__(self, name, window=20, min_calls=5, failure_threshold=0.5,
+                 slow_threshold=0.8, open_seconds=30):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.slow_threshold = slow_threshold
+        self.open_seconds = open_seconds
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._state = 'closed'
+        self._next_probe_at = 0.0
+        self._stats = {'opened': 0, 'rejected': 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == 'open' and time.monotonic() >= self._next_probe_at:
+                return 'half_open'
+            return self._state
+
+    def retry_after(self):
+        """Seconds until the next call would be let through (0 when closed)"""
+        with self._lock:
+            if self._state == 'closed':
+                return 0.0
+            return max(0.0, self._next_probe_at - time.monotonic())
+
+    def is_call_permitted(self):
+        """Whether a call would be let through now (doesn't take the probe)"""
+        with self._lock:
+            return self._state == 'closed' or time.monotonic() >= self._next_probe_at
+
+    def before_call(self):
+        """Takes permission for one call, raises CircuitOpen when refused"""
+        with self._lock:
+            if self._state == 'closed':
+                return
+            now = time.monotonic()
+            if now < self._next_probe_at:
+                self._stats['rejected'] += 1
+                raise CircuitOpen(self.name, self._next_probe_at - now)
+            # Probe: the next one waits for another period if this one never reports
+            self._state = 'half_open'
+            self._next_probe_at = now + self.open_seconds
+        print(f"🔌 {self.name}: probing after open circuit")
+
+    def record(self, ok, slow=False):
+        with self._lock:
+            if self._state == 'half_open':
+                if ok and not slow:
+                    self._close()
+                else:
+                    self._open()
+                return
+            if self._state == 'open':
+                # Call started before the circuit opened
+                return
+            self._outcomes.append((ok, slow))
+            if len(self._outcomes) < self.min_calls:
+                return
+            failures = sum(1 for ok, _ in self._outcomes if not ok) / len(self._outcomes)
+            slow_calls = sum(1 for _, slow in self._outcomes if slow) / len(self._outcomes)
+            if failures >= self.failure_threshold or slow_calls >= self.slow_threshold:
+                self._open()
+
+    def _open(self):
+        self._state = 'open'
+        self._next_probe_at = time.monotonic() + self.open_seconds
+        self._outcomes.clear()
+        self._stats['opened'] += 1
+        print(f"🔴 {self.name}: circuit open for {self.open_seconds} s")
+
+    def _close(self):
+        self._state = 'closed'
+        self._outcomes.clear()
+        print(f"🟢 {self.name}: circuit closed")
+
+    def stats(self):
+        state = self.state
+        with self._lock:
+            stats = dict(self._stats)
+            outcomes = list(self._outcomes)
+            retry_after = max(0.0, self._next_probe_at - time.monotonic())
+        stats.update(
+            state=state,
+            calls=len(outcomes),
+            failure_rate=round(sum(1 for ok, _ in outcomes if not ok) / len(outcomes), 3) if outcomes else 0.0,
+            slow_rate=round(sum(1 for _, slow in outcomes if slow) / len(outcomes), 3) if outcomes else 0.0,
+            retry_after=round(retry_after, 1) if state == 'open' else 0,
+        )
+        return stats
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(provider):
+    """Returns the circuit breaker of a provider, configured from environment (AI_BREAKER_*)"""
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(provider)
+            if breaker is None:
+                breaker = _breakers[provider] = CircuitBreaker(
+                    provider,
+                    window=int(os.getenv("AI_BREAKER_WINDOW", "20")),
+                    min_calls=int(os.getenv("AI_BREAKER_MIN_CALLS", "5")),
+                    failure_threshold=float(os.getenv("AI_BREAKER_FAILURE_RATE", "0.5")),
+                    slow_threshold=float(os.getenv("AI_BREAKER_SLOW_RATE", "0.8")),
+                    open_seconds=float(os.getenv("AI_BREAKER_OPEN_SECONDS", "30")),
+                )
+    return breaker
+
+
+def breaker_stats():
+    """State and counters of every provider's circuit breaker"""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {provider: breaker.stats() for provider, breaker in breakers.items()}
@@ -0,0 +1,220 @@
+# apps/agents/tools/context_packing.py
+
+import os
+import re
+from typing import List
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from apps.agents.utils import estimate_tokens
+
+# Passages sharing this many of their word 3-grams with a better ranked one are dropped
+DUPLICATE_THRESHOLD = 0.8
+
+# Shortest overlap recognized between the end of a chunk and the start of the next
+# (the splitter overlaps chunks by up to 200 characters)
+MIN_OVERLAP = 40
+MAX_OVERLAP = 400
+
+# Lines shorter than this are never treated as repeated boilerplate
+MIN_BOILERPLATE_LINE = 20
+
+# A passage is only cut to fit the budget if at least this many tokens remain
+MIN_TRUNCATED_TOKENS = 60
+
+
+def is_context_packing_enabled():
+    return os.getenv("AI_CONTEXT_PACKING", "1") == "1"
+
+
+def context_budget(models=()):
+    """
+    Context token budget for a prompt that may be sent to any of `models`: the
+    smallest of their AI_CONTEXT_BUDGETS entries (ex: "mistral=800,llama3.2:3b=600"),
+    AI_CONTEXT_TOKEN_BUDGET for models without one.
+    """
+    default = int(os.getenv("AI_CONTEXT_TOKEN_BUDGET", "1500"))
+    budgets = {}
+    for item in filter(None, (part.strip() for part in os.getenv("AI_CONTEXT_BUDGETS", "").split(","))):
+        model, _, budget = item.rpartition("=")
+        if model and budget.isdigit():
+            budgets[model] = int(budget)
+    return min((budgets.get(model, default) for model in models), default=default)
+
+
+def _source_key(doc):
+    return (doc.metadata.get('source'), doc.metadata.get('page'))
+
+
+def _shingles(text):
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+
+
+def _overlap(first, second):
+    """Length of the longest end of `first` that starts `second` (0 below MIN_OVERLAP)"""
+    for size in range(min(len(first), len(second), MAX_OVERLAP), MIN_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return size
+    return 0
+
+
+def _join(first, second):
+    """
+    Text of two chunks of the same document if they are adjacent, else None.
+    Uses the splitter's start_index when both have one, the overlapping text otherwise.
+    """
+    start, other_start = first.metadata.get('start_index'), second.metadata.get('start_index')
+    a, b = first.page_content, second.page_content
+    if start is not None and other_start is not None:
+        if other_start < start:
+            start, other_start, a, b = other_start, start, b, a
+        end = start + len(a)
+        if other_start <= end:
+            return a + b[end - other_start:], start
+        if other_start - end <= 2:
+            # Only the separator the splitter dropped lies between them
+            return a + "\n\n" + b, start
+        return None
+    if b in a:
+        return a, start
+    if a in b:
+        return b, other_start
+    overlap = _overlap(a, b)
+    if overlap:
+        return a + b[overlap:], start
+    overlap = _overlap(b, a)
+    if overlap:
+        return b + a[overlap:], other_start
+    return None
+
+
+def merge_adjacent(docs):
+    """
+    Merges chunks of the same source (and page) that follow each other, so the
+    splitter overlap appears once. A merged passage takes the rank of its best part.
+    """
+    passages = list(docs)
+    merged = True
+    while merged:
+        merged = False
+        for i, first in enumerate(passages):
+            for j in range(i + 1, len(passages)):
+                second = passages[j]
+                if _source_key(first) != _source_key(second):
+                    continue
+                joined = _join(first, second)
+                if joined is None:
+                    continue
+                text, start = joined
+                metadata = dict(first.metadata)
+                if start is not None:
+                    metadata['start_index'] = start
+                passages[i] = Document(page_content=text, metadata=metadata)
+                del passages[j]
+                merged = True
+                break
+            if merged:
+                break
+    return passages
+
+
+def drop_near_duplicates(docs, threshold=DUPLICATE_THRESHOLD):
+    """Drops passages whose text mostly appears in a better ranked one"""
+    kept = []
+    seen = []
+    for doc in docs:
+        shingles = _shingles(doc.page_content)
+        if any(len(shingles & other) >= threshold * len(shingles) for other in seen):
+            continue
+        kept.append(doc)
+        seen.append(shingles)
+    return kept
+
+
+def strip_repeated_lines(docs):
+    """Removes lines (headers, footers, banners) already present in a better ranked passage"""
+    seen = set()
+    stripped = []
+    for doc in docs:
+        lines = []
+        for line in doc.page_content.splitlines():
+            key = " ".join(line.split()).lower()
+            if len(key) >= MIN_BOILERPLATE_LINE:
+                if key in seen:
+                    continue
+                seen.add(key)
+            lines.append(line)
+        text = "\n".join(lines).strip()
+        if text:
+            stripped.append(Document(page_content=text, metadata=doc.metadata))
+    return stripped
+
+
+def _truncate(text, max_tokens):
+    """Cuts text to about max_tokens, at a paragraph or sentence end when there is one nearby"""
+    limit = max_tokens * 4
+    cut = text[:limit]
+    for separator in ("\n\n", ". ", "\n"):
+        position = cut.rfind(separator)
+        if position > limit // 2:
+            return cut[:position + 1].rstrip() + " …"
+    return cut.rstrip() + " …"
+
+
+def fit_budget(docs, token_budget):
+    """Keeps passages in rank order while they fit, cutting the first one that doesn't"""
+    packed = []
+    remaining = token_budget
+    for doc in docs:
+        tokens = estimate_tokens(doc.page_content)
+        if tokens <= remaining:
+            packed.append(doc)
+            remaining -= tokens
+        elif remaining >= MIN_TRUNCATED_TOKENS:
+            packed.append(Document(page_content=_truncate(doc.page_content, remaining), metadata=doc.metadata))
+            remaining = 0
+        if remaining < MIN_TRUNCATED_TOKENS:
+            break
+    return packed
+
+
+def pack_documents(docs, token_budget):
+    """
+    Turns retrieved chunks (most relevant first) into the context actually sent
+    to the LLM: adjacent chunks merged, near-duplicates and repeated lines
+    dropped, then trimmed to token_budget in relevance order.
+    """
+    if not docs:
+        return docs
+    packed = fit_budget(strip_repeated_lines(drop_near_duplicates(merge_adjacent(docs))), token_budget)
+    before = sum(estimate_tokens(doc.page_content) for doc in docs)
+    after = sum(estimate_tokens(doc.page_content) for doc in packed)
+    print(f"📦 Context packed: {len(docs)} chunks (~{before} tokens) → {len(packed)} passages (~{after} tokens)")
+    return packed
+
+
+class PackedRetriever(BaseRetriever):
+    """Wraps a retriever so chains receive packed context (see pack_documents)"""
+
+    retriever: BaseRetriever
+    token_budget: int = 1500
+
+    # The inner retrieval runs without the caller's callbacks: streaming
+    # consumers get one on_retriever_end, with the packed documents
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        docs = self.retriever.invoke(query, config={"callbacks": []})
+        return pack_documents(docs, self.token_budget)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        docs = await self.retriever.ainvoke(query, config={"callbacks": []})
+        return pack_documents(docs, self.token_budget)
+
+
+def packed_retriever(retriever, token_budget):
+    """Returns `retriever` wrapped by a PackedRetriever, or as is when packing is disabled"""
+    if not is_context_packing_enabled():
+        return retriever
+    return PackedRetriever(retriever=retriever, token_budget=token_budget)
@@ -0,0 +1,150 @@
+# apps/agents/tools/conversation_memory.py
+
+import os
+from langchain.prompts import PromptTemplate
+from apps.chat.models import Conversation
+from apps.agents.tools.model_router import get_task_llm
+from apps.agents.utils import load_prompt, estimate_tokens
+
+
+class ConversationMemory:
+    """
+    Bounded per-conversation chat memory.
+    The last `max_turns` exchanges are kept verbatim (as long as they fit in
+    `turns_token_budget`), older ones are folded into a rolling summary that
+    the LLM updates incrementally and that never exceeds `summary_token_budget`.
+    The history injected into prompts is therefore bounded whatever the
+    length of the conversation.
+    """
+
+    SAVED_FIELDS = ['summary', 'recent_turns', 'turn_count', 'updated_at']
+
+    def __init__(self, max_turns=4, turns_token_budget=1500, summary_token_budget=300):
+        self.max_turns = max_turns
+        self.turns_token_budget = turns_token_budget
+        self.summary_token_budget = summary_token_budget
+
+    def load(self, user, conversation_id=None):
+        """Returns the user's conversation (one query), or a new one"""
+        try:
+            conversation_id = int(conversation_id) if conversation_id else None
+        except (TypeError, ValueError):
+            conversation_id = None
+        if conversation_id:
+            conversation = Conversation.objects.filter(id=conversation_id, user=user).first()
+            if conversation:
+                return conversation
+        return Conversation.objects.create(user=user)
+
+    async def aload(self, user, conversation_id=None):
+        """Async variant of load()"""
+        try:
+            conversation_id = int(conversation_id) if conversation_id else None
+        except (TypeError, ValueError):
+            conversation_id = None
+        if conversation_id:
+            conversation = await Conversation.objects.filter(id=conversation_id, user=user).afirst()
+            if conversation:
+                return conversation
+        return await Conversation.objects.acreate(user=user)
+
+    def format_history(self, conversation):
+        """History block to prepend to the question, empty for a new conversation"""
+        if conversation is None or not (conversation.summary or conversation.recent_turns):
+            return ""
+        parts = ["Conversation so far:"]
+        if conversation.summary:
+            parts.append(f"Summary of earlier exchanges: {conversation.summary}")
+        for question, answer in conversation.recent_turns:
+            parts.append(f"Student: {question}\nTutor: {answer}")
+        return "\n\n".join(parts)
+
+    def record(self, conversation, question, answer):
+        """Appends a turn, folds the overflow into the summary and saves"""
+        overflow = self._append_turn(conversation, question, answer)
+        if overflow:
+            conversation.summary = self._summarize(conversation.summary, overflow)
+        conversation.save(update_fields=self.SAVED_FIELDS)
+
+    async def arecord(self, conversation, question, answer):
+        """Async variant of record()"""
+        overflow = self._append_turn(conversation, question, answer)
+        if overflow:
+            conversation.summary = await self._asummarize(conversation.summary, overflow)
+        await conversation.asave(update_fields=self.SAVED_FIELDS)
+
+    def _append_turn(self, conversation, question, answer):
+        """Appends a turn to the recent ones, returns the turns pushed out of them"""
+        # A single very long answer must not exceed the budget on its own
+        max_chars = self.turns_token_budget * 4
+        if len(answer) > max_chars:
+            answer = answer[:max_chars] + "…"
+        conversation.recent_turns.append([question[:max_chars], answer])
+        conversation.turn_count += 1
+
+        overflow = []
+        while len(conversation.recent_turns) > self.max_turns or (
+            len(conversation.recent_turns) > 1 and self._turns_tokens(conversation.recent_turns) > self.turns_token_budget
+        ):
+            overflow.append(conversation.recent_turns.pop(0))
+        return overflow
+
+    def _turns_tokens(self, turns):
+        return sum(estimate_tokens(question) + estimate_tokens(answer) for question, answer in turns)
+
+    def _summary_chain(self, summary, turns):
+        """Returns (chain, inputs, formatted_turns) for a summary update"""
+        formatted_turns = "\n\n".join(f"Student: {q}\nTutor: {a}" for q, a in turns)
+        prompt = PromptTemplate(
+            input_variables=["summary", "turns", "max_words"],
+            template=load_prompt("summarizer")
+        )
+        inputs = {
+            "summary": summary or "(empty)",
+            "turns": formatted_turns,
+            # ~0.75 word per token
+            "max_words": int(self.summary_token_budget * 0.75),
+        }
+        return prompt | get_task_llm("summary"), inputs, formatted_turns
+
+    def _summarize(self, summary, turns):
+        chain, inputs, formatted_turns = self._summary_chain(summary, turns)
+        try:
+            result = chain.invoke(inputs)
+            updated = getattr(result, 'content', str(result)).strip()
+        except Exception as e:
+            print(f"⚠️ Summarization failed, appending raw turns: {e}")
+            updated = f"{summary}\n{formatted_turns}".strip()
+        return self._trim(updated)
+
+    async def _asummarize(self, summary, turns):
+        chain, inputs, formatted_turns = self._summary_chain(summary, turns)
+        try:
+            result = await chain.ainvoke(inputs)
+            updated = getattr(result, 'content', str(result)).strip()
+        except Exception as e:
+            print(f"⚠️ Summarization failed, appending raw turns: {e}")
+            updated = f"{summary}\n{formatted_turns}".strip()
+        return self._trim(updated)
+
+    def _trim(self, summary):
+        """Keeps the summary within budget, dropping its oldest part if needed"""
+        max_chars = self.summary_token_budget * 4
+        if len(summary) <= max_chars:
+            return summary
+        return "…" + summary[-(max_chars - 1):]
+
+
+_memory = None
+
+
+def get_conversation_memory():
+    """Returns the conversation memory configured from environment"""
+    global _memory
+    if _memory is None:
+        _memory = ConversationMemory(
+            max_turns=int(os.getenv("AI_CHAT_MEMORY_TURNS", "4")),
+            turns_token_budget=int(os.getenv("AI_CHAT_MEMORY_TURNS_TOKENS", "1500")),
+            summary_token_budget=int(os.getenv("AI_CHAT_MEMORY_SUMMARY_TOKENS", "300")),
+        )
+    return _memory
@@ -0,0 +1,207 @@
+# apps/agents/tools/fake_llm.py
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Dict
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from apps.agents.utils import estimate_tokens
+
+# Words and the whitespace after them: one streamed "token" each
+_TOKEN = re.compile(r"\S+\s*|\s+")
+
+
+def prompt_text(messages):
+    """Text of a prompt as the fake model sees it (and as recordings are keyed)"""
+    return "\n\n".join(str(message.content) for message in messages)
+
+
+def prompt_key(text):
+    """Key of a recorded answer: SHA-256 of the prompt text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_recordings(path):
+    """Reads a {prompt_key: answer} JSON file, {} when there is none"""
+    if not path:
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read fake LLM recordings {path}: {e}")
+        return {}
+
+
+def _search(pattern, text, default=""):
+    match = re.search(pattern, text)
+    return match.group(1).strip() if match else default
+
+
+def _quiz(text, seed):
+    topic = _search(r"TOPIC:\s*(.+)", text, "Python")
+    count = int(_search(r"NUMBER OF QUESTIONS:\s*(\d+)", text, "5"))
+    french = _search(r"LANGUAGE:\s*(\w+)", text, "fr") == "fr"
+    question, answer, explanation = (
+        ("Quelle est la sortie du code suivant", "Réponse", "Explication") if french
+        else ("What is the output of the following code", "Answer", "Explanation")
+    )
+    blocks = []
+    for i in range(1, count + 1):
+        # Values differ from one question (and one prompt) to the next, so the
+        # generated questions survive deduplication
+        value = seed % 97 + i * 7
+        blocks.append(
+            f"Q{i}. {question} ({topic}, {seed % 1000}-{i}) ?\n\n"
+            f"```python\nx = {value}\nprint(x * 2)\n```\n"
+            f"A. {value * 2}\nB. {value}\nC. {value + 2}\nD. Error\n\n"
+            f"{answer}: A\n{explanation}: x * 2 = {value * 2}.\n"
+        )
+    return "\n".join(blocks)
+
+
+def _exercise(text, seed):
+    topic = _search(r'(?:topic|course): "([^"]+)"', text, "Python")
+    return json.dumps({
+        "title": f"Exercise: {topic}",
+        "description": f"Write a function double(n) that returns twice n. Topic: {topic}.",
+        "starter_code": "def double(n):\n    # TODO\n    pass",
+        "solution": "def double(n):\n    return n * 2",
+        "tests": [
+            {"input": "double(2)", "expected": "4"},
+            {"input": "double(-3)", "expected": "-6"},
+            {"input": "double(0)", "expected": "0"},
+        ],
+    }, ensure_ascii=False)
+
+
+def _course(text, seed):
+    topic = _search(r"==== QUESTION/TOPIC ====\s*\n(.+)", text, "Python")
+    return (
+        f"# {topic}\n\n"
+        f"## 📖 Introduction\n{topic} is presented step by step, with examples.\n\n"
+        "## 🎯 Learning Objectives\n- Understand the basics\n- Read example code\n- Write your own code\n\n"
+        f"## 🔍 Fundamental Concepts\n\n### Concept 1\n{topic} builds on Python values and functions.\n\n"
+        "## ⚙️ Syntax and Usage\n\n### Basic Syntax\n```python\nvalue = 21\nprint(value * 2)\n```\n\n"
+        "## 💡 Practical Examples\n\n### Example 1: Doubling\n```python\ndef double(n):\n    return n * 2\n```\n\n"
+        f"## 📝 Summary\n{topic}: the concepts, the syntax and a worked example.\n"
+    )
+
+
+def _summary(text, seed):
+    return "The student is studying Python with the tutor and asked about the topics above."
+
+
+def _answer(text, seed):
+    question = _search(r"following question:\s*\n(.+)", text) or text.strip().splitlines()[-1][:200]
+    return (
+        f"Here is an explanation of {question}\n\n"
+        "In Python, this works as follows:\n\n```python\nvalue = 21\nprint(value * 2)  # 42\n```\n\n"
+        "The example shows the idea on a small value."
+    )
+
+
+# (marker in the prompt, template): the first matching marker picks the answer
+TEMPLATES = (
+    ("NUMBER OF QUESTIONS:", _quiz),
+    ('"starter_code"', _exercise),
+    ("==== QUESTION/TOPIC ====", _course),
+    ("memory of a tutoring conversation", _summary),
+)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline stand-in for the LLM providers, for benchmarks and load tests.
+    Answers are deterministic: the recorded answer of the prompt when there is
+    one (see prompt_key), otherwise a template the agents' parsers accept
+    (quiz, exercise JSON, course, summary, chat answer).
+    The first token comes after `latency` seconds, the next ones at
+    `tokens_per_second` (0: all at once). Waits use time.sleep() when invoked,
+    asyncio.sleep() when awaited.
+    """
+
+    model_name: str = "fake"
+    latency: float = 0.5
+    tokens_per_second: float = 0.0
+    streaming: bool = False
+    recordings: Dict[str, str] = {}
+
+    @property
+    def _llm_type(self):
+        return "fake"
+
+    @property
+    def _identifying_params(self):
+        return {"model_name": self.model_name}
+
+    def _answer(self, messages):
+        text = prompt_text(messages)
+        key = prompt_key(text)
+        if key in self.recordings:
+            return text, self.recordings[key]
+        template = next((template for marker, template in TEMPLATES if marker in text), _answer)
+        return text, template(text, int(key[:8], 16))
+
+    def _token_delay(self):
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    @staticmethod
+    def _usage(prompt, tokens):
+        return {"input_tokens": estimate_tokens(prompt), "output_tokens": len(tokens),
+                "total_tokens": estimate_tokens(prompt) + len(tokens)}
+
+    def _result(self, prompt, answer):
+        tokens = _TOKEN.findall(answer)
+        message = AIMessage(content=answer, usage_metadata=self._usage(prompt, tokens))
+        return ChatResult(generations=[ChatGeneration(message=message)]), len(tokens)
+
+    def _chunks(self, prompt, answer):
+        tokens = _TOKEN.findall(answer) or [""]
+        for i, token in enumerate(tokens):
+            last = i == len(tokens) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=token, usage_metadata=self._usage(prompt, tokens) if last else None
+            ))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        result, tokens = self._result(*self._answer(messages))
+        time.sleep(self.latency + tokens * self._token_delay())
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        result, tokens = self._result(*self._answer(messages))
+        await asyncio.sleep(self.latency + tokens * self._token_delay())
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for i, chunk in enumerate(self._chunks(*self._answer(messages))):
+            if i:
+                time.sleep(self._token_delay())
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for i, chunk in enumerate(self._chunks(*self._answer(messages))):
+            if i:
+                await asyncio.sleep(self._token_delay())
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def fake_llm_settings():
+    """FakeChatModel arguments from environment"""
+    return {
+        "latency": float(os.getenv("AI_FAKE_LLM_LATENCY", "0.5")),
+        "tokens_per_second": float(os.getenv("AI_FAKE_LLM_TOKENS_PER_SECOND", "80")),
+        "recordings": load_recordings(os.getenv("AI_FAKE_LLM_RECORDINGS")),
+    }
@@ -0,0 +1,204 @@
+# apps/agents/tools/hedging.py
+
+import asyncio
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional
+from langchain_core.language_models.chat_models import BaseChatModel, agenerate_from_stream, generate_from_stream
+from langchain_core.outputs import ChatGenerationChunk
+
+_DONE = object()
+
+
+class _Race:
+    """
+    Bookkeeping shared by the sync and async drivers of HedgedChatModel:
+    when to hedge, which attempt wins, what to cancel and what to report.
+    """
+
+    def __init__(self, delay, on_attempt, launch, cancel, now, on_win=None):
+        self.delay = delay
+        self.on_attempt = on_attempt
+        self.on_win = on_win
+        self._launch_attempt = launch
+        self._cancel_attempt = cancel
+        self.now = now
+        self.started = {}
+        self.errors = {}
+        self.reported = set()
+        self.winner = None
+        self.first_token = None
+        self.finished = False
+
+    def start(self):
+        self._launch(0)
+
+    def timeout(self):
+        """Seconds left before hedging, None once there is nothing left to hedge"""
+        if self.winner is not None or 1 in self.started:
+            return None
+        return max(0.0, self.delay - (self.now() - self.started[0]))
+
+    def hedge(self):
+        print(f"🪃 No token after {self.delay:.2f} s, hedging on the secondary model")
+        self._launch(1)
+
+    def _launch(self, index):
+        self.started[index] = self.now()
+        self._launch_attempt(index)
+
+    def _report(self, index, ok, first_token=None):
+        if index in self.reported:
+            return
+        self.reported.add(index)
+        if self.on_attempt is not None:
+            self.on_attempt(index, self.now() - self.started[index], ok, first_token)
+
+    def _win(self, index):
+        self.winner = index
+        self.first_token = self.now() - self.started[index]
+        if self.on_win is not None:
+            self.on_win(index)
+        loser = 1 - index
+        if loser in self.started and loser not in self.errors:
+            self._cancel_attempt(loser)
+            # Cancelled before its first token: its elapsed time is a lower bound
+            elapsed = self.now() - self.started[loser]
+            self._report(loser, ok=True, first_token=elapsed)
+
+    def accept(self, index, item):
+        """Handles an event of an attempt, returns True when `item` is a chunk to pass on"""
+        if self.winner is not None and index != self.winner:
+            return False
+        if isinstance(item, Exception):
+            self._report(index, ok=False)
+            if self.winner is not None:
+                # Tokens were already passed on: too late to switch
+                raise item
+            self.errors[index] = item
+            if 1 not in self.started:
+                print(f"⚠️ Primary model failed ({item}), falling back to the secondary")
+                self._launch(1)
+            elif len(self.errors) == len(self.started):
+                raise self.errors[0]
+            return False
+        if self.winner is None:
+            self._win(index)
+        if item is _DONE:
+            self._report(index, ok=True, first_token=self.first_token)
+            self.finished = True
+            return False
+        return True
+
+
+class HedgedChatModel(BaseChatModel):
+    """
+    Sends the request to `primary`; when no token has arrived after `delay`
+    seconds, sends it to `secondary` as well. The first attempt to produce a
+    token wins and the other one is cancelled. An attempt failing before any
+    token hands over to the other one.
+    `on_attempt(index, seconds, ok, first_token_seconds)` is called once per
+    attempt (0 = primary, 1 = secondary) when its outcome is known, and
+    `on_win(index)` once the winner is known.
+    """
+
+    primary: BaseChatModel
+    secondary: BaseChatModel
+    delay: float = 2.0
+    streaming: bool = False
+    on_attempt: Optional[Callable[..., Any]] = None
+    on_win: Optional[Callable[[int], Any]] = None
+
+    @property
+    def _llm_type(self):
+        return "hedged"
+
+    def _attempt_config(self, index):
+        # The attempts run without the caller's callbacks: only the winner's tokens
+        # are reported, through the hedged model's own run
+        return {"callbacks": [], "metadata": dict(self.metadata or {}, hedge_attempt=index)}
+
+    @property
+    def _identifying_params(self):
+        models = [getattr(model, 'model_name', None) or getattr(model, 'model', None) or model._llm_type
+                  for model in (self.primary, self.secondary)]
+        return {"model": "|".join(models), "delay": self.delay}
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        models = (self.primary, self.secondary)
+        events = queue.Queue()
+        cancelled = {}
+
+        def attempt(index):
+            stream = models[index].stream(messages, config=self._attempt_config(index), stop=stop, **kwargs)
+            try:
+                for chunk in stream:
+                    if cancelled[index].is_set():
+                        break
+                    events.put((index, chunk))
+                else:
+                    events.put((index, _DONE))
+            except Exception as e:
+                events.put((index, e))
+            finally:
+                stream.close()
+
+        def launch(index):
+            cancelled[index] = threading.Event()
+            threading.Thread(target=attempt, args=(index,), name=f"hedge-{index}", daemon=True).start()
+
+        race = _Race(self.delay, self.on_attempt, launch, lambda index: cancelled[index].set(), time.monotonic,
+                     self.on_win)
+        race.start()
+        try:
+            while not race.finished:
+                try:
+                    index, item = events.get(timeout=race.timeout())
+                except queue.Empty:
+                    race.hedge()
+                    continue
+                if race.accept(index, item):
+                    yield ChatGenerationChunk(message=item)
+        finally:
+            for event in cancelled.values():
+                event.set()
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        models = (self.primary, self.secondary)
+        events = asyncio.Queue()
+        tasks = {}
+
+        async def attempt(index):
+            try:
+                async for chunk in models[index].astream(messages, config=self._attempt_config(index), stop=stop,
+                                                         **kwargs):
+                    events.put_nowait((index, chunk))
+                events.put_nowait((index, _DONE))
+            except Exception as e:
+                events.put_nowait((index, e))
+
+        def launch(index):
+            tasks[index] = asyncio.create_task(attempt(index))
+
+        race = _Race(self.delay, self.on_attempt, launch, lambda index: tasks[index].cancel(),
+                     asyncio.get_running_loop().time, self.on_win)
+        race.start()
+        try:
+            while not race.finished:
+                try:
+                    index, item = await asyncio.wait_for(events.get(), race.timeout())
+                except asyncio.TimeoutError:
+                    race.hedge()
+                    continue
+                if race.accept(index, item):
+                    yield ChatGenerationChunk(message=item)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return generate_from_stream(self._stream(messages, stop=stop, run_manager=run_manager, **kwargs))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return await agenerate_from_stream(self._astream(messages, stop=stop, run_manager=run_manager, **kwargs))
@@ -0,0 +1,94 @@
+# apps/agents/tools/json_extract.py
+
+import json
+import re
+
+_CLOSERS = {'{': '}', '[': ']'}
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+class JsonObjectExtractor:
+    """
+    Incremental extractor of the first JSON object in LLM output.
+    Text around the object (prose, ``` fences) is ignored; feed() returns the
+    object's text as soon as its braces balance, strings and escapes included.
+    close() completes a truncated object (open string and brackets) instead.
+    """
+
+    def __init__(self):
+        self._chars = []
+        self._stack = []
+        self._in_string = False
+        self._escaped = False
+        self.complete = None
+
+    def feed(self, text):
+        """Consumes a chunk, returns the object's text once complete, else None"""
+        if self.complete is not None:
+            return self.complete
+        for char in text:
+            if not self._stack:
+                if char != '{':
+                    continue  # Before the object
+            self._chars.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in _CLOSERS:
+                self._stack.append(char)
+            elif char in ('}', ']') and self._stack:
+                self._stack.pop()
+                if not self._stack:
+                    self.complete = "".join(self._chars)
+                    return self.complete
+        return None
+
+    def close(self):
+        """Returns the complete object text, or the truncated one with its brackets closed"""
+        if self.complete is not None:
+            return self.complete
+        if not self._chars:
+            return None
+        text = "".join(self._chars)
+        if self._escaped:
+            text = text[:-1]
+        if self._in_string:
+            text += '"'
+        # Drop a dangling key (object without its value) or comma before closing
+        if self._stack and self._stack[-1] == '{':
+            text = re.sub(r'([{,])\s*"(?:[^"\\]|\\.)*"\s*:?\s*$', r'\1', text)
+        text = re.sub(r',\s*$', '', text)
+        return text + "".join(_CLOSERS[opener] for opener in reversed(self._stack))
+
+
+def loads_tolerant(text):
+    """
+    json.loads accepting what LLMs commonly get wrong: raw newlines and tabs
+    inside strings (strict=False) and trailing commas.
+    Raises ValueError (json.JSONDecodeError) when still invalid.
+    """
+    try:
+        return json.loads(text, strict=False)
+    except json.JSONDecodeError:
+        return json.loads(_TRAILING_COMMA.sub(r"\1", text), strict=False)
+
+
+def extract_json_object(text):
+    """
+    Returns (data, exact) for the first JSON object in `text`:
+    exact is False when it had to be completed because the output was truncated.
+    Raises ValueError if no object can be decoded.
+    """
+    extractor = JsonObjectExtractor()
+    extractor.feed(text)
+    exact = extractor.complete is not None
+    candidate = extractor.close()
+    if candidate is None:
+        raise ValueError("No JSON object found")
+    return loads_tolerant(candidate), exact
@@ -1,25 +1,168 @@
 # apps/agents/tools/llm_loader.py
 
+import json
 import os
+import threading
 from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_community.chat_models import ChatOllama
 from langchain_groq import ChatGroq
 
 
 load_dotenv()
 
-def get_llm(model_name=None):
+# Model used by the agent chains unless they are given another one
+AGENT_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+
+# === Process-wide client pool ===
+# Clients are immutable once built and safe to share between threads, so one
+# instance per (provider, model, params) keeps its HTTP connection pool warm
+# for every request served by this process.
+_pool = {}
+_pool_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    'hits': 0,
+    'creations': 0,
+    'in_flight': 0,
+}
+
+
+class _InFlightCounter(BaseCallbackHandler):
+    """Counts LLM calls currently running on pooled clients"""
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        _bump('in_flight', 1)
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        _bump('in_flight', 1)
+
+    def on_llm_end(self, response, **kwargs):
+        _bump('in_flight', -1)
+
+    def on_llm_error(self, error, **kwargs):
+        _bump('in_flight', -1)
+
+
+_in_flight_counter = _InFlightCounter()
+
+
+def _bump(counter, amount):
+    with _stats_lock:
+        _stats[counter] += amount
+
+
+def _resolve_provider():
     """
-    Returns a LangChain compatible LLM.
-    If model_name is None, takes DEFAULT_LLM_MODEL from environment.
-    Priority: Groq, otherwise Ollama.
+    Returns (provider, api_key) from environment.
+    Priority: the fake model when AI_FAKE_LLM=1, then Groq, otherwise Ollama.
     """
-    model_name = model_name or os.getenv("DEFAULT_LLM_MODEL", "mistral")
+    if is_fake_llm_enabled():
+        return "fake", None
     groq_key = os.getenv("GROQ_API_KEY")
-
     if groq_key:
+        return "groq", groq_key
+    return "ollama", None
+
+
+def is_fake_llm_enabled():
+    return os.getenv("AI_FAKE_LLM", "0") == "1"
+
+
+def get_provider():
+    """Returns the name of the provider get_llm will use ("fake", "groq" or "ollama")"""
+    return _resolve_provider()[0]
+
+
+def is_provider_available(provider):
+    """Groq needs an API key, Ollama is assumed to run locally, the fake model always is"""
+    if provider == "groq":
+        return bool(os.getenv("GROQ_API_KEY"))
+    return provider in ("ollama", "fake")
+
+
+def _pool_key(provider, model_name, params):
+    # JSON form: params may hold unhashable values (model_kwargs dict, stop list...)
+    return (provider, model_name, json.dumps(params, sort_keys=True, default=repr))
+
+
+def _build_llm(provider, model_name, api_key, params, json_mode=False):
+    if provider == "fake":
+        from apps.agents.tools.fake_llm import FakeChatModel, fake_llm_settings
+        print(f"🧪 Using fake LLM ({model_name})")
+        # Answers are templated, generation parameters don't apply
+        return FakeChatModel(model_name=model_name, streaming=params.get('streaming', False),
+                             callbacks=[_in_flight_counter], **fake_llm_settings())
+    if provider == "groq":
         print(f"🔗 Using Groq API ({model_name})")
-        return ChatGroq(model_name=model_name, api_key=groq_key)
+        if json_mode:
+            params = dict(params, model_kwargs={"response_format": {"type": "json_object"}})
+        return ChatGroq(
+            model_name=model_name,
+            api_key=api_key,
+            callbacks=[_in_flight_counter],
+            **params
+        )
+    print(f"💻 Using local Ollama ({model_name})")
+    if json_mode:
+        params = dict(params, format="json")
+    return ChatOllama(model=model_name, callbacks=[_in_flight_counter], **params)
+
+
+def get_llm(model_name=None, streaming=False, json_mode=False, provider=None, **params):
+    """
+    Returns a LangChain compatible LLM.
+    If model_name is None, takes DEFAULT_LLM_MODEL from environment.
+    Priority: the fake model (AI_FAKE_LLM=1, for benchmarks), Groq, otherwise
+    Ollama, unless `provider` forces one
+    (see model_router for per-task provider and model selection).
+
+    Clients are pooled per (provider, model, params): the first call builds
+    the client, later calls with the same arguments reuse it.
+    With streaming=True, tokens are reported to on_llm_new_token callbacks
+    as they arrive. With json_mode=True, the provider is asked to only produce
+    valid JSON (Groq response_format / Ollama format).
+    Extra keyword arguments (temperature...) are passed to the client.
+    """
+    model_name = model_name or os.getenv("DEFAULT_LLM_MODEL", "mistral")
+    if provider is None:
+        provider, api_key = _resolve_provider()
+    elif not is_provider_available(provider):
+        raise ValueError(f"LLM provider {provider} is not available")
     else:
-        print(f"💻 Using local Ollama ({model_name})")
-        return ChatOllama(model=model_name)
\ No newline at end of file
+        api_key = os.getenv("GROQ_API_KEY") if provider == "groq" else None
+    # ChatOllama always streams internally, ChatGroq and the fake model need the flag
+    if streaming and provider in ("groq", "fake"):
+        params['streaming'] = True
+    key = _pool_key(provider, model_name, dict(params, json_mode=json_mode))
+
+    llm = _pool.get(key)
+    if llm is not None:
+        _bump('hits', 1)
+        return llm
+
+    with _pool_lock:
+        # Another thread may have built it while we were waiting
+        llm = _pool.get(key)
+        if llm is not None:
+            _bump('hits', 1)
+            return llm
+        llm = _build_llm(provider, model_name, api_key, params, json_mode)
+        _pool[key] = llm
+        _bump('creations', 1)
+        return llm
+
+
+def get_pool_stats():
+    """Returns a snapshot of the client pool counters"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['clients'] = len(_pool)
+    return stats
+
+
+def reset_llm_pool():
+    """Drops all pooled clients (useful after changing provider settings)"""
+    with _pool_lock:
+        _pool.clear()
+    print("🔄 LLM client pool cleared")
@@ -0,0 +1,107 @@
+# apps/agents/tools/metrics.py
+
+import threading
+from bisect import bisect_left
+
+# Seconds, from a cached answer to a long course generation
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter per label values"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [(self.name, _labels(self.labels, key), value) for key, value in sorted(values.items())]
+
+
+class Histogram:
+    """Cumulative histogram per label values (Prometheus semantics)"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            counts, total = self._values.get(label_values, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[label_values] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        samples = []
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", _labels(self.labels, key, [("le", bound)]), cumulative))
+            samples.append((f"{self.name}_sum", _labels(self.labels, key), round(total, 6)))
+            samples.append((f"{self.name}_count", _labels(self.labels, key), cumulative))
+        return samples
+
+
+class Gauge:
+    """Point-in-time values, set right before rendering (kind="counter" to mirror a counter kept elsewhere)"""
+
+    def __init__(self, name, help_text, labels=(), kind="gauge"):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+
+    def set(self, value, *label_values):
+        self._values[label_values] = value
+
+    def samples(self):
+        return [(self.name, _labels(self.labels, key), value) for key, value in sorted(self._values.items())]
+
+
+def render(metrics):
+    """Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for metric in metrics:
+        samples = metric.samples()
+        if not samples:
+            continue
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in samples)
+    return "\n".join(lines) + "\n"
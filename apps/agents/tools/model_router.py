@@ -0,0 +1,439 @@
+# apps/agents/tools/model_router.py
+
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Optional
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import merge_configs
+from apps.agents.tools.circuit_breaker import CircuitOpen, get_breaker
+from apps.agents.tools.context_packing import context_budget
+from apps.agents.tools.hedging import HedgedChatModel
+from apps.agents.tools.llm_loader import AGENT_MODEL, get_llm, get_provider, is_provider_available
+
+TASKS = ("chat", "course", "quiz", "exercise", "summary")
+
+# Lowest quality tier each task accepts (1 = small/fast model, 3 = large model)
+DEFAULT_MIN_TIERS = {"chat": 1, "summary": 1, "quiz": 2, "exercise": 2, "course": 3}
+
+# p95 latency (seconds) above which a route is considered degraded
+DEFAULT_MAX_P95 = {"chat": 8, "summary": 10, "quiz": 30, "exercise": 30, "course": 60}
+
+
+class Route:
+    """One provider/model able to serve a task, with its quality tier"""
+
+    def __init__(self, provider, model, tier):
+        self.provider = provider
+        self.model = model
+        self.tier = tier
+
+    @property
+    def key(self):
+        return f"{self.provider}:{self.model}"
+
+    def __repr__(self):
+        return f"{self.key}@{self.tier}"
+
+
+def parse_routes(value):
+    """
+    Ex: "groq:meta-llama/llama-4-scout-17b-16e-instruct@3, ollama:llama3.2:3b@1"
+    => [Route(groq, llama-4-scout, 3), Route(ollama, llama3.2:3b, 1)] (tier defaults to 3)
+    """
+    routes = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        spec, _, tier = item.rpartition("@") if "@" in item else (item, "", "3")
+        provider, _, model = spec.partition(":")
+        if provider and model:
+            routes.append(Route(provider, model, int(tier or 3)))
+    return routes
+
+
+# Sets collecting the keys of the routes serving the calls of the enclosing track_routes() blocks
+_served_routes = contextvars.ContextVar("eduai_served_routes", default=())
+
+
+@contextmanager
+def track_routes():
+    """
+    Collects the keys of the routes that served the routed LLM calls made inside
+    the block (worker threads included when they run in a copy of its context),
+    so a result can be stored under the model that actually produced it.
+    """
+    served = set()
+    token = _served_routes.set(_served_routes.get() + (served,))
+    try:
+        yield served
+    finally:
+        try:
+            _served_routes.reset(token)
+        except ValueError:
+            # Generator resumed in another context than the one it started in
+            pass
+
+
+def _note_served(trackers, route):
+    for served in trackers:
+        served.add(route.key)
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else None
+
+
+class RouteStats:
+    """
+    Rolling latency and outcome samples of one route (last `window` calls within `max_age` s).
+    Hedged calls also report their time to first token.
+    """
+
+    def __init__(self, window=100, max_age=600):
+        self.max_age = max_age
+        self._samples = deque(maxlen=window)
+
+    def record(self, latency, ok, first_token=None):
+        self._samples.append((time.monotonic(), latency, ok, first_token))
+
+    def snapshot(self):
+        cutoff = time.monotonic() - self.max_age
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        latencies = sorted(latency for _, latency, ok, _ in self._samples if ok)
+        first_tokens = sorted(ttft for _, _, ok, ttft in self._samples if ok and ttft is not None)
+        errors = sum(1 for _, _, ok, _ in self._samples if not ok)
+        samples = len(self._samples)
+        return {
+            'samples': samples,
+            'p50': _percentile(latencies, 0.5),
+            'p95': _percentile(latencies, 0.95),
+            'ttft_samples': len(first_tokens),
+            'ttft_p90': _percentile(first_tokens, 0.9),
+            'error_rate': errors / samples if samples else 0.0,
+        }
+
+
+class ModelRouter:
+    """
+    Picks the provider and model serving each agent task.
+    Routes are tried in their configured order: the first healthy one wins, so
+    traffic stays on the primary while it is healthy. A route is degraded when
+    its rolling error rate exceeds `max_error_rate` or its p95 latency exceeds
+    the task's limit; traffic then shifts to the fastest healthy route among
+    those meeting the task's minimum quality tier. A small `probe_rate` of
+    calls still goes to the preferred route so its recovery is noticed.
+    Routes of a provider whose circuit breaker is open are skipped; when all
+    of them are, calls fail right away with CircuitOpen.
+
+    Calls of `hedge_tasks` are hedged: when the chosen route has produced no
+    token after its p90 time to first token (`hedge_delay` until measured,
+    clamped to `hedge_delay_bounds`), the request is also sent to the best
+    route of another provider, and the first to answer wins.
+    """
+
+    def __init__(self, routes, min_tiers=None, max_p95=None, max_error_rate=0.25,
+                 min_samples=5, probe_rate=0.05, hedge_tasks=(), hedge_delay=2.0,
+                 hedge_delay_bounds=(0.25, 10.0)):
+        self.routes = routes
+        self.min_tiers = min_tiers or {}
+        self.max_p95 = max_p95 or {}
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.probe_rate = probe_rate
+        self.hedge_tasks = set(hedge_tasks)
+        self.hedge_delay = hedge_delay
+        self.hedge_delay_bounds = hedge_delay_bounds
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._choices = {}
+
+    def candidates(self, task):
+        """Routes allowed for the task: available provider and tier high enough"""
+        min_tier = self.min_tiers.get(task, 1)
+        return [
+            route for route in self.routes.get(task, [])
+            if route.tier >= min_tier and is_provider_available(route.provider)
+        ]
+
+    def _route_stats(self, task, route):
+        key = (task, route.key)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = RouteStats()
+        return stats
+
+    def _is_healthy(self, task, snapshot):
+        if snapshot['samples'] < self.min_samples:
+            return True
+        if snapshot['error_rate'] > self.max_error_rate:
+            return False
+        max_p95 = self.max_p95.get(task)
+        return not (max_p95 and snapshot['p95'] is not None and snapshot['p95'] > max_p95)
+
+    def choose(self, task):
+        allowed = self.candidates(task)
+        if not allowed:
+            raise ValueError(f"No available model route for task {task}")
+        candidates = [route for route in allowed if get_breaker(route.provider).is_call_permitted()]
+        if not candidates:
+            breaker = min((get_breaker(route.provider) for route in allowed), key=lambda b: b.retry_after())
+            raise CircuitOpen(breaker.name, breaker.retry_after())
+        with self._lock:
+            snapshots = [self._route_stats(task, route).snapshot() for route in candidates]
+            healthy = [i for i, snapshot in enumerate(snapshots) if self._is_healthy(task, snapshot)]
+            if healthy and healthy[0] == 0:
+                chosen = 0
+            elif healthy:
+                # Primary degraded: fastest healthy route (unmeasured ones in configured order)
+                chosen = min(healthy, key=lambda i: (snapshots[i]['p50'] is None, snapshots[i]['p50'] or 0, i))
+            else:
+                # Everything degraded: least bad (errors weigh like a doubled latency)
+                chosen = min(range(len(candidates)), key=lambda i: (
+                    (snapshots[i]['p95'] or 0) * (1 + 4 * snapshots[i]['error_rate']), i
+                ))
+            if chosen != 0 and random.random() < self.probe_rate:
+                chosen = 0
+            previous = self._choices.get(task)
+            self._choices[task] = candidates[chosen].key
+        if previous is not None and previous != candidates[chosen].key and chosen != 0:
+            print(f"🔀 {task}: routing to {candidates[chosen].key} ({candidates[0].key} degraded)")
+        get_breaker(candidates[chosen].provider).before_call()
+        return candidates[chosen]
+
+    def current_key(self, task):
+        """Key of the route the task's traffic goes to: the last one chosen, else the first candidate"""
+        with self._lock:
+            chosen = self._choices.get(task)
+        if chosen is not None:
+            return chosen
+        routes = self.candidates(task) or self.routes.get(task)
+        return routes[0].key if routes else None
+
+    def hedge_route(self, task, route):
+        """Secondary route for a hedged call on `route`, None if the task isn't hedged"""
+        if task not in self.hedge_tasks:
+            return None
+        others = [
+            other for other in self.candidates(task)
+            if other.key != route.key and get_breaker(other.provider).state == 'closed'
+        ]
+        with self._lock:
+            healthy = [
+                other for other in others
+                if self._is_healthy(task, self._route_stats(task, other).snapshot())
+            ]
+        # Another provider first: a slow provider slows all of its models
+        ranked = sorted(healthy or others, key=lambda other: other.provider == route.provider)
+        return ranked[0] if ranked else None
+
+    def delay_for(self, task, route):
+        """Seconds without a token before hedging a call on `route`: its p90 time to first token"""
+        with self._lock:
+            snapshot = self._route_stats(task, route).snapshot()
+        delay = snapshot['ttft_p90'] if snapshot['ttft_samples'] >= self.min_samples else self.hedge_delay
+        low, high = self.hedge_delay_bounds
+        return min(max(delay, low), high)
+
+    def record(self, task, route, latency, ok, first_token=None):
+        with self._lock:
+            self._route_stats(task, route).record(latency, ok, first_token)
+        max_p95 = self.max_p95.get(task)
+        get_breaker(route.provider).record(ok, slow=bool(max_p95) and latency > max_p95)
+
+    def stats(self):
+        with self._lock:
+            report = {}
+            for task in self.routes:
+                report[task] = {
+                    'min_tier': self.min_tiers.get(task, 1),
+                    'current': self._choices.get(task),
+                    'hedged': task in self.hedge_tasks,
+                    'routes': [
+                        dict(
+                            self._route_stats(task, route).snapshot(),
+                            route=route.key,
+                            tier=route.tier,
+                            available=is_provider_available(route.provider),
+                        )
+                        for route in self.routes[task]
+                    ],
+                }
+        for task_report in report.values():
+            for route in task_report['routes']:
+                for name in ('p50', 'p95', 'ttft_p90', 'error_rate'):
+                    if route[name] is not None:
+                        route[name] = round(route[name], 3)
+        return report
+
+
+def _is_cancellation(error):
+    from apps.agents.tools.streaming import StreamCancelled
+    return isinstance(error, (StreamCancelled, asyncio.CancelledError))
+
+
+class RoutedLLM(Runnable):
+    """
+    Chat model stand-in for one task: each call is routed (ModelRouter.choose)
+    to a pooled client, hedged on a second route when the task is hedged, and
+    its latency and outcome feed the routes' statistics.
+    Chains built once (AIEngine) therefore follow routing changes.
+    """
+
+    def __init__(self, task, streaming=False, json_mode=False, router=None):
+        self.task = task
+        self.streaming = streaming
+        self.json_mode = json_mode
+        self._router = router
+
+    @property
+    def router(self):
+        return self._router or get_router()
+
+    def _client(self, route):
+        return get_llm(route.model, streaming=self.streaming, json_mode=self.json_mode, provider=route.provider)
+
+    def _hedged_client(self, route, secondary):
+        """Hedged model over two routes, each attempt reporting to its own route's statistics"""
+        routes = (route, secondary)
+        trackers = _served_routes.get()
+
+        def on_attempt(index, seconds, ok, first_token):
+            self.router.record(self.task, routes[index], seconds, ok, first_token)
+
+        def on_win(index):
+            _note_served(trackers, routes[index])
+
+        return HedgedChatModel(
+            primary=self._client(route),
+            secondary=self._client(secondary),
+            delay=self.router.delay_for(self.task, route),
+            streaming=self.streaming,
+            on_attempt=on_attempt,
+            on_win=on_win,
+            metadata={"agent_task": self.task},
+        )
+
+    def _prepare(self):
+        """Returns (route to record the call on, or None when the hedged model records it; client)"""
+        route = self.router.choose(self.task)
+        secondary = self.router.hedge_route(self.task, route)
+        if secondary is not None:
+            return None, self._hedged_client(route, secondary)
+        return route, self._client(route)
+
+    def _record(self, route, started, error=None):
+        if route is None or (error is not None and _is_cancellation(error)):
+            return
+        self.router.record(self.task, route, time.monotonic() - started, ok=error is None)
+        if error is None:
+            _note_served(_served_routes.get(), route)
+
+    def _config(self, config):
+        """Tags the call with its task (telemetry)"""
+        return merge_configs(config, {"metadata": {"agent_task": self.task}})
+
+    def invoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+        route, client = self._prepare()
+        started = time.monotonic()
+        try:
+            result = client.invoke(input, self._config(config), **kwargs)
+        except BaseException as e:
+            self._record(route, started, e)
+            raise
+        self._record(route, started)
+        return result
+
+    async def ainvoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
+        route, client = self._prepare()
+        started = time.monotonic()
+        try:
+            result = await client.ainvoke(input, self._config(config), **kwargs)
+        except BaseException as e:
+            self._record(route, started, e)
+            raise
+        self._record(route, started)
+        return result
+
+
+def _env_name(task):
+    return f"AI_ROUTE_{task.upper()}"
+
+
+def _default_route(task):
+    """Without configuration, tasks keep the single model they always used"""
+    model = os.getenv("DEFAULT_LLM_MODEL", "mistral") if task == "summary" else AGENT_MODEL
+    return f"{get_provider()}:{model}@3"
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """
+    Returns the process-wide model router configured from environment:
+    AI_ROUTE_<TASK> lists the routes of a task in preference order
+    ("provider:model@tier, ..."), AI_ROUTE_<TASK>_MIN_TIER and
+    AI_ROUTE_<TASK>_MAX_P95 override the task's quality floor and latency limit,
+    AI_HEDGE_TASKS lists the hedged tasks.
+    """
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter(
+                    routes={task: parse_routes(os.getenv(_env_name(task)) or _default_route(task)) for task in TASKS},
+                    min_tiers={
+                        task: int(os.getenv(f"{_env_name(task)}_MIN_TIER", DEFAULT_MIN_TIERS[task]))
+                        for task in TASKS
+                    },
+                    max_p95={
+                        task: float(os.getenv(f"{_env_name(task)}_MAX_P95", DEFAULT_MAX_P95[task]))
+                        for task in TASKS
+                    },
+                    max_error_rate=float(os.getenv("AI_ROUTE_MAX_ERROR_RATE", "0.25")),
+                    probe_rate=float(os.getenv("AI_ROUTE_PROBE_RATE", "0.05")),
+                    hedge_tasks=[
+                        task.strip() for task in os.getenv("AI_HEDGE_TASKS", "chat,quiz").split(",") if task.strip()
+                    ],
+                    hedge_delay=float(os.getenv("AI_HEDGE_DELAY", "2.0")),
+                    hedge_delay_bounds=(
+                        float(os.getenv("AI_HEDGE_MIN_DELAY", "0.25")),
+                        float(os.getenv("AI_HEDGE_MAX_DELAY", "10")),
+                    ),
+                )
+    return _router
+
+
+def get_task_llm(task, streaming=False, json_mode=False, model_name=None):
+    """
+    Returns the routed LLM of an agent task (see TASKS).
+    An explicit model_name bypasses routing and pins that model.
+    """
+    if model_name:
+        return get_llm(model_name=model_name, streaming=streaming, json_mode=json_mode)
+    if task not in TASKS:
+        raise ValueError(f"Unknown agent task: {task}")
+    return RoutedLLM(task, streaming=streaming, json_mode=json_mode)
+
+
+def task_route_key(task, model_name=None):
+    """
+    Key ("provider:model") of the route serving a task now, for what is kept per
+    model: response cache entries, admission slots. A pinned model_name is used as is.
+    """
+    if model_name:
+        return f"{get_provider()}:{model_name}"
+    return get_router().current_key(task) or f"{get_provider()}:{AGENT_MODEL}"
+
+
+def get_context_budget(task, model_name=None):
+    """Retrieved context budget (tokens) of a task, sized for the smallest model that may serve it"""
+    if model_name:
+        return context_budget([model_name])
+    return context_budget([route.model for route in get_router().routes.get(task, [])])
@@ -0,0 +1,315 @@
+# apps/agents/tools/response_cache.py
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from apps.agents.tools.model_router import track_routes
+from apps.agents.tools.single_flight import get_single_flight
+from apps.agents.tools.telemetry import note_cache
+
+CACHE_PATH = os.getenv("AI_RESPONSE_CACHE_PATH", "apps/agents/cache/responses.sqlite3")
+
+
+class ResponseCache:
+    """
+    Disk-backed cache of LLM generations (SQLite file, shared by all worker processes).
+    Entries expire after `ttl_seconds`; when the cache grows past `max_entries`
+    or `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=5000, max_bytes=200 * 1024 * 1024, ttl_seconds=7 * 24 * 3600):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0}
+
+    def _connect(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), timeout=5, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(namespace, model, template, inputs):
+        """Hash of model, prompt template and inputs"""
+        payload = json.dumps(
+            {'namespace': namespace, 'model': model, 'template': template, 'inputs': inputs},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the cached value or None"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    conn.commit()
+                self._stats['misses'] += 1
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self._stats['hits'] += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, namespace="default", ttl_seconds=None):
+        """Stores a JSON-serializable value"""
+        now = time.time()
+        data = json.dumps(value, ensure_ascii=False)
+        expires_at = now + (ttl_seconds or self.ttl_seconds)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, namespace, value, size, created_at, last_access, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, namespace, data, len(data.encode("utf-8")), now, now, expires_at)
+            )
+            self._stats['sets'] += 1
+            self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn, now):
+        """Drops expired entries, then least recently used ones until limits hold"""
+        evicted = conn.execute("DELETE FROM responses WHERE expires_at < ?", (now,)).rowcount
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        while count > self.max_entries or total > self.max_bytes:
+            row = conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            count -= 1
+            total -= row[1]
+            evicted += 1
+        self._stats['evictions'] += evicted
+
+    def pop(self, key):
+        """Returns the cached value and removes it, None if there is none (or it expired)"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.commit()
+            if row is None or row[1] < now:
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+        return json.loads(row[0])
+
+    def delete(self, key):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            conn.commit()
+
+    def clear(self, namespace=None):
+        with self._lock:
+            conn = self._connect()
+            if namespace:
+                conn.execute("DELETE FROM responses WHERE namespace = ?", (namespace,))
+            else:
+                conn.execute("DELETE FROM responses")
+            conn.commit()
+
+    def stats(self):
+        """Hit/miss counters of this process plus current cache size"""
+        with self._lock:
+            conn = self._connect()
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['entries'] = count
+        stats['bytes'] = total
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def is_cache_enabled():
+    return os.getenv("AI_RESPONSE_CACHE_ENABLED", "1") == "1"
+
+
+def get_response_cache():
+    """Returns the process-wide response cache configured from environment"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    max_entries=int(os.getenv("AI_RESPONSE_CACHE_MAX_ENTRIES", "5000")),
+                    max_bytes=int(os.getenv("AI_RESPONSE_CACHE_MAX_MB", "200")) * 1024 * 1024,
+                    ttl_seconds=int(os.getenv("AI_RESPONSE_CACHE_TTL", str(7 * 24 * 3600))),
+                )
+    return _cache
+
+
+class Uncached:
+    """
+    compute() result to return without storing it, e.g. a degraded fallback
+    that must not be served to the next requests: return Uncached(value)
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+
+def _unwrap(value):
+    return value.value if isinstance(value, Uncached) else value
+
+
+def _producer(route, served):
+    """
+    Route to store a generation under: the one that served its LLM calls (see
+    track_routes), `route` when none was routed, None when several were.
+    """
+    if not served:
+        return route
+    return next(iter(served)) if len(served) == 1 else None
+
+
+def get_cached(namespace, route, template, inputs):
+    """
+    Returns the cached value for these generation arguments, or None.
+    `route` is the "provider:model" key of the model expected to serve the
+    generation (see model_router.task_route_key).
+    """
+    if not is_cache_enabled():
+        return None
+    cache = get_response_cache()
+    try:
+        return cache.get(cache.make_key(namespace, route, template, inputs))
+    except sqlite3.Error as e:
+        print(f"⚠️ Response cache unavailable: {e}")
+        return None
+
+
+def store_cached(namespace, route, template, inputs, value, served=()):
+    """
+    Stores a value produced outside cached_generation (e.g. by a stream).
+    `served` are the routes that produced it (see track_routes): the value is
+    stored under the model that generated it, not under the expected one.
+    """
+    route = _producer(route, served)
+    if not is_cache_enabled() or value is None or route is None:
+        return
+    cache = get_response_cache()
+    try:
+        cache.set(cache.make_key(namespace, route, template, inputs), value, namespace=namespace)
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        print(f"⚠️ Could not store response in cache: {e}")
+
+
+def cached_generation(namespace, route, template, inputs, compute, use_cache=True):
+    """
+    Returns compute() through the response cache.
+    compute() must return a JSON-serializable value, or None on failure
+    (None is never cached), or an Uncached value to return without storing it.
+    Pass use_cache=False to bypass the cache for one call.
+    Values are looked up under `route`, the model expected to serve the call,
+    and stored under the one that served it (a fallback route's output never
+    lands under the primary's key).
+
+    Concurrent misses on the same key share a single compute() call, within
+    the process and, through the single-flight lock backend, across workers.
+    """
+    if not use_cache or not is_cache_enabled():
+        return _unwrap(compute())
+
+    cache = get_response_cache()
+    key = cache.make_key(namespace, route, template, inputs)
+
+    def lookup():
+        try:
+            return cache.get(key)
+        except sqlite3.Error as e:
+            print(f"⚠️ Response cache unavailable: {e}")
+            return None
+
+    def compute_and_store():
+        with track_routes() as served:
+            value = compute()
+        if isinstance(value, Uncached):
+            return value.value
+        producer = _producer(route, served)
+        if value is not None and producer is not None:
+            try:
+                cache.set(cache.make_key(namespace, producer, template, inputs), value, namespace=namespace)
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                print(f"⚠️ Could not store response in cache: {e}")
+        return value
+
+    cached = lookup()
+    note_cache("response", "miss" if cached is None else "hit")
+    if cached is not None:
+        print(f"⚡ Response cache hit ({namespace})")
+        return cached
+
+    return get_single_flight().do(f"{namespace}:{key}", compute_and_store, recheck=lookup)
+
+
+async def acached_generation(namespace, route, template, inputs, acompute, use_cache=True):
+    """
+    Async variant of cached_generation: `acompute` is a coroutine function.
+    SQLite reads and writes run in a thread so they never block the event loop;
+    concurrent misses share one acompute() call within the process.
+    """
+    if not use_cache or not is_cache_enabled():
+        return _unwrap(await acompute())
+
+    async def lookup():
+        return await asyncio.to_thread(get_cached, namespace, route, template, inputs)
+
+    async def compute_and_store():
+        with track_routes() as served:
+            value = await acompute()
+        if isinstance(value, Uncached):
+            return value.value
+        await asyncio.to_thread(store_cached, namespace, route, template, inputs, value, served)
+        return value
+
+    cached = await lookup()
+    note_cache("response", "miss" if cached is None else "hit")
+    if cached is not None:
+        print(f"⚡ Response cache hit ({namespace})")
+        return cached
+
+    cache = get_response_cache()
+    key = cache.make_key(namespace, route, template, inputs)
+    return await get_single_flight().ado(f"{namespace}:{key}", compute_and_store, recheck=lookup)
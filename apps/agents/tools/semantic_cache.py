@@ -0,0 +1,191 @@
+# apps/agents/tools/semantic_cache.py
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+import numpy as np
+from apps.rag.utils import load_embedding_function, get_index_version
+from apps.agents.tools.telemetry import note_cache
+
+# Upper bounds of the similarity histogram buckets
+SIMILARITY_BUCKETS = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98, 1.0]
+
+
+class SemanticCache:
+    """
+    In-memory cache of chat answers matched by embedding similarity.
+    Questions are only compared within the same (module, language) bucket.
+    Entries expire after `ttl_seconds`, the least recently used are evicted
+    beyond `max_entries`, and everything is dropped when the Chroma index changes.
+    """
+
+    def __init__(self, threshold=0.92, max_entries=1000, ttl_seconds=24 * 3600, max_question_chars=500):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Long inputs are generation prompts, not chat questions: two of them
+        # differing by a single topic word would look almost identical
+        self.max_question_chars = max_question_chars
+        self._entries = OrderedDict()
+        self._matrices = {}
+        self._next_id = 0
+        self._index_version = get_index_version()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'skipped': 0, 'stores': 0, 'evictions': 0, 'invalidations': 0}
+        self._histogram = [0] * len(SIMILARITY_BUCKETS)
+
+    def _skip(self):
+        with self._lock:
+            self._stats['skipped'] += 1
+        return None
+
+    def _is_cacheable(self, question):
+        return bool(question) and len(question) <= self.max_question_chars
+
+    def _normalize(self, embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def embed(self, question):
+        """Returns the normalized embedding of a question, or None if it should not be cached"""
+        if not self._is_cacheable(question):
+            return self._skip()
+        try:
+            embedding = load_embedding_function().embed_query(question)
+        except Exception as e:
+            print(f"⚠️ Semantic cache: embedding failed: {e}")
+            return self._skip()
+        return self._normalize(embedding)
+
+    async def aembed(self, question):
+        """Async variant of embed()"""
+        if not self._is_cacheable(question):
+            return self._skip()
+        try:
+            embedding = await load_embedding_function().aembed_query(question)
+        except Exception as e:
+            print(f"⚠️ Semantic cache: embedding failed: {e}")
+            return self._skip()
+        return self._normalize(embedding)
+
+    def _check_index_version(self):
+        version = get_index_version()
+        if version != self._index_version:
+            self._entries.clear()
+            self._matrices.clear()
+            self._index_version = version
+            self._stats['invalidations'] += 1
+            print("🔄 Semantic cache invalidated (knowledge base changed)")
+
+    def _bucket_matrix(self, bucket, now):
+        """Returns (ids, matrix) of live entries in a bucket"""
+        expired = [
+            entry_id for entry_id, entry in self._entries.items()
+            if entry['bucket'] == bucket and now - entry['created_at'] > self.ttl_seconds
+        ]
+        for entry_id in expired:
+            del self._entries[entry_id]
+        if expired:
+            self._matrices.pop(bucket, None)
+
+        if bucket not in self._matrices:
+            ids = [entry_id for entry_id, entry in self._entries.items() if entry['bucket'] == bucket]
+            matrix = np.stack([self._entries[i]['vector'] for i in ids]) if ids else None
+            self._matrices[bucket] = (ids, matrix)
+        return self._matrices[bucket]
+
+    def lookup(self, vector, module, language):
+        """Returns the closest cached entry above threshold, or None"""
+        bucket = (module or 'general', language)
+        now = time.time()
+        with self._lock:
+            self._check_index_version()
+            ids, matrix = self._bucket_matrix(bucket, now)
+            if matrix is None:
+                self._stats['misses'] += 1
+                note_cache("semantic", "miss")
+                return None
+
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            self._histogram[min(bisect_left(SIMILARITY_BUCKETS[:-1], similarity), len(SIMILARITY_BUCKETS) - 1)] += 1
+
+            if similarity < self.threshold:
+                self._stats['misses'] += 1
+                note_cache("semantic", "miss")
+                return None
+
+            entry_id = ids[best]
+            self._entries.move_to_end(entry_id)
+            self._stats['hits'] += 1
+            note_cache("semantic", "hit")
+            entry = self._entries[entry_id]
+            return {
+                'answer': entry['answer'],
+                'sources': entry['sources'],
+                'similarity': round(similarity, 4),
+            }
+
+    def store(self, vector, module, language, answer, sources):
+        bucket = (module or 'general', language)
+        with self._lock:
+            self._check_index_version()
+            self._entries[self._next_id] = {
+                'bucket': bucket,
+                'vector': vector,
+                'answer': answer,
+                'sources': sources,
+                'created_at': time.time(),
+            }
+            self._next_id += 1
+            self._matrices.pop(bucket, None)
+            self._stats['stores'] += 1
+
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._matrices.pop(evicted['bucket'], None)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrices.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            histogram = list(self._histogram)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['threshold'] = self.threshold
+        stats['similarity_histogram'] = {
+            f"le_{upper}": count for upper, count in zip(SIMILARITY_BUCKETS, histogram)
+        }
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def is_semantic_cache_enabled():
+    return os.getenv("AI_SEMANTIC_CACHE_ENABLED", "1") == "1"
+
+
+def get_semantic_cache():
+    """Returns the process-wide semantic answer cache configured from environment"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache(
+                    threshold=float(os.getenv("AI_SEMANTIC_CACHE_THRESHOLD", "0.92")),
+                    max_entries=int(os.getenv("AI_SEMANTIC_CACHE_MAX_ENTRIES", "1000")),
+                    ttl_seconds=int(os.getenv("AI_SEMANTIC_CACHE_TTL", str(24 * 3600))),
+                )
+    return _cache
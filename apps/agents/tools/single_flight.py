@@ -0,0 +1,200 @@
+# apps/agents/tools/single_flight.py
+
+import asyncio
+import hashlib
+import importlib
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+
+class LocalLockBackend:
+    """No cross-process locking: coalescing only happens inside this process"""
+
+    def lock(self, key):
+        return nullcontext()
+
+
+class FileLockBackend:
+    """
+    Cross-process locking with flock() on one file per key.
+    Works for all workers sharing a filesystem (one machine).
+    If the lock is not obtained within `timeout` seconds, the caller proceeds anyway.
+    """
+
+    def __init__(self, directory="apps/agents/cache/locks", timeout=120):
+        self.directory = Path(directory)
+        self.timeout = timeout
+
+    @contextmanager
+    def lock(self, key):
+        import fcntl
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        with open(self.directory / f"{name}.lock", "w") as handle:
+            deadline = time.monotonic() + self.timeout
+            locked = False
+            while not locked:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                except BlockingIOError:
+                    if time.monotonic() > deadline:
+                        print("⚠️ Single-flight lock timeout, proceeding without lock")
+                        break
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                if locked:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key runs the
+    function, callers arriving while it runs wait and receive the same result.
+
+    Across processes, the lock backend serializes the leaders of each process;
+    `recheck` is called once the lock is held so that a later leader can pick up
+    the result stored (e.g. in the response cache) by the first one.
+    """
+
+    def __init__(self, lock_backend=None):
+        self.lock_backend = lock_backend or LocalLockBackend()
+        self._calls = {}
+        self._async_calls = {}
+        self._lock = threading.Lock()
+        self._stats = {'leaders': 0, 'shared': 0, 'rechecked': 0}
+
+    def do(self, key, fn, recheck=None, distributed=True):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats['leaders'] += 1
+            else:
+                self._stats['shared'] += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            lock = self.lock_backend.lock(key) if distributed else nullcontext()
+            with lock:
+                result = recheck() if recheck else None
+                if result is not None:
+                    with self._lock:
+                        self._stats['rechecked'] += 1
+                else:
+                    result = fn()
+            call.result = result
+            return result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    async def ado(self, key, afn, recheck=None):
+        """
+        Coroutine variant of do(): callers awaiting the same key on the same event
+        loop share one afn() call. `afn` and `recheck` are coroutine functions.
+        Coalescing is local to the process (no cross-process lock from async code).
+        """
+        loop = asyncio.get_running_loop()
+        # Futures are bound to their loop: never share one across loops
+        loop_key = (id(loop), key)
+        with self._lock:
+            future = self._async_calls.get(loop_key)
+            is_leader = future is None
+            if is_leader:
+                future = loop.create_future()
+                self._async_calls[loop_key] = future
+                self._stats['leaders'] += 1
+            else:
+                self._stats['shared'] += 1
+
+        if not is_leader:
+            try:
+                # A follower going away must not cancel the leader's call
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+                # The leader was cancelled (its client went away): take over
+                return await self.ado(key, afn, recheck)
+
+        try:
+            result = await recheck() if recheck else None
+            if result is not None:
+                with self._lock:
+                    self._stats['rechecked'] += 1
+            else:
+                result = await afn()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark it retrieved: without followers nobody else will
+            future.exception()
+            raise
+        finally:
+            with self._lock:
+                self._async_calls.pop(loop_key, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls) + len(self._async_calls)
+        return stats
+
+
+def _load_backend(name):
+    if name == "local":
+        return LocalLockBackend()
+    if name == "file":
+        return FileLockBackend()
+    # Dotted path to a custom backend class exposing lock(key)
+    module_name, class_name = name.rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    """
+    Returns the process-wide single-flight group.
+    AI_SINGLE_FLIGHT_BACKEND selects the lock backend: "local", "file" or a dotted class path
+    (defaults to "file" where flock() is available).
+    """
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                default = "file" if os.name == "posix" else "local"
+                backend = _load_backend(os.getenv("AI_SINGLE_FLIGHT_BACKEND", default))
+                _single_flight = SingleFlight(backend)
+    return _single_flight
@@ -0,0 +1,161 @@
+# apps/agents/tools/streaming.py
+
+import asyncio
+import contextvars
+import json
+import queue
+import threading
+from langchain_core.callbacks import BaseCallbackHandler
+
+_DONE = object()
+
+
+class StreamCancelled(Exception):
+    """Raised inside a running chain once its consumer has gone away"""
+
+
+class QueueCallbackHandler(BaseCallbackHandler):
+    """
+    Pushes retrieved documents and generated tokens into a queue.
+    When `cancel_event` is set, the next callback raises StreamCancelled, which
+    aborts the chain (and closes the provider's streaming connection).
+    """
+
+    # Let StreamCancelled propagate instead of being logged and ignored
+    raise_error = True
+
+    def __init__(self, events, cancel_event=None):
+        self.events = events
+        self.cancel_event = cancel_event or threading.Event()
+
+    def _check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise StreamCancelled()
+
+    def on_retriever_end(self, documents, **kwargs):
+        self._check_cancelled()
+        self.events.put(('sources', [doc.metadata.get('source', 'Unknown') for doc in documents]))
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._check_cancelled()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._check_cancelled()
+
+    def on_llm_new_token(self, token, **kwargs):
+        self._check_cancelled()
+        if token:
+            self.events.put(('token', token))
+
+
+def stream_chain(chain, inputs, cancel_event=None):
+    """
+    Runs a chain in a background thread and yields its events as they happen:
+    ('sources', [...]) after retrieval, ('token', str) for each generated token,
+    then ('result', chain_output) or ('error', message).
+    Setting `cancel_event`, or closing this generator early, stops the chain
+    at its next retrieval or token callback.
+    """
+    events = queue.Queue()
+    cancel_event = cancel_event or threading.Event()
+    handler = QueueCallbackHandler(events, cancel_event)
+
+    def run():
+        try:
+            result = chain.invoke(inputs, config={"callbacks": [handler]})
+            events.put(('result', result))
+        except Exception as e:
+            if cancel_event.is_set():
+                print("🛑 Generation cancelled")
+            else:
+                print(f"❌ Streaming chain failed: {e}")
+                events.put(('error', str(e)))
+        finally:
+            events.put(_DONE)
+
+    # In the caller's context, so the chain sees its cache outcome (telemetry)
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(run,), name="chain-stream", daemon=True).start()
+
+    finished = False
+    try:
+        while True:
+            event = events.get()
+            if event is _DONE:
+                finished = True
+                return
+            yield event
+    finally:
+        if not finished:
+            cancel_event.set()
+
+
+async def iterate_in_thread(make_iterator, cancel_event):
+    """
+    Async iteration over a blocking generator (e.g. AIOrchestrator.stream_answer)
+    driven by a worker thread. Cancelling the awaiting task sets `cancel_event`
+    and the worker stops at the next item.
+    """
+    from django.db import close_old_connections
+
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue()
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(items.put_nowait, item)
+        except RuntimeError:
+            # Event loop already closed (server shutting down)
+            cancel_event.set()
+
+    def pump():
+        try:
+            for item in make_iterator():
+                if cancel_event.is_set():
+                    break
+                put(item)
+        except Exception as e:
+            print(f"❌ Streaming worker failed: {e}")
+            put(('error', str(e)))
+        finally:
+            close_old_connections()
+            put(_DONE)
+
+    loop.run_in_executor(None, pump)
+    try:
+        while True:
+            item = await items.get()
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        cancel_event.set()
+
+
+async def astream_chain(chain, inputs):
+    """
+    Async variant of stream_chain running the chain on the event loop (no thread):
+    yields ('sources', [...]), ('token', str), then ('result', chain_output) or
+    ('error', message). Closing the generator cancels the chain at its next await.
+    """
+    try:
+        async for event in chain.astream_events(inputs, version="v2"):
+            kind = event["event"]
+            if kind == "on_retriever_end":
+                documents = event["data"].get("output") or []
+                yield 'sources', [doc.metadata.get('source', 'Unknown') for doc in documents]
+            elif kind in ("on_chat_model_stream", "on_llm_stream"):
+                chunk = event["data"]["chunk"]
+                token = chunk.content if hasattr(chunk, 'content') else getattr(chunk, 'text', '')
+                if token:
+                    yield 'token', token
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                yield 'result', event["data"].get("output")
+    except Exception as e:
+        print(f"❌ Streaming chain failed: {e}")
+        yield 'error', str(e)
+
+
+def format_sse(event, data):
+    """Formats one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,347 @@
+# apps/agents/tools/telemetry.py
+
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+from apps.agents.tools.metrics import Counter, Gauge, Histogram, render
+from apps.agents.tools.streaming import StreamCancelled
+from apps.agents.utils import estimate_tokens
+
+LLM_CALLS = Counter(
+    "eduai_llm_calls_total", "LLM calls by agent task, model and status", ("task", "model", "status"))
+LLM_LATENCY = Histogram(
+    "eduai_llm_latency_seconds", "Duration of LLM calls", ("task", "model"))
+LLM_TTFT = Histogram(
+    "eduai_llm_time_to_first_token_seconds", "Time to the first token of streamed LLM calls", ("task", "model"))
+LLM_TOKENS = Counter(
+    "eduai_llm_tokens_total", "Prompt and completion tokens (estimated when the provider doesn't report them)",
+    ("task", "model", "type"))
+RETRIEVAL_LATENCY = Histogram(
+    "eduai_retrieval_seconds", "Duration of knowledge base retrievals", ("task",))
+CHAIN_LATENCY = Histogram(
+    "eduai_agent_call_seconds", "Duration of traced agent calls, retrieval included", ("task", "cache"))
+CACHE_LOOKUPS = Counter(
+    "eduai_cache_lookups_total", "Response and semantic cache lookups", ("cache", "outcome"))
+
+METRICS = [LLM_CALLS, LLM_LATENCY, LLM_TTFT, LLM_TOKENS, RETRIEVAL_LATENCY, CHAIN_LATENCY, CACHE_LOOKUPS]
+
+# Outcome of the last cache lookup in this context (request, task or thread):
+# the LLM calls it leads to are traced with it
+_cache_outcome = contextvars.ContextVar("eduai_cache_outcome", default="none")
+
+
+def note_cache(cache, outcome):
+    """Records a cache lookup ("hit" or "miss") of `cache` ("response", "semantic")"""
+    CACHE_LOOKUPS.inc(cache, outcome)
+    _cache_outcome.set(f"{cache}:{outcome}")
+
+
+def _is_cancellation(error):
+    return isinstance(error, (StreamCancelled, asyncio.CancelledError, GeneratorExit))
+
+
+class _Trace:
+    """One agent call: a root chain (or a bare LLM call) and everything it ran"""
+
+    def __init__(self, name, cache):
+        self.name = name
+        self.cache = cache
+        self.started = time.monotonic()
+        self.task = None
+        self.model = ''
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retrieval = None
+        self.first_token = None
+
+    def record(self, status, error=None):
+        return {
+            'task': self.task,
+            'name': self.name[:100],
+            'model': self.model[:150],
+            'cache': self.cache,
+            'status': status,
+            'llm_calls': self.llm_calls,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'retrieval_ms': round(self.retrieval * 1000) if self.retrieval is not None else None,
+            'ttft_ms': round((self.first_token - self.started) * 1000) if self.first_token else None,
+            'latency_ms': round((time.monotonic() - self.started) * 1000),
+            'error': str(error)[:2000] if error else '',
+        }
+
+
+class _Run:
+    def __init__(self, kind, trace, task=None, model='', prompt_tokens=0, counted=True):
+        self.kind = kind
+        self.trace = trace
+        self.started = time.monotonic()
+        self.task = task
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.first_token = None
+        # False for the hedging wrapper: its attempts are counted on their own
+        self.counted = counted
+
+
+def _run_name(serialized, kwargs, default):
+    if kwargs.get('name'):
+        return kwargs['name']
+    serialized = serialized or {}
+    return serialized.get('name') or (serialized.get('id') or [default])[-1]
+
+
+def _usage(response):
+    """(prompt, completion) tokens reported by the provider, None when not reported"""
+    usage = (response.llm_output or {}).get('token_usage') or {}
+    prompt, completion = usage.get('prompt_tokens'), usage.get('completion_tokens')
+    if prompt is None:
+        for generations in response.generations:
+            for generation in generations:
+                metadata = getattr(getattr(generation, 'message', None), 'usage_metadata', None)
+                if metadata:
+                    prompt = (prompt or 0) + metadata.get('input_tokens', 0)
+                    completion = (completion or 0) + metadata.get('output_tokens', 0)
+    return prompt, completion
+
+
+class TelemetryHandler(BaseCallbackHandler):
+    """
+    Process-wide LangChain callback handler (installed on every run, see install()).
+    Feeds the LLM, retrieval and agent call metrics, and hands one record per
+    finished agent call to `persist` for a sampled share of them.
+    """
+
+    # Cheap and thread-safe: no need to run it in an executor for async chains
+    run_inline = True
+
+    def __init__(self, persist=None, sample_rate=0.1):
+        self.persist = persist
+        self.sample_rate = sample_rate
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def _parent_trace(self, parent_run_id):
+        parent = self._runs.get(parent_run_id) if parent_run_id else None
+        return parent.trace if parent else None
+
+    # === Chains ===
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        with self._lock:
+            trace = self._parent_trace(parent_run_id)
+            if trace is None:
+                trace = _Trace(_run_name(serialized, kwargs, 'chain'), _cache_outcome.get())
+                self._runs[run_id] = _Run('root', trace)
+            else:
+                self._runs[run_id] = _Run('chain', trace)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end_chain(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end_chain(run_id, error)
+
+    def _end_chain(self, run_id, error=None):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is not None and run.kind == 'root':
+            self._finish(run.trace, error)
+
+    # === Retrievers ===
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        with self._lock:
+            trace = self._parent_trace(parent_run_id)
+            if trace is not None:
+                self._runs[run_id] = _Run('retriever', trace)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end_retriever(run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end_retriever(run_id)
+
+    def _end_retriever(self, run_id):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+            if run is not None:
+                run.trace.retrieval = (run.trace.retrieval or 0.0) + time.monotonic() - run.started
+
+    # === LLMs ===
+
+    def _start_llm(self, serialized, run_id, parent_run_id, metadata, kwargs, prompt_tokens):
+        metadata = metadata or {}
+        params = kwargs.get('invocation_params') or {}
+        model = (metadata.get('ls_model_name') or params.get('model') or params.get('model_name')
+                 or params.get('_type') or 'unknown')
+        counted = params.get('_type') != 'hedged'
+        with self._lock:
+            trace = self._parent_trace(parent_run_id)
+            if trace is None and 'hedge_attempt' not in metadata:
+                trace = _Trace(_run_name(serialized, kwargs, 'llm'), _cache_outcome.get())
+                kind = 'root_llm'
+            else:
+                kind = 'llm'
+            self._runs[run_id] = _Run(kind, trace, metadata.get('agent_task') or 'other', str(model),
+                                      prompt_tokens, counted)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        prompt_tokens = sum(estimate_tokens(str(message.content)) for batch in messages for message in batch)
+        self._start_llm(serialized, run_id, parent_run_id, metadata, kwargs, prompt_tokens)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        prompt_tokens = sum(estimate_tokens(prompt) for prompt in prompts)
+        self._start_llm(serialized, run_id, parent_run_id, metadata, kwargs, prompt_tokens)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        run = self._runs.get(run_id)
+        if run is not None and run.first_token is None:
+            run.first_token = time.monotonic()
+            if run.trace is not None and run.trace.first_token is None:
+                run.trace.first_token = run.first_token
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        prompt, completion = _usage(response)
+        if prompt is None:
+            prompt = run.prompt_tokens
+            completion = sum(
+                estimate_tokens(generation.text) for generations in response.generations for generation in generations
+            )
+        self._end_llm(run, 'ok', prompt, completion or 0)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is not None:
+            self._end_llm(run, 'cancelled' if _is_cancellation(error) else 'error', run.prompt_tokens, 0, error)
+
+    def _end_llm(self, run, status, prompt_tokens, completion_tokens, error=None):
+        now = time.monotonic()
+        if run.counted:
+            LLM_CALLS.inc(run.task, run.model, status)
+            if status == 'ok':
+                LLM_LATENCY.observe(now - run.started, run.task, run.model)
+                LLM_TOKENS.inc(run.task, run.model, 'prompt', amount=prompt_tokens)
+                LLM_TOKENS.inc(run.task, run.model, 'completion', amount=completion_tokens)
+            if run.first_token is not None:
+                LLM_TTFT.observe(run.first_token - run.started, run.task, run.model)
+        trace = run.trace
+        if trace is None:
+            return
+        with self._lock:
+            trace.task = trace.task or run.task
+            trace.model = trace.model or run.model
+            trace.llm_calls += 1
+            trace.prompt_tokens += prompt_tokens
+            trace.completion_tokens += completion_tokens
+        if run.kind == 'root_llm':
+            self._finish(trace, error, status)
+
+    # === Agent calls ===
+
+    def _finish(self, trace, error=None, status=None):
+        if not trace.llm_calls:
+            # Nothing generated (cache hit, pure retrieval...): not an agent call
+            return
+        if status is None:
+            status = 'ok' if error is None else ('cancelled' if _is_cancellation(error) else 'error')
+        record = trace.record(status, error if status == 'error' else None)
+        CHAIN_LATENCY.observe(record['latency_ms'] / 1000, record['task'], record['cache'])
+        if trace.retrieval is not None:
+            RETRIEVAL_LATENCY.observe(trace.retrieval, record['task'])
+        # Failures are always kept, successes sampled
+        if self.persist is not None and (status == 'error' or random.random() < self.sample_rate):
+            try:
+                self.persist(record)
+            except Exception as e:
+                print(f"⚠️ Could not persist trace: {e}")
+
+
+_handler = None
+_install_lock = threading.Lock()
+
+
+def is_telemetry_enabled():
+    return os.getenv("AI_TELEMETRY_ENABLED", "1") == "1"
+
+
+def install(persist=None):
+    """Adds the telemetry handler to every LangChain run of this process (idempotent)"""
+    global _handler
+    with _install_lock:
+        if _handler is not None:
+            return _handler
+        _handler = TelemetryHandler(persist, sample_rate=float(os.getenv("AI_TRACE_SAMPLE_RATE", "0.1")))
+        # A context variable whose default is the handler: LangChain's configure
+        # hook then attaches it to runs started from any thread or task
+        register_configure_hook(contextvars.ContextVar("eduai_telemetry", default=_handler), inheritable=True)
+    print("📈 Agent telemetry enabled")
+    return _handler
+
+
+# === Metrics endpoint ===
+
+CIRCUIT_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+
+def _component_metrics():
+    """Gauges read from the other AI components when metrics are scraped"""
+    from apps.agents.tools.admission import get_admission_controller, is_admission_enabled
+    from apps.agents.tools.circuit_breaker import breaker_stats
+    from apps.agents.tools.llm_loader import get_pool_stats
+    from apps.agents.tools.response_cache import get_response_cache, is_cache_enabled
+    from apps.agents.tools.semantic_cache import get_semantic_cache, is_semantic_cache_enabled
+
+    circuit_state = Gauge("eduai_circuit_state", "Provider circuit breaker: 0 closed, 1 half-open, 2 open", ("provider",))
+    circuit_opened = Gauge("eduai_circuit_opened_total", "Times the provider circuit opened", ("provider",),
+                           kind="counter")
+    for provider, stats in breaker_stats().items():
+        circuit_state.set(CIRCUIT_STATES[stats['state']], provider)
+        circuit_opened.set(stats['opened'], provider)
+
+    pool = get_pool_stats()
+    in_flight = Gauge("eduai_llm_in_flight", "LLM calls running on pooled clients")
+    in_flight.set(pool['in_flight'])
+    clients = Gauge("eduai_llm_clients", "Pooled LLM clients")
+    clients.set(pool['clients'])
+    metrics = [circuit_state, circuit_opened, in_flight, clients]
+
+    if is_admission_enabled():
+        admission = get_admission_controller().stats()
+        active = Gauge("eduai_admission_active", "Generations holding a model slot", ("model",))
+        queued = Gauge("eduai_admission_queued", "Generations waiting for a model slot", ("model",))
+        for model, stats in admission['models'].items():
+            active.set(stats['active'], model)
+            queued.set(stats['queued'], model)
+        metrics += [active, queued]
+
+    if is_cache_enabled():
+        entries = Gauge("eduai_response_cache_entries", "Entries in the response cache")
+        entries.set(get_response_cache().stats()['entries'])
+        metrics.append(entries)
+    if is_semantic_cache_enabled():
+        semantic_entries = Gauge("eduai_semantic_cache_entries", "Entries in the semantic cache")
+        semantic_entries.set(get_semantic_cache().stats()['entries'])
+        metrics.append(semantic_entries)
+    return metrics
+
+
+def render_metrics():
+    """All agent metrics of this process, in Prometheus text format"""
+    try:
+        components = _component_metrics()
+    except Exception as e:
+        print(f"⚠️ Component metrics unavailable: {e}")
+        components = []
+    return render(METRICS + components)
@@ -0,0 +1,126 @@
+# apps/agents/traces.py
+
+import os
+import queue
+import threading
+import time
+from datetime import timedelta
+from django.db import models, close_old_connections
+from django.utils import timezone
+
+
+class LLMTrace(models.Model):
+    """
+    Sampled record of one agent call (see tools/telemetry.py): what ran,
+    on which model, how many tokens and where the time went.
+    """
+
+    STATUS_CHOICES = [
+        ('ok', 'OK'),
+        ('error', 'Error'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    task = models.CharField(max_length=30, db_index=True)
+    name = models.CharField(max_length=100)
+    model = models.CharField(max_length=150, blank=True)
+    cache = models.CharField(max_length=30, default='none')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ok')
+    llm_calls = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    retrieval_ms = models.PositiveIntegerField(null=True, blank=True)
+    ttft_ms = models.PositiveIntegerField(null=True, blank=True)
+    latency_ms = models.PositiveIntegerField()
+    error = models.TextField(blank=True)
+
+    class Meta:
+        app_label = 'agents'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.task} on {self.model} ({self.latency_ms} ms, {self.status})"
+
+
+class TraceWriter:
+    """
+    Writes traces from a background thread in batches: callbacks run on the
+    event loop and in request threads, where a database write would add latency
+    (or be refused, in async code). When the queue is full, traces are dropped.
+    Traces older than `retention_days` are deleted now and then.
+    """
+
+    def __init__(self, batch_size=50, flush_interval=2.0, max_queue=1000, retention_days=7):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._stats = {'written': 0, 'dropped': 0}
+
+    def put(self, record):
+        self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="trace-writer", daemon=True)
+                    self._thread.start()
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                print(f"⚠️ Could not write {len(batch)} trace(s): {e}")
+            finally:
+                close_old_connections()
+
+    def _write(self, batch):
+        LLMTrace.objects.bulk_create([LLMTrace(**record) for record in batch])
+        with self._lock:
+            self._stats['written'] += len(batch)
+        if time.monotonic() - self._last_prune > 3600:
+            self._last_prune = time.monotonic()
+            LLMTrace.objects.filter(created_at__lt=timezone.now() - timedelta(days=self.retention_days)).delete()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_trace_writer():
+    """Returns this process's trace writer configured from environment"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = TraceWriter(retention_days=int(os.getenv("AI_TRACE_RETENTION_DAYS", "7")))
+    return _writer
+
+
+def persist_trace(record):
+    """Telemetry sink: queues a trace record for writing"""
+    get_trace_writer().put(record)
@@ -0,0 +1,13 @@
+from django.urls import path
+from . import views
+
+app_name = 'agents'
+
+urlpatterns = [
+    path('ready/', views.readiness, name='readiness'),
+    path('jobs/<int:job_id>/', views.job_status, name='job_status'),
+    path('admission/', views.admission_stats, name='admission_stats'),
+    path('routes/', views.route_stats, name='route_stats'),
+    path('circuits/', views.circuit_stats, name='circuit_stats'),
+    path('prefetch/', views.prefetch_stats, name='prefetch_stats'),
+]
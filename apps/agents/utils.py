@@ -19,6 +19,13 @@ import re
 
 import re
 
+def estimate_tokens(text):
+    """
+    Cheap token count estimate (about 4 characters per token for Llama-style
+    tokenizers on English/French text), good enough for prompt budgets.
+    """
+    return (len(text) + 3) // 4 if text else 0
+
 def parse_text_quiz(text):
     """
     Parses a free-text quiz with potential code blocks in multiple languages.
@@ -33,46 +40,143 @@ def parse_text_quiz(text):
     Returns:
         {"questions": [...]}
     """
-    questions = []
-
-    # Split into blocks using Q<number>.
-    blocks = re.split(r"\nQ\d+\.", "\n" + text.strip())
-
-    for block in blocks[1:]:
-        lines = block.strip().splitlines()
-
-        question_lines = []
-        options = []
-        correct_letter = None
-        explanation = ""
-
-        # Phase 1: Extract question lines (everything before A./B./C.)
-        in_question = True
-        for line in lines:
-            stripped = line.strip()
-            if re.match(r"^[A-D]\. ", stripped):
-                in_question = False
-                options.append(stripped[3:].strip())
-            elif in_question:
-                question_lines.append(line)
-            elif re.match(r"^[A-D]\. ", stripped):
-                options.append(stripped[3:].strip())
-            elif stripped.lower().startswith("answer:") or stripped.lower().startswith("réponse:"):
-                correct_letter = stripped.split(":", 1)[1].strip().upper()
-            elif stripped.lower().startswith("explanation:") or stripped.lower().startswith("explication:"):
-                explanation = stripped.split(":", 1)[1].strip()
-
-        question_text = "\n".join(question_lines).strip()
-
-        if question_text and options and correct_letter in "ABCD":
-            questions.append({
-                "question": question_text,
-                "options": options,
-                "correct_answer": "ABCD".index(correct_letter),
-                "explanation": explanation
-            })
+    parser = QuizStreamParser()
+    questions = parser.feed(text) + parser.close()
 
     print("✅ Parsed questions:", questions)
     return {"questions": questions}
 
 
+class QuizStreamParser:
+    """
+    Incremental version of parse_text_quiz for streamed LLM output.
+    feed() consumes chunks of any size and returns the questions completed so far:
+    a question is emitted as soon as its "Explanation:" line ends (or, without
+    explanation, when the next "Q<n>." starts). Malformed blocks are dropped.
+
+    States: "preamble" (before the first question or after an emitted one),
+    "question" (statement and code), "options" (A./B./C./D., answer, explanation).
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._state = "preamble"
+        self._reset_question()
+
+    def _reset_question(self):
+        self._question_lines = []
+        self._options = []
+        self._correct_letter = None
+        self._explanation = ""
+
+    def feed(self, text):
+        questions = []
+        self._buffer += text
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            questions.extend(self._consume_line(line))
+        return questions
+
+    def close(self):
+        """Flushes the last line and the pending question at the end of the stream"""
+        questions = []
+        if self._buffer:
+            questions.extend(self._consume_line(self._buffer))
+            self._buffer = ""
+        questions.extend(self._finish_question())
+        return questions
+
+    def _finish_question(self):
+        if self._state == "preamble":
+            return []
+        question_text = "\n".join(self._question_lines).strip()
+        question = None
+        if question_text and self._options and self._correct_letter:
+            question = {
+                "question": question_text,
+                "options": self._options,
+                "correct_answer": "ABCD".index(self._correct_letter),
+                "explanation": self._explanation
+            }
+        self._state = "preamble"
+        self._reset_question()
+        return [question] if question else []
+
+    def _consume_line(self, line):
+        questions = []
+        stripped = line.strip()
+
+        start = re.match(r"^Q\d+\.(.*)$", line)
+        if start:
+            questions.extend(self._finish_question())
+            self._state = "question"
+            self._question_lines.append(start.group(1))
+            return questions
+
+        if self._state == "preamble":
+            # Introduction text, or trailing lines after an emitted question
+            return questions
+
+        if re.match(r"^[A-D]\. ", stripped):
+            self._state = "options"
+            self._options.append(stripped[3:].strip())
+        elif self._state == "question":
+            self._question_lines.append(line)
+        elif stripped.lower().startswith("answer:") or stripped.lower().startswith("réponse:"):
+            letter = re.match(r"([A-D])\b", stripped.split(":", 1)[1].strip().upper())
+            self._correct_letter = letter.group(1) if letter else None
+        elif stripped.lower().startswith("explanation:") or stripped.lower().startswith("explication:"):
+            self._explanation = stripped.split(":", 1)[1].strip()
+            if self._correct_letter:
+                # Explanation is the last line of a question: emit it now
+                questions.extend(self._finish_question())
+        return questions
+
+
+class MarkdownSectionStream:
+    """
+    Splits a Markdown document arriving in chunks into its title ("# ...")
+    and its "## " sections, as soon as each one is complete.
+    Headings inside ``` code blocks are ignored (Python comments look like headings).
+    """
+
+    def __init__(self):
+        self.title = None
+        self._buffer = ""
+        self._section = []
+        self._in_code = False
+
+    def feed(self, text):
+        """Consumes a chunk, returns the list of (event, value) it completes"""
+        events = []
+        self._buffer += text
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            events.extend(self._consume_line(line))
+        return events
+
+    def close(self):
+        """Flushes the last section at the end of the stream"""
+        events = []
+        if self._buffer:
+            events.extend(self._consume_line(self._buffer))
+            self._buffer = ""
+        section = "\n".join(self._section).strip("\n")
+        if section.strip():
+            events.append(("section", section))
+        self._section = []
+        return events
+
+    def _consume_line(self, line):
+        events = []
+        if line.strip().startswith("```"):
+            self._in_code = not self._in_code
+        elif not self._in_code:
+            if self.title is None and re.match(r"^# \S", line):
+                self.title = line[2:].strip()
+                events.append(("title", self.title))
+            elif line.startswith("## ") and any(l.strip() for l in self._section):
+                events.append(("section", "\n".join(self._section).strip("\n")))
+                self._section = []
+        self._section.append(line)
+        return events
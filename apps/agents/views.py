@@ -0,0 +1,69 @@
+import os
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.http import require_http_methods
+from .jobs import GenerationJob
+from .prefetch import get_prefetcher, is_prefetch_enabled
+from .tools.admission import get_admission_controller
+from .tools.circuit_breaker import breaker_stats
+from .tools.model_router import get_router
+from .tools.telemetry import render_metrics
+from .warmup import get_readiness
+
+
+@require_http_methods(["GET"])
+def readiness(request):
+    """Readiness probe: 200 once every AI component is warm, 503 before"""
+    report = get_readiness()
+    return JsonResponse(report, status=200 if report['ready'] else 503)
+
+
+@login_required
+@require_http_methods(["GET"])
+def job_status(request, job_id):
+    """Status of one of the user's generation jobs (polling fallback for ws/jobs/)"""
+    job = get_object_or_404(GenerationJob, id=job_id, user=request.user)
+    return JsonResponse(job.to_dict())
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def admission_stats(request):
+    """Admission control metrics: slots in use, queue depth, wait times, rejections"""
+    return JsonResponse(get_admission_controller().stats())
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def route_stats(request):
+    """Model routing per agent task: current route, rolling p50/p95 latency and error rate"""
+    return JsonResponse(get_router().stats())
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def circuit_stats(request):
+    """Circuit breaker of each LLM provider: state, recent failure and slow call rates"""
+    return JsonResponse(breaker_stats())
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def prefetch_stats(request):
+    """Speculative quiz/exercise generation: scheduled, cancelled under load, served"""
+    return JsonResponse(dict(get_prefetcher().stats(), enabled=is_prefetch_enabled()))
+
+
+@require_http_methods(["GET"])
+def metrics(request):
+    """
+    Prometheus metrics of this process. Scrapers authenticate with
+    "Authorization: Bearer <AI_METRICS_TOKEN>"; staff can also open it logged in.
+    """
+    token = os.getenv("AI_METRICS_TOKEN")
+    authorized = bool(token) and request.headers.get("Authorization") == f"Bearer {token}"
+    if not authorized and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
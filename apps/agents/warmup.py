@@ -0,0 +1,106 @@
+# apps/agents/warmup.py
+
+import threading
+import time
+from apps.agents.engine import get_engine
+from apps.agents.tools.llm_loader import get_llm
+from apps.agents.tools.model_router import TASKS, get_router
+from apps.rag.utils import get_vectorstore, load_embedding_function
+
+# Components warmed up, in order
+COMPONENTS = ['vectorstore', 'embeddings', 'chains', 'llm']
+
+_state = {name: {'ready': False, 'error': None, 'duration_ms': None} for name in COMPONENTS}
+_state_lock = threading.Lock()
+_warmup_lock = threading.Lock()
+
+
+def _warm_vectorstore():
+    # Opening the collection loads the Chroma index from disk
+    get_vectorstore()._collection.count()
+
+
+def _warm_embeddings():
+    # One embedding call loads mxbai-embed-large into Ollama memory
+    load_embedding_function().embed_query("warm-up")
+
+
+def _warm_chains():
+    engine = get_engine()
+    engine.get_chain('researcher')
+    engine.get_chain('pedagogue')
+
+
+def _routed_models():
+    """Routes the router may pick for any task, hedge routes included, each model once"""
+    router = get_router()
+    routes = {}
+    for task in TASKS:
+        for route in router.candidates(task):
+            routes.setdefault(route.key, route)
+    return list(routes.values())
+
+
+def _warm_llm():
+    # One-token prompt keeps every routed model resident
+    failed = []
+    for route in _routed_models():
+        try:
+            llm = get_llm(route.model, provider=route.provider)
+            if route.provider == "groq":
+                llm.invoke("ping", max_tokens=1)
+            else:
+                llm.invoke("ping", num_predict=1)
+        except Exception as e:
+            failed.append(f"{route.key}: {e}")
+    if failed:
+        raise RuntimeError("; ".join(failed))
+
+
+_WARMERS = {
+    'vectorstore': _warm_vectorstore,
+    'embeddings': _warm_embeddings,
+    'chains': _warm_chains,
+    'llm': _warm_llm,
+}
+
+
+def warm_up(components=None):
+    """
+    Warms up the AI stack and returns the readiness report.
+    Components that fail are reported with their error, the others still run.
+    """
+    with _warmup_lock:
+        for name in components or COMPONENTS:
+            start = time.monotonic()
+            try:
+                _WARMERS[name]()
+                error = None
+                print(f"🔥 Warm-up: {name} ready")
+            except Exception as e:
+                error = str(e)
+                print(f"⚠️ Warm-up: {name} failed: {e}")
+            with _state_lock:
+                _state[name] = {
+                    'ready': error is None,
+                    'error': error,
+                    'duration_ms': int((time.monotonic() - start) * 1000),
+                }
+    return get_readiness()
+
+
+def warm_up_in_background():
+    """Starts warm-up in a daemon thread so startup is not blocked"""
+    thread = threading.Thread(target=warm_up, name="ai-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def get_readiness():
+    """Returns which components are warm"""
+    with _state_lock:
+        components = {name: dict(state) for name, state in _state.items()}
+    return {
+        'ready': all(state['ready'] for state in components.values()),
+        'components': components,
+    }
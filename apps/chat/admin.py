@@ -1,3 +1,8 @@
 from django.contrib import admin
+from .models import Conversation
 
-# Register your models here.
+@admin.register(Conversation)
+class ConversationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'turn_count', 'updated_at')
+    search_fields = ('user__username', 'summary')
+    readonly_fields = ('created_at', 'updated_at')
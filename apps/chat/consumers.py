@@ -0,0 +1,118 @@
+import json
+import asyncio
+import threading
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from apps.agents.agent_orchestrator import get_orchestrator
+from apps.agents.tools.conversation_memory import get_conversation_memory
+from apps.agents.tools.streaming import iterate_in_thread
+from apps.agents.tools.admission import AdmissionRejected, get_admission_controller, is_admission_enabled, user_key
+
+
+class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    Streams chat answers over a WebSocket.
+    A socket is one conversation (see ConversationMemory), and only one
+    answer is generated at a time: a newer question, an explicit
+    'cancel' message or a disconnect cancels the in-flight LLM/RAG call.
+
+    Client -> server: {"type": "message", "message": "...", "conversation_id": optional}
+    or {"type": "cancel"}
+    Server -> client: sources, token, done, error and cancelled events, each
+    carrying the "id" of the question they answer.
+    """
+
+    async def connect(self):
+        self.user = self.scope['user']
+        self.task = None
+        self.cancel_event = None
+        self.message_id = 0
+        self.conversation_id = None
+        
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+        
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        # Nobody is listening anymore: stop paying for the generation
+        await self.cancel_current()
+
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            await self.send_event('error', response='Invalid JSON format')
+            return
+        message_type = data.get('type')
+        
+        if message_type == 'message':
+            message = (data.get('message') or '').strip()
+            if not message:
+                await self.send_event('error', response='Empty message')
+                return
+            # A newer question supersedes the one being answered
+            await self.cancel_current(notify=True)
+            if self.conversation_id is None:
+                # Resume a conversation started over HTTP (ownership checked on load)
+                self.conversation_id = data.get('conversation_id')
+            self.message_id += 1
+            self.cancel_event = threading.Event()
+            self.task = asyncio.create_task(self.answer(message, self.message_id, self.cancel_event))
+        elif message_type == 'cancel':
+            await self.cancel_current(notify=True)
+
+    async def cancel_current(self, notify=False):
+        if self.task is None or self.task.done():
+            return
+        self.cancel_event.set()
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        if notify:
+            await self.send_event('cancelled', id=self.message_id)
+
+    @database_sync_to_async
+    def load_conversation(self):
+        conversation = get_conversation_memory().load(self.user, self.conversation_id)
+        self.conversation_id = conversation.id
+        return conversation
+
+    async def answer(self, message, message_id, cancel_event):
+        orchestrator = get_orchestrator(self.user)
+        slot = None
+        try:
+            if is_admission_enabled():
+                slot = await get_admission_controller().aadmit(user_key(self.user), "chat")
+            conversation = await self.load_conversation()
+            async for event, payload in iterate_in_thread(
+                lambda: orchestrator.stream_answer(message, cancel_event=cancel_event, conversation=conversation),
+                cancel_event
+            ):
+                if event == 'sources':
+                    await self.send_event('sources', id=message_id, sources=payload)
+                elif event == 'token':
+                    await self.send_event('token', id=message_id, token=payload)
+                elif event == 'done':
+                    await self.send_event('done', id=message_id, cached=payload['cached'],
+                                          conversation_id=payload['conversation_id'])
+                else:
+                    await self.send_event('error', id=message_id, response=f"Sorry, I couldn't process your question: {payload}")
+        except AdmissionRejected as e:
+            await self.send_event('error', id=message_id, retry_after=e.retry_after,
+                                  response=f"The AI is busy, please try again in {e.retry_after} s.")
+        except asyncio.CancelledError:
+            print(f"🛑 Chat answer {message_id} cancelled")
+            raise
+        except Exception as e:
+            print(f"Error streaming answer: {e}")
+            await self.send_event('error', id=message_id, response=f"Sorry, I couldn't process your question: {e}")
+        finally:
+            if slot is not None:
+                slot.release()
+
+    async def send_event(self, event_type, **data):
+        await self.send(text_data=json.dumps({'type': event_type, **data}))
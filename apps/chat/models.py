@@ -1,3 +1,26 @@
 from django.db import models
+from django.contrib.auth import get_user_model
 
-# Create your models here.
+User = get_user_model()
+
+class Conversation(models.Model):
+    """
+    Bounded chat memory, one row per conversation so it loads in a single query:
+    the last turns verbatim and a rolling summary of everything older.
+    """
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversations')
+    summary = models.TextField(blank=True, default='')
+    recent_turns = models.JSONField(default=list, blank=True)  # [[question, answer], ...] oldest first
+    turn_count = models.PositiveIntegerField(default=0)  # All turns, summarized ones included
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-updated_at']
+        verbose_name = "Conversation"
+        verbose_name_plural = "Conversations"
+    
+    def __str__(self):
+        return f"Conversation {self.id} ({self.user}, {self.turn_count} turns)"
@@ -1,3 +1,284 @@
-from django.test import TestCase
+import json
+import threading
+from unittest import mock
 
-# Create your tests here.
+from asgiref.testing import ApplicationCommunicator
+
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase
+from langchain_core.language_models import FakeListLLM
+from langchain_core.runnables import RunnableLambda
+from django.urls import reverse
+
+from apps.agents.testing import FakeChain, read_sse, temp_admission_controller
+from apps.agents.tools.streaming import stream_chain
+from apps.agents.tools.conversation_memory import ConversationMemory
+from apps.chat.consumers import ChatConsumer
+from apps.chat.models import Conversation
+
+
+class StreamChainTests(SimpleTestCase):
+
+    def test_yields_sources_then_tokens_then_the_result(self):
+        chain = FakeChain(tokens=["A ", "list"], sources=["lists.md"])
+
+        events = list(stream_chain(chain, {"query": "What is a list?"}))
+
+        self.assertEqual(events, [
+            ('sources', ["lists.md"]),
+            ('token', "A "),
+            ('token', "list"),
+            ('result', {'result': "A list"}),
+        ])
+
+    def test_chain_failure_ends_with_an_error_event(self):
+        chain = FakeChain(tokens=["A "], error=RuntimeError("model down"))
+
+        events = list(stream_chain(chain, {"query": "What is a list?"}))
+
+        self.assertEqual(events[-1], ('error', "model down"))
+
+    def test_cancelled_stream_stops_the_chain_without_an_error(self):
+        cancel_event = threading.Event()
+        cancel_event.set()
+        chain = FakeChain(tokens=["A ", "list"], sources=["lists.md"])
+
+        self.assertEqual(list(stream_chain(chain, {"query": "What is a list?"}, cancel_event)), [])
+
+
+class StreamMessageViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="ada", email="ada@example.com", password="pw")
+
+    def setUp(self):
+        self.enterContext(temp_admission_controller())
+        self.client.force_login(self.user)
+        self.orchestrator = mock.Mock()
+        patcher = mock.patch("apps.chat.views.get_orchestrator", return_value=self.orchestrator)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _post(self, client, message="What is a list?"):
+        return client.post(reverse("chat:stream_message"), {"message": message}, content_type="application/json")
+
+    def test_streams_sources_tokens_and_done_without_sources(self):
+        self.orchestrator.stream_answer.return_value = iter([
+            ('sources', ["lists.md"]),
+            ('token', "A list"),
+            ('done', {'answer': "A list", 'sources': ["lists.md"], 'cached': False, 'session_id': 1}),
+        ])
+
+        response = self._post(self.client)
+
+        self.assertEqual(response['Content-Type'], "text/event-stream")
+        self.assertEqual(read_sse(response), [
+            ('sources', ["lists.md"]),
+            ('token', "A list"),
+            ('done', {'cached': False, 'conversation_id': Conversation.objects.get().id}),
+        ])
+
+    def test_conversation_is_resumed_from_its_id(self):
+        conversation = Conversation.objects.create(user=self.user)
+        self.orchestrator.stream_answer.return_value = iter([])
+
+        response = self.client.post(reverse("chat:stream_message"),
+                                    {"message": "And tuples?", "conversation_id": conversation.id},
+                                    content_type="application/json")
+        b"".join(response.streaming_content)
+
+        self.assertEqual(self.orchestrator.stream_answer.call_args.kwargs['conversation'], conversation)
+        self.assertEqual(Conversation.objects.count(), 1)
+
+    def test_conversation_of_another_user_is_not_resumed(self):
+        other = get_user_model().objects.create_user(username="bob", email="bob@example.com", password="pw")
+        conversation = Conversation.objects.create(user=other)
+        self.orchestrator.stream_answer.return_value = iter([])
+
+        response = self.client.post(reverse("chat:stream_message"),
+                                    {"message": "And tuples?", "conversation_id": conversation.id},
+                                    content_type="application/json")
+        b"".join(response.streaming_content)
+
+        self.assertNotEqual(self.orchestrator.stream_answer.call_args.kwargs['conversation'], conversation)
+
+    def test_generation_error_is_sent_as_an_event(self):
+        self.orchestrator.stream_answer.return_value = iter([('error', "model down")])
+
+        events = read_sse(self._post(self.client))
+
+        self.assertEqual(events[0][0], 'error')
+        self.assertIn("model down", events[0][1]['response'])
+
+    def test_empty_message_is_rejected(self):
+        self.assertEqual(self._post(self.client, message="").status_code, 400)
+
+    def test_csrf_token_is_required(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+
+        self.assertEqual(self._post(client).status_code, 403)
+        self.orchestrator.stream_answer.assert_not_called()
+
+
+class _BlockingOrchestrator:
+    """Sends one token, then blocks until its answer is cancelled"""
+
+    def __init__(self):
+        self.cancel_events = []
+
+    def stream_answer(self, question, cancel_event=None, conversation=None):
+        self.cancel_events.append(cancel_event)
+        yield 'token', f"About {question}"
+        cancel_event.wait(5)
+
+
+class _Socket(ApplicationCommunicator):
+    """WebSocket client for a consumer (channels.testing needs daphne, not a dependency here)"""
+
+    def __init__(self, user):
+        super().__init__(ChatConsumer.as_asgi(), {"type": "websocket", "path": "/ws/chat/", "user": user})
+
+    async def connect(self):
+        await self.send_input({"type": "websocket.connect"})
+        return (await self.receive_output(1))["type"] == "websocket.accept"
+
+    async def send_json(self, data):
+        await self.send_input({"type": "websocket.receive", "text": json.dumps(data)})
+
+    async def receive_json(self):
+        return json.loads((await self.receive_output(1))["text"])
+
+    async def disconnect(self):
+        await self.send_input({"type": "websocket.disconnect", "code": 1000})
+        await self.wait(1)
+
+
+class ChatConsumerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.enterContext(temp_admission_controller())
+        self.orchestrator = _BlockingOrchestrator()
+        for name, value in (("get_orchestrator", self.orchestrator),
+                            ("get_conversation_memory", mock.Mock(**{"load.return_value": mock.Mock(id=1)}))):
+            patcher = mock.patch(f"apps.chat.consumers.{name}", return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def _connect(self):
+        socket = _Socket(mock.Mock(is_authenticated=True))
+        self.assertTrue(await socket.connect())
+        return socket
+
+    async def test_cancel_message_stops_the_answer(self):
+        socket = await self._connect()
+        await socket.send_json({"type": "message", "message": "lists"})
+        self.assertEqual(await socket.receive_json(), {"type": "token", "id": 1, "token": "About lists"})
+
+        await socket.send_json({"type": "cancel"})
+
+        self.assertEqual(await socket.receive_json(), {"type": "cancelled", "id": 1})
+        self.assertTrue(self.orchestrator.cancel_events[0].is_set())
+        await socket.disconnect()
+
+    async def test_newer_question_supersedes_the_current_one(self):
+        socket = await self._connect()
+        await socket.send_json({"type": "message", "message": "lists"})
+        await socket.receive_json()
+
+        await socket.send_json({"type": "message", "message": "dicts"})
+
+        self.assertEqual(await socket.receive_json(), {"type": "cancelled", "id": 1})
+        self.assertEqual(await socket.receive_json(), {"type": "token", "id": 2, "token": "About dicts"})
+        self.assertTrue(self.orchestrator.cancel_events[0].is_set())
+        await socket.disconnect()
+        self.assertTrue(self.orchestrator.cancel_events[1].is_set())
+
+    async def test_anonymous_users_are_refused(self):
+        socket = _Socket(mock.Mock(is_authenticated=False))
+
+        self.assertFalse(await socket.connect())
+
+
+class ConversationMemoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="ada", email="ada@example.com", password="pw")
+
+    def setUp(self):
+        self.llm = FakeListLLM(responses=["Lists and tuples were covered."])
+        patcher = mock.patch("apps.agents.tools.conversation_memory.get_task_llm", return_value=self.llm)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.memory = ConversationMemory(max_turns=2, turns_token_budget=1500, summary_token_budget=300)
+        self.conversation = self.memory.load(self.user)
+
+    def test_new_conversation_has_no_history(self):
+        self.assertEqual(self.memory.format_history(self.conversation), "")
+
+    def test_turns_beyond_the_window_are_folded_into_the_summary(self):
+        for n in range(3):
+            self.memory.record(self.conversation, f"question {n}", f"answer {n}")
+
+        conversation = Conversation.objects.get(id=self.conversation.id)
+        self.assertEqual(conversation.turn_count, 3)
+        self.assertEqual(conversation.recent_turns, [["question 1", "answer 1"], ["question 2", "answer 2"]])
+        self.assertEqual(conversation.summary, "Lists and tuples were covered.")
+        history = self.memory.format_history(conversation)
+        self.assertIn("Summary of earlier exchanges: Lists and tuples were covered.", history)
+        self.assertIn("Student: question 2\nTutor: answer 2", history)
+        self.assertNotIn("question 0", history)
+
+    def test_summary_stays_within_its_budget(self):
+        self.llm.responses = ["word " * 1000]
+        for n in range(3):
+            self.memory.record(self.conversation, f"question {n}", f"answer {n}")
+
+        self.assertLessEqual(len(self.conversation.summary), 300 * 4)
+
+    def test_summarization_failure_keeps_the_raw_turns(self):
+        def fail(prompt):
+            raise RuntimeError("down")
+
+        with mock.patch("apps.agents.tools.conversation_memory.get_task_llm", return_value=RunnableLambda(fail)):
+            for n in range(3):
+                self.memory.record(self.conversation, f"question {n}", f"answer {n}")
+
+        self.assertIn("Student: question 0", self.conversation.summary)
+
+
+class SendMessageViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="ada", email="ada@example.com", password="pw")
+
+    def setUp(self):
+        self.enterContext(temp_admission_controller())
+        self.orchestrator = mock.Mock()
+        self.orchestrator.aanswer_question = mock.AsyncMock(return_value={'success': True, 'answer': "A sequence."})
+        self.enterContext(mock.patch("apps.chat.views.get_orchestrator", return_value=self.orchestrator))
+
+    async def test_answer_is_awaited_in_a_conversation(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+
+        response = await client.post(reverse("chat:send_message"), {"message": "What is a list?"},
+                                     content_type="application/json")
+
+        data = response.json()
+        self.assertEqual(data['response'], "A sequence.")
+        conversation = await Conversation.objects.aget(id=data['conversation_id'])
+        self.orchestrator.aanswer_question.assert_awaited_once_with("What is a list?", conversation=conversation)
+
+    async def test_failure_is_reported_in_the_answer(self):
+        self.orchestrator.aanswer_question.return_value = {'success': False, 'error': "model down"}
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+
+        response = await client.post(reverse("chat:send_message"), {"message": "What is a list?"},
+                                     content_type="application/json")
+
+        self.assertIn("model down", response.json()['response'])
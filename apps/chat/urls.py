@@ -6,4 +6,5 @@ app_name = 'chat'
 urlpatterns = [
     path('search/', views.search_chat, name='search'),
     path('api/message/', views.send_message, name='send_message'),
+    path('api/message/stream/', views.stream_message, name='stream_message'),
 ]
\ No newline at end of file
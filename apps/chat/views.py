@@ -1,8 +1,11 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from apps.agents.agent_orchestrator import get_orchestrator
+from apps.agents.tools.streaming import format_sse
+from apps.agents.tools.conversation_memory import get_conversation_memory
+from apps.agents.tools.admission import admission_controlled
 import json
 
 @login_required
@@ -11,7 +14,12 @@ def search_chat(request):
 
 @csrf_exempt
 @login_required
-def send_message(request):
+@admission_controlled(task="chat", methods=("POST",))
+async def send_message(request):
+    """
+    Async view: while the answer is generated (awaited embedding, retrieval and
+    LLM call), the worker's event loop keeps serving other requests.
+    """
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
@@ -23,13 +31,16 @@ def send_message(request):
             return JsonResponse({'error': 'Invalid JSON format'}, status=400)
         
         # Use AI orchestrator to respond
-        orchestrator = get_orchestrator(request.user)
-        result = orchestrator.answer_question(message)
+        user = await request.auser()
+        orchestrator = get_orchestrator(user)
+        conversation = await get_conversation_memory().aload(user, data.get('conversation_id'))
+        result = await orchestrator.aanswer_question(message, conversation=conversation)
         
         if result['success']:
             # Don't include sources in response
             response = {
                 'response': result['answer'],
+                'conversation_id': conversation.id,
                 'timestamp': '12:34:56'
             }
         else:
@@ -40,4 +51,44 @@ def send_message(request):
         
         return JsonResponse(response)
     
-    return JsonResponse({'error': 'Method not allowed'}, status=405)
\ No newline at end of file
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+@login_required
+@admission_controlled(task="chat", methods=("POST",))
+def stream_message(request):
+    """
+    Streaming variant of send_message (Server-Sent Events):
+    'sources' once retrieval is done, then 'token' events, then 'done'.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    try:
+        data = json.loads(request.body)
+        message = data.get('message')
+        
+        if not message:
+            return JsonResponse({'error': 'Empty message'}, status=400)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON format'}, status=400)
+    
+    orchestrator = get_orchestrator(request.user)
+    conversation = get_conversation_memory().load(request.user, data.get('conversation_id'))
+    
+    def events():
+        try:
+            for event, payload in orchestrator.stream_answer(message, conversation=conversation):
+                if event == 'done':
+                    # Don't include sources in final payload, like send_message
+                    payload = {'cached': payload['cached'], 'conversation_id': conversation.id}
+                elif event == 'error':
+                    payload = {'response': f"Sorry, I couldn't process your question: {payload}"}
+                yield format_sse(event, payload)
+        except Exception as e:
+            print(f"Error streaming answer: {e}")
+            yield format_sse('error', {'response': f"Sorry, I couldn't process your question: {e}"})
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
@@ -0,0 +1,53 @@
+# apps/courses/jobs.py
+
+import re
+from django.db import transaction
+from django.urls import reverse
+from apps.agents.agent_orchestrator import get_orchestrator
+from apps.rag.module_loader import module_loader
+from .models import Course
+
+
+def run_course_job(job):
+    """
+    Background course generation (job params: topic, module, pregenerated).
+    The course is saved right away since the user may have left the page;
+    the result points to it. Pre-generated courses (pregenerate_content) replace
+    their previous version and earn no XP.
+    """
+    topic = job.params['topic']
+    module = job.params.get('module') or 'general'
+
+    orchestrator = get_orchestrator(job.user)
+    if module != 'general':
+        module_info = next((m for m in module_loader.get_available_modules() if m['id'] == module), None)
+        if module_info:
+            orchestrator.current_module = module_info['name']
+
+    result = orchestrator.generate_course(topic)
+    if not result['success']:
+        raise RuntimeError(result.get('error', 'Error during course generation'))
+
+    content = result['content']
+    title_match = re.search(r'^# (.+)$', content, re.MULTILINE)
+    title = title_match.group(1) if title_match else f"Course on {topic}"
+
+    fields = {'title': title[:200], 'content': content, 'sources': result['sources']}
+    if job.params.get('pregenerated'):
+        # Each nightly run refreshes the stored course instead of adding a copy
+        course, _ = Course.objects.update_or_create(
+            created_by=job.user, topic=topic[:200], module=module, defaults=fields
+        )
+        xp_result = None
+    else:
+        # Both or neither: a retry must not save the course twice
+        with transaction.atomic():
+            course = Course.objects.create(topic=topic[:200], module=module, created_by=job.user, **fields)
+            xp_result = job.user.add_xp(15, 'course_generation')
+
+    return {
+        'course_id': course.id,
+        'title': course.title,
+        'url': reverse('courses:detail', args=[course.id]),
+        'xp_result': xp_result,
+    }
@@ -1,3 +1,157 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from apps.agents.agent_orchestrator import AIOrchestrator
+from apps.agents.testing import FakeChain, read_sse, temp_admission_controller, temp_response_cache
+from apps.agents.tools.circuit_breaker import CircuitOpen
+from apps.agents.utils import MarkdownSectionStream
+
+COURSE = (
+    "# Loops\n\n## Introduction\nLoops repeat code.\n\n"
+    "## Syntax\n```python\n# Not a heading\nfor i in range(3):\n    print(i)\n```\n\n"
+    "## Summary\nThat's it.\n"
+)
+
+
+class MarkdownSectionStreamTests(SimpleTestCase):
+
+    def test_splits_title_and_sections(self):
+        stream = MarkdownSectionStream()
+        events = stream.feed(COURSE) + stream.close()
+
+        self.assertEqual(stream.title, "Loops")
+        self.assertEqual(events[0], ("title", "Loops"))
+        sections = [value for event, value in events if event == "section"]
+        self.assertEqual(len(sections), 4)
+        self.assertTrue(sections[1].startswith("## Introduction"))
+        self.assertIn("# Not a heading", sections[2])
+        self.assertTrue(sections[3].startswith("## Summary"))
+
+    def test_section_is_emitted_when_the_next_one_starts(self):
+        stream = MarkdownSectionStream()
+
+        self.assertEqual(stream.feed("# T\n## One\ntext\n"), [("title", "T"), ("section", "# T")])
+        self.assertEqual(stream.feed("## Two\n"), [("section", "## One\ntext")])
+
+
+class StreamCourseTests(SimpleTestCase):
+
+    def setUp(self):
+        self.enterContext(temp_response_cache())
+        self.chain = FakeChain(tokens=[COURSE[:30], COURSE[30:]], sources=["loops.md"])
+        engine = mock.Mock()
+        engine.get_chain.return_value = self.chain
+        self.orchestrator = AIOrchestrator(engine=engine)
+
+    def test_streamed_course_is_cached_for_the_next_request(self):
+        first = list(self.orchestrator.stream_course("loops"))
+        second = list(self.orchestrator.stream_course("loops"))
+
+        self.assertEqual(len(self.chain.calls), 1)
+        self.assertEqual(first[0], ('title', "Loops"))
+        self.assertEqual(first[-1][1]['content'], COURSE)
+        self.assertEqual(first[-1][1]['sources'], ["loops.md"])
+        self.assertEqual([event for event in second if event[0] == 'section'],
+                         [event for event in first if event[0] == 'section'])
+
+    def test_chain_failure_is_sent_as_an_error(self):
+        self.chain.error = RuntimeError("model down")
+
+        events = list(self.orchestrator.stream_course("loops"))
+
+        self.assertEqual(events[-1], ('error', "model down"))
+
+
+class GenerateCourseTests(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = self.enterContext(temp_response_cache())
+        self.pedagogue = mock.Mock()
+        self.orchestrator = AIOrchestrator(engine=mock.Mock(pedagogue=self.pedagogue))
+
+    def test_open_embeddings_circuit_falls_back_to_generation_without_retrieval(self):
+        def invoke(inputs):
+            if "query" in inputs:
+                raise CircuitOpen("ollama", 30)
+            return {'text': COURSE}
+        self.pedagogue.invoke.side_effect = invoke
+
+        first = self.orchestrator.generate_course("loops")
+        second = self.orchestrator.generate_course("loops")
+
+        self.assertTrue(first['success'])
+        self.assertEqual(first['content'], COURSE)
+        self.assertEqual(first['sources'], ["Generative AI"])
+        # The course without retrieved context is not cached
+        self.assertEqual(second['content'], COURSE)
+        self.assertEqual(self.pedagogue.invoke.call_count, 4)
+
+
+class CourseGenerateStreamViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="ada", password="pw")
+
+    def setUp(self):
+        self.enterContext(temp_admission_controller())
+        self.client.force_login(self.user)
+        self.orchestrator = mock.Mock()
+        self.orchestrator.stream_course.return_value = iter([
+            ('title', "Loops"),
+            ('section', "## Introduction\nLoops repeat code."),
+            ('done', {'title': "Loops", 'content': COURSE, 'sources': [], 'session_id': None}),
+        ])
+        patcher = mock.patch("apps.courses.views.get_orchestrator", return_value=self.orchestrator)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_streams_sections_and_grants_xp_once_done(self):
+        xp_before = self.user.xp
+
+        events = read_sse(self.client.post(reverse("courses:generate_stream"), {"topic": "loops"}))
+
+        self.assertEqual([event for event, _ in events], ['title', 'section', 'done'])
+        self.assertEqual(events[-1][1]['content'], COURSE)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.xp, xp_before + 15)
+
+    def test_csrf_token_is_required(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+
+        response = client.post(reverse("courses:generate_stream"), {"topic": "loops"})
+
+        self.assertEqual(response.status_code, 403)
+        self.orchestrator.stream_course.assert_not_called()
+
+
+class CourseGeneratorViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="ada", password="pw")
+
+    def setUp(self):
+        self.enterContext(temp_admission_controller())
+
+    async def test_course_is_awaited_and_rendered(self):
+        orchestrator = mock.Mock()
+        orchestrator.agenerate_course = mock.AsyncMock(return_value={
+            'success': True, 'topic': "loops", 'content': COURSE, 'sources': ["loops.md"], 'session_id': None,
+        })
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        xp_before = self.user.xp
+
+        with mock.patch("apps.courses.views.get_orchestrator", return_value=orchestrator):
+            response = await client.post(reverse("courses:generator"), {"topic": "loops"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['course']['title'], "Loops")
+        orchestrator.agenerate_course.assert_awaited_once_with("loops")
+        await self.user.arefresh_from_db()
+        self.assertEqual(self.user.xp, xp_before + 15)
@@ -6,6 +6,9 @@ app_name = 'courses'
 
 urlpatterns = [
     path('generator/', views.course_generator, name='generator'),
+    path('generator/stream/', views.course_stream_page, name='stream'),
+    path('api/generate/stream/', views.course_generate_stream, name='generate_stream'),
+    path('api/generate/job/', views.course_generate_job, name='generate_job'),
     path('save/', views.save_course, name='save'),
     path('api/modules/', views.get_modules_api, name='modules_api'),
     path('api/sections/<str:module_id>/', views.get_sections_api, name='sections_api'),
@@ -1,10 +1,16 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_http_methods, require_POST
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from asgiref.sync import sync_to_async
 from apps.agents.agent_orchestrator import get_orchestrator
+from apps.agents.tools.streaming import format_sse
+from apps.agents.jobs import enqueue_job
+from apps.agents.prefetch import prefetch_after_course
+from apps.agents.tools.admission import admission_controlled
 from apps.rag.module_loader import module_loader
 from .models import Course
 import re
@@ -16,11 +22,17 @@ def test_template(request):
     return render(request, 'test.html')
 
 @login_required
-def course_generator(request):
-    """Main view for course generation"""
-    
+@admission_controlled(task="course", methods=("POST",))
+async def course_generator(request):
+    """
+    Main view for course generation.
+    Async: the worker keeps serving other requests while the course is generated.
+    Templates read request.user (auth context processor), so they are rendered
+    through sync_to_async.
+    """
+    user = await request.auser()
     print(f"DEBUG: course_generator called, method: {request.method}")
-    print(f"DEBUG: user authenticated: {request.user.is_authenticated}")
+    print(f"DEBUG: user authenticated: {user.is_authenticated}")
     
     if request.method == 'POST':
         topic = request.POST.get('topic')
@@ -29,10 +41,10 @@ def course_generator(request):
         if not topic:
             messages.error(request, 'Please enter a topic to generate the course.')
             context = {'modules': module_loader.get_available_modules()}
-            return render(request, 'courses/generate.html', context)
+            return await sync_to_async(render)(request, 'courses/generate.html', context)
         
         # Use AI orchestrator to generate the course
-        orchestrator = get_orchestrator(request.user)
+        orchestrator = get_orchestrator(user)
         
         # Pass module context to orchestrator
         if module and module != 'general':
@@ -40,11 +52,11 @@ def course_generator(request):
             if module_info:
                 orchestrator.current_module = module_info['name']
         
-        result = orchestrator.generate_course(topic)
+        result = await orchestrator.agenerate_course(topic)
         
         if result['success']:
             # Add XP for course generation
-            xp_result = request.user.add_xp(15, 'course_generation')
+            xp_result = await sync_to_async(user.add_xp)(15, 'course_generation')
             
             # Direct markdown processing
             content = result['content']
@@ -58,7 +70,7 @@ def course_generator(request):
                     'title': course_title,
                     'topic': topic,
                     'module': module,
-                    'module_name': next((m['name'] for m in module_loader.get_available_modules() if m['id'] == module), module),
+                    'module_name': _get_module_name(module),
                     'content': content,
                     'sources': result['sources']
                 },
@@ -66,6 +78,8 @@ def course_generator(request):
                 'is_saved_course': False,
                 'xp_result': xp_result
             }
+            # The quiz and exercise this page links to, ready before they are clicked
+            prefetch_after_course(user, topic)
         else:
             context = {
                 'error': result.get('error', 'Error during course generation'),
@@ -74,14 +88,119 @@ def course_generator(request):
                 'is_saved_course': False
             }
             
-        return render(request, 'courses/course_detail.html', context)
+        return await sync_to_async(render)(request, 'courses/course_detail.html', context)
     
     # GET request - show form
     context = {
         'modules': module_loader.get_available_modules()
     }
     print(f"DEBUG: Rendering template with context: {context}")
-    return render(request, 'courses/generate.html', context)
+    return await sync_to_async(render)(request, 'courses/generate.html', context)
+
+
+def _get_module_name(module):
+    return next((m['name'] for m in module_loader.get_available_modules() if m['id'] == module), module)
+
+
+@login_required
+def course_stream_page(request):
+    """Course page rendered empty, filled section by section by course_generate_stream"""
+    if request.method != 'POST':
+        return redirect('courses:generator')
+    
+    topic = request.POST.get('topic')
+    module = request.POST.get('module', '')
+    
+    if not topic:
+        messages.error(request, 'Please enter a topic to generate the course.')
+        return redirect('courses:generator')
+    
+    context = {
+        'course': {
+            'title': f"Course on {topic}",
+            'topic': topic,
+            'module': module,
+            'module_name': _get_module_name(module),
+            'content': '',
+            'sources': []
+        },
+        'modules': module_loader.get_available_modules(),
+        'is_saved_course': False,
+        'streaming': True
+    }
+    return render(request, 'courses/course_stream.html', context)
+
+
+@login_required
+@admission_controlled(task="course", methods=("POST",))
+def course_generate_stream(request):
+    """
+    Streaming variant of course_generator (Server-Sent Events):
+    'title' as soon as it is generated, one 'section' per "## " section, then 'done'.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    topic = request.POST.get('topic')
+    module = request.POST.get('module', '')
+    
+    if not topic:
+        return JsonResponse({'error': 'Empty topic'}, status=400)
+    
+    orchestrator = get_orchestrator(request.user)
+    
+    # Pass module context to orchestrator
+    if module and module != 'general':
+        module_info = next((m for m in module_loader.get_available_modules() if m['id'] == module), None)
+        if module_info:
+            orchestrator.current_module = module_info['name']
+    
+    def events():
+        try:
+            for event, payload in orchestrator.stream_course(topic):
+                if event == 'done':
+                    # Add XP for course generation
+                    xp_result = request.user.add_xp(15, 'course_generation')
+                    payload = {
+                        'title': payload['title'] or f"Course on {topic}",
+                        'content': payload['content'],
+                        'xp_result': xp_result
+                    }
+                elif event == 'error':
+                    payload = {'error': f"Error during course generation: {payload}"}
+                yield format_sse(event, payload)
+        except Exception as e:
+            print(f"Error streaming course: {e}")
+            yield format_sse('error', {'error': f"Error during course generation: {e}"})
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
+
+
+@require_POST
+@login_required
+@admission_controlled(task="course", concurrency=False)
+def course_generate_job(request):
+    """
+    Queues a course generation (see apps.agents.jobs) and returns its job id right away:
+    the course is saved by the worker, the browser is notified on ws/jobs/
+    or polls the status URL.
+    """
+    topic = request.POST.get('topic', '').strip()
+    if not topic:
+        return JsonResponse({'error': 'Please enter a topic to generate the course.'}, status=400)
+    
+    job = enqueue_job(request.user, 'course', {
+        'topic': topic,
+        'module': request.POST.get('module', '') or 'general',
+    })
+    return JsonResponse({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': reverse('agents:job_status', args=[job.id]),
+    }, status=202)
 
 
 @login_required
@@ -145,6 +264,7 @@ def course_detail(request, course_id):
             },
             'is_saved_course': True  # Flag pour identifier un cours sauvegardé
         }
+        prefetch_after_course(request.user, course.topic)
     except Course.DoesNotExist:
         messages.error(request, '❌ Course not found.')
         return redirect('courses:generator')
@@ -167,7 +287,7 @@ def get_sections_api(request, module_id):
     for section_key, files in sections.items():
         formatted_sections.append({
             'id': section_key,
-            'name': section_key.replace('_', ' ').replace(section_key.split('_')[0] + '_', '').title(),
+            'name': module_loader.format_section_name(section_key),
             'files_count': len(files),
             'files': files
         })
@@ -0,0 +1,51 @@
+# apps/exercises/jobs.py
+
+from django.urls import reverse
+from apps.agents.agent_orchestrator import get_orchestrator
+from .models import Exercise
+
+
+def create_generated_exercise(user, topic, difficulty, from_course):
+    """Generates an exercise with the AI and saves it, returns it or None"""
+    orchestrator = get_orchestrator(user)
+    result = orchestrator.generate_exercise(topic, difficulty, from_course=from_course)
+    
+    if not result['success']:
+        print(f"❌ Exercise generation error: {result.get('error', 'Unknown error')}")
+        return None
+    return save_generated_exercise(user, topic, difficulty, result['exercise'])
+
+
+def save_generated_exercise(user, topic, difficulty, exercise_data):
+    """Saves an exercise dict produced by the AI (see validate_exercise), returns the Exercise"""
+    exercise = Exercise.objects.create(
+        title=exercise_data['title'],
+        description=exercise_data['description'],
+        difficulty=difficulty,
+        topic=topic,
+        starter_code=exercise_data['starter_code'],
+        solution=exercise_data['solution'],
+        tests=exercise_data['tests'],
+        created_by=user
+    )
+    print(f"✅ Exercise created successfully: {exercise.title} (ID: {exercise.id})")
+    return exercise
+
+
+def run_exercise_job(job):
+    """Background exercise generation (job params: topic, difficulty, from_course)"""
+    topic = job.params['topic']
+    exercise = create_generated_exercise(
+        job.user,
+        topic,
+        job.params.get('difficulty', 'beginner'),
+        from_course=job.params.get('from_course', False)
+    )
+    if exercise is None:
+        # Raising makes the job retry: another generation may well be valid
+        raise RuntimeError(f'The AI could not generate a valid exercise on "{topic}"')
+    return {
+        'exercise_id': exercise.id,
+        'title': exercise.title,
+        'url': reverse('exercises:detail', args=[exercise.id]),
+    }
@@ -0,0 +1,141 @@
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from apps.agents import agent_coach
+from apps.agents.testing import temp_admission_controller
+from apps.agents.tools.json_extract import JsonObjectExtractor, extract_json_object, loads_tolerant
+from apps.exercises.models import Exercise
+
+EXERCISE = {
+    "title": "Sum a list",
+    "description": "Write total(numbers) returning the sum.",
+    "starter_code": "def total(numbers):\n    # TODO\n    pass",
+    "solution": "def total(numbers):\n    return sum(numbers)",
+    "tests": [{"input": "total([1, 2])", "expected": 3}],
+}
+
+
+class JsonExtractTests(SimpleTestCase):
+
+    def test_extracts_the_object_around_prose_and_fences(self):
+        text = 'Here is the exercise:\n```json\n{"title": "Loops", "tests": [{"input": "f(1)"}]}\n```\nGood luck!'
+
+        data, exact = extract_json_object(text)
+
+        self.assertTrue(exact)
+        self.assertEqual(data, {"title": "Loops", "tests": [{"input": "f(1)"}]})
+
+    def test_braces_and_quotes_inside_strings(self):
+        data, exact = extract_json_object('{"code": "d = {\\"a\\": [1]}", "note": "} ]"} trailing')
+
+        self.assertTrue(exact)
+        self.assertEqual(data, {"code": 'd = {"a": [1]}', "note": "} ]"})
+
+    def test_completes_a_truncated_object(self):
+        data, exact = extract_json_object('{"title": "Loops", "tests": [{"input": "f(1)", "expected": "2"}, {"inp')
+
+        self.assertFalse(exact)
+        self.assertEqual(data["title"], "Loops")
+        self.assertEqual(data["tests"][0], {"input": "f(1)", "expected": "2"})
+
+    def test_truncated_inside_a_string_value(self):
+        data, exact = extract_json_object('{"title": "Loo')
+
+        self.assertFalse(exact)
+        self.assertEqual(data, {"title": "Loo"})
+
+    def test_tolerates_raw_newlines_and_trailing_commas(self):
+        self.assertEqual(loads_tolerant('{"code": "a = 1\nb = 2", "tests": [1, 2,],}'),
+                         {"code": "a = 1\nb = 2", "tests": [1, 2]})
+
+    def test_no_object_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            extract_json_object("Sorry, I can't help with that.")
+
+    def test_extractor_returns_the_object_once_complete(self):
+        extractor = JsonObjectExtractor()
+
+        self.assertIsNone(extractor.feed('Sure: {"a": {"b": '))
+        self.assertEqual(extractor.feed('1}} and more'), '{"a": {"b": 1}}')
+        self.assertEqual(extractor.close(), '{"a": {"b": 1}}')
+
+
+class ExerciseGenerationTests(SimpleTestCase):
+
+    def setUp(self):
+        self.invoke = self.enterContext(mock.patch.object(agent_coach, "_invoke_json"))
+        self.stats_before = agent_coach.get_exercise_generation_stats()
+
+    def _generate(self, *outputs):
+        self.invoke.side_effect = list(outputs)
+        return agent_coach.run_exercise_generation("{topic}", {"topic": "lists"})
+
+    def _counted(self, path):
+        return agent_coach.get_exercise_generation_stats()[path] - self.stats_before[path]
+
+    def test_valid_json_is_used_as_is_and_tests_are_normalized(self):
+        exercise = self._generate(json.dumps(EXERCISE))
+
+        self.assertEqual(exercise["tests"], [{"input": "total([1, 2])", "expected": "3"}])
+        self.assertEqual(self.invoke.call_count, 1)
+        self.assertEqual(self._counted('direct'), 1)
+
+    def test_object_in_prose_is_extracted(self):
+        exercise = self._generate(f"Here you go:\n```json\n{json.dumps(EXERCISE)}\n```")
+
+        self.assertEqual(exercise["title"], "Sum a list")
+        self.assertEqual(self._counted('extracted'), 1)
+
+    def test_invalid_output_gets_one_targeted_repair(self):
+        incomplete = dict(EXERCISE, tests=[])
+
+        exercise = self._generate(json.dumps(incomplete), json.dumps(EXERCISE))
+
+        self.assertEqual(exercise["title"], "Sum a list")
+        repair_inputs = self.invoke.call_args_list[1].args[1]
+        self.assertEqual(repair_inputs["problem"], "missing or empty fields: tests")
+        self.assertEqual(repair_inputs["previous"], json.dumps(incomplete))
+        self.assertEqual(self._counted('repaired'), 1)
+
+    def test_unusable_after_repair_returns_none(self):
+        self.assertIsNone(self._generate("no json", "still no json"))
+        self.assertEqual(self.invoke.call_count, 2)
+        self.assertEqual(self._counted('failed'), 1)
+
+    def test_model_error_returns_none_without_repair(self):
+        self.assertIsNone(self._generate(ConnectionError("provider down")))
+        self.assertEqual(self._counted('errors'), 1)
+
+
+class ExerciseFromCourseViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="ada", email="ada@example.com", password="pw")
+
+    def setUp(self):
+        self.enterContext(temp_admission_controller())
+        self.client.force_login(self.user)
+        self.create = self.enterContext(mock.patch("apps.exercises.views.create_generated_exercise"))
+
+    def test_prefetched_exercise_is_saved_without_generation(self):
+        with mock.patch("apps.exercises.views.take_prefetched_exercise", return_value=EXERCISE) as take:
+            response = self.client.get(reverse("exercises:generate_from_course"), {"topic": "lists"})
+
+        take.assert_called_once_with(self.user, "lists", "intermediate")
+        self.create.assert_not_called()
+        exercise = Exercise.objects.get(created_by=self.user)
+        self.assertEqual(exercise.title, "Sum a list")
+        self.assertRedirects(response, reverse("exercises:detail", args=[exercise.id]), fetch_redirect_response=False)
+
+    def test_without_one_the_exercise_is_generated(self):
+        self.create.return_value = None
+        with mock.patch("apps.exercises.views.take_prefetched_exercise", return_value=None):
+            self.client.get(reverse("exercises:generate_from_course"), {"topic": "lists"})
+
+        self.create.assert_called_once_with(self.user, "lists", "intermediate", from_course=True)
+
@@ -8,6 +8,7 @@ urlpatterns = [
     path('<int:exercise_id>/', views.exercise_detail, name='detail'),
     path('<int:exercise_id>/submit/', views.submit_code, name='submit'),
     path('generate/', views.generate_exercise, name='generate'),
+    path('generate/job/', views.generate_exercise_job, name='generate_job'),
     path('generate-from-course/', views.generate_exercise_from_course, name='generate_from_course'),
     path('<int:exercise_id>/delete/', views.delete_exercise, name='delete'),
     path('progress/', views.user_progress, name='progress'),
@@ -5,10 +5,14 @@ from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db.models import Q, Count, Avg
-from apps.agents.agent_orchestrator import get_orchestrator
 from django.views.decorators.http import require_POST
 from .models import Exercise, ExerciseSubmission, UserExerciseProgress
 from .security import secure_executor
+from .jobs import create_generated_exercise, save_generated_exercise
+from apps.agents.jobs import enqueue_job
+from apps.agents.prefetch import take_prefetched_exercise
+from apps.agents.tools.admission import admission_controlled
+from django.urls import reverse
 import json
 import time
 
@@ -209,6 +213,7 @@ def submit_code(request, exercise_id):
         return JsonResponse({'error': f'Server error: {str(e)}'}, status=500)
 
 @login_required
+@admission_controlled(task="exercise", methods=("POST",))
 def generate_exercise(request):
     """Generate a new exercise with AI"""
     
@@ -220,269 +225,43 @@ def generate_exercise(request):
             messages.error(request, 'Please specify a topic for the exercise.')
             return redirect('exercises:list')
         
-        try:
-            # Use AI orchestrator to generate exercise
-            orchestrator = get_orchestrator(request.user)
-            
-            # Create specialized prompt for exercises
-            prompt = f"""
-            Generate a Python programming exercise on the topic "{topic}" at {difficulty} level.
-            
-            MANDATORY STEPS:
-            1. Define ONE clear main function (e.g.: calculate_average, decorator_timer, etc.)
-            2. Write the complete working solution
-            3. Create starter_code with # TODO to complete
-            4. Generate tests that call EXACTLY this function with the right parameters
-            5. Verify that expected results match your solution's behavior
-            
-            CRITICAL RULES:
-            - Tests must call the SAME function as defined in the solution
-            - "expected" values must be the REAL result of your function
-            - Test varied cases: normal, edge, error
-            - ALWAYS use f-strings (f"") for string formatting, never concatenation
-            - Example: f"Result: {{value}}" instead of "Result: " + str(value)
-            
-            CONSISTENCY EXAMPLE:
-            If your solution defines "def calculate_average(list):", 
-            then your tests should be "calculate_average([1,2,3])" with expected "2.0"
-            
-            STRICT JSON Format:
-            {{
-                "title": "Exercise title",
-                "description": "Detailed description",
-                "starter_code": "Starting code with # TODO",
-                "solution": "Complete solution code",
-                "tests": [
-                    {{"input": "my_function(2, 3)", "expected": "5"}},
-                    {{"input": "my_function(-1, 1)", "expected": "0"}},
-                    {{"input": "my_function(0, 0)", "expected": "0"}}
-                ]
-            }}
-            
-            FINAL VERIFICATION: Make sure that if I execute your solution then your tests, 
-            the results exactly match the "expected" values.
-            IMPORTANT: Use f-strings in all generated Python code!
-            """
-            
-            result = orchestrator.answer_question(prompt)
-            
-            if result['success']:
-                try:
-                    # Parse JSON response with robust cleaning
-                    answer = result['answer'].strip()
-                    print(f"🔍 Raw response received: {answer[:500]}...")
-                    
-                    # Clean response from markdown code blocks
-                    if '```json' in answer:
-                        # Extract content between ```json and ```
-                        start_marker = answer.find('```json') + 7
-                        end_marker = answer.find('```', start_marker)
-                        if end_marker != -1:
-                            json_content = answer[start_marker:end_marker].strip()
-                        else:
-                            json_content = answer[start_marker:].strip()
-                    else:
-                        # Extract JSON if there's text before/after
-                        start_idx = answer.find('{')
-                        end_idx = answer.rfind('}') + 1
-                        if start_idx != -1 and end_idx != -1:
-                            json_content = answer[start_idx:end_idx]
-                        else:
-                            raise json.JSONDecodeError("No JSON found", answer, 0)
-                    
-                    print(f"🧹 Extracted JSON: {json_content[:300]}...")
-                    
-                    # Clean Python triple quotes in JSON
-                    json_content = json_content.replace('"""', '"')
-                    json_content = json_content.replace("'''", '"')
-                    
-                    # Clean line breaks and control characters in JSON strings
-                    import re
-                    
-                    # Function to clean a JSON string
-                    def clean_json_string(match):
-                        key = match.group(1)
-                        value = match.group(2)
-                        # Replace line breaks with \n and escape quotes
-                        cleaned_value = value.replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t').replace('"', '\\"')
-                        return f'"{key}": "{cleaned_value}"'
-                    
-                    # Apply cleaning to multiline JSON strings
-                    json_content = re.sub(r'"([^"]+)":\s*"([^"]*(?:\n[^"]*)*)"', clean_json_string, json_content, flags=re.MULTILINE | re.DOTALL)
-                    # Function to clean a JSON string
-                    def clean_json_string(match):
-                        key = match.group(1)
-                        value = match.group(2)
-                        # Replace line breaks with \n and escape quotes
-                        cleaned_value = value.replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t').replace('"', '\\"')
-                        return f'"{key}": "{cleaned_value}"'
-                    
-                    # Apply cleaning to multiline JSON strings
-                    json_content = re.sub(r'"([^"]+)":\s*"([^"]*(?:\n[^"]*)*)"', clean_json_string, json_content, flags=re.MULTILINE | re.DOTALL)
-                    
-                    print(f"🔧 Cleaned JSON: {json_content[:300]}...")
-                    
-                    # Parse cleaned JSON
-                    exercise_data = json.loads(json_content)
-                    
-                    # Check that all required keys are present
-                    required_keys = ['title', 'description', 'starter_code', 'solution', 'tests']
-                    for key in required_keys:
-                        if key not in exercise_data:
-                            raise KeyError(f"Missing key: {key}")
-                    
-                    # Clean starter_code and solution from triple quotes
-                    if isinstance(exercise_data.get('starter_code'), str):
-                        # Clean and format starting code
-                        starter_code = exercise_data['starter_code']
-                        starter_code = starter_code.replace('"""', '').replace("'''", '').strip()
-                        # Replace \n with real line breaks
-                        starter_code = starter_code.replace('\\n', '\n').replace('\\t', '\t')
-                        exercise_data['starter_code'] = starter_code
-                    
-                    if isinstance(exercise_data.get('solution'), str):
-                        # Clean and format solution
-                        solution = exercise_data['solution']
-                        solution = solution.replace('"""', '').replace("'''", '').strip()
-                        # Replace \n with real line breaks
-                        solution = solution.replace('\\n', '\n').replace('\\t', '\t')
-                        exercise_data['solution'] = solution
-                    
-                    print(f"✅ Exercise parsed: {exercise_data['title']}")
-                    
-                    # Create exercise
-                    exercise = Exercise.objects.create(
-                        title=exercise_data['title'],
-                        description=exercise_data['description'],
-                        difficulty=difficulty,
-                        topic=topic,
-                        starter_code=exercise_data['starter_code'],
-                        solution=exercise_data['solution'],
-                        tests=exercise_data['tests'],
-                        created_by=request.user
-                    )
-                    
-                    print(f"✅ Exercise created successfully: {exercise.title} (ID: {exercise.id})")
-                    messages.success(request, f'Exercise "{exercise.title}" generated successfully!')
-                    return redirect('exercises:detail', exercise_id=exercise.id)
-                    
-                except (json.JSONDecodeError, KeyError, ValueError) as e:
-                    print(f"❌ JSON parsing error: {e}")
-                    print(f"Response received: {result['answer'][:500]}...")
-                    
-                    # Try more aggressive parsing
-                    try:
-                        # Alternative method: manually extract values
-                        answer = result['answer']
-                        
-                        # Extract title
-                        title_match = re.search(r'"title":\s*"([^"]*(?:\\.[^"]*)*)"', answer)
-                        title = title_match.group(1) if title_match else f"Exercise on {topic}"
-                        
-                        # Extract description
-                        desc_match = re.search(r'"description":\s*"([^"]*(?:\\.[^"]*)*)"', answer)
-                        description = desc_match.group(1) if desc_match else f"Practical exercise on {topic}"
-                        
-                        # Extract starter_code (between quotes or in a block)
-                        starter_match = re.search(r'"starter_code":\s*"([^"]*(?:\\.[^"]*)*)"', answer, re.DOTALL)
-                        if not starter_match:
-                            # Look in a code block
-                            starter_match = re.search(r'"starter_code":\s*```python\n(.*?)```', answer, re.DOTALL)
-                        
-                        starter_code = starter_match.group(1) if starter_match else f"# TODO: Implement your solution for {topic}\n\ndef my_function():\n    # Your code here\n    pass"
-                        
-                        # Extract solution
-                        solution_match = re.search(r'"solution":\s*"([^"]*(?:\\.[^"]*)*)"', answer, re.DOTALL)
-                        if not solution_match:
-                            solution_match = re.search(r'"solution":\s*```python\n(.*?)```', answer, re.DOTALL)
-                        
-                        solution = solution_match.group(1) if solution_match else f"# Example solution for {topic}\n\ndef my_function():\n    return 'Hello World'"
-                        
-                        # Clean escapes
-                        starter_code = starter_code.replace('\\n', '\n').replace('\\t', '\t').replace('\\"', '"')
-                        solution = solution.replace('\\n', '\n').replace('\\t', '\t').replace('\\"', '"')
-                        
-                        # Default tests if not found
-                        tests = [
-                            {"input": "my_function()", "expected": "Hello World"}
-                        ]
-                        
-                        # Try to extract tests
-                        tests_match = re.search(r'"tests":\s*\[(.*?)\]', answer, re.DOTALL)
-                        if tests_match:
-                            try:
-                                tests_str = '[' + tests_match.group(1) + ']'
-                                tests = json.loads(tests_str)
-                            except:
-                                pass  # Keep default tests
-                        
-                        print(f"✅ Manual parsing successful: {title}")
-                        
-                        # Create exercise with extracted data
-                        exercise = Exercise.objects.create(
-                            title=title,
-                            description=description,
-                            difficulty=difficulty,
-                            topic=topic,
-                            starter_code=starter_code,
-                            solution=solution,
-                            tests=tests,
-                            created_by=request.user
-                        )
-                        
-                        print(f"✅ Exercise created with manual parsing: {exercise.title} (ID: {exercise.id})")
-                        messages.success(request, f'Exercise "{exercise.title}" generated successfully!')
-                        return redirect('exercises:detail', exercise_id=exercise.id)
-                        
-                    except Exception as manual_error:
-                        print(f"❌ Manual parsing failed: {manual_error}")
-                    
-                    # Create basic fallback exercise
-                    fallback_exercise = Exercise.objects.create(
-                        title=f"Exercise on {topic}",
-                        description=f"Practical exercise on {topic}. Complete the code below.",
-                        difficulty=difficulty,
-                        topic=topic,
-                        starter_code=f"# TODO: Implement your solution for {topic}\n\ndef my_function():\n    # Your code here\n    pass\n",
-                        solution=f"# Example solution for {topic}\n\ndef my_function():\n    return 'Hello World'\n",
-                        tests=[
-                            {"input": "my_function()", "expected": "Hello World"}
-                        ],
-                        created_by=request.user
-                    )
-                    
-                    messages.warning(request, f'AI generated a malformed response. Basic exercise created on "{topic}".')
-                    return redirect('exercises:detail', exercise_id=fallback_exercise.id)
-            else:
-                print(f"❌ Orchestrator error: {result.get('error', 'Unknown error')}")
-                messages.error(request, f'Generation error: {result.get("error", "Unknown error")}')
-                
-        except Exception as e:
-            print(f"❌ Exception during generation: {str(e)}")
-            
-            # Create fallback exercise in case of total error
-            try:
-                fallback_exercise = Exercise.objects.create(
-                    title=f"Exercise on {topic}",
-                    description=f"Practical exercise on {topic}. Complete the code below.",
-                    difficulty=difficulty,
-                    topic=topic,
-                    starter_code=f"# TODO: Implement your solution for {topic}\n\ndef my_function():\n    # Your code here\n    pass\n",
-                    solution=f"# Example solution for {topic}\n\ndef my_function():\n    return 'Hello World'\n",
-                    tests=[
-                        {"input": "my_function()", "expected": "Hello World"}
-                    ],
-                    created_by=request.user
-                )
-                
-                messages.warning(request, f'AI generation error. Basic exercise created on "{topic}".')
-                return redirect('exercises:detail', exercise_id=fallback_exercise.id)
-            except Exception as fallback_error:
-                messages.error(request, f'Generation error: {str(e)}')
+        exercise = create_generated_exercise(request.user, topic, difficulty, from_course=False)
+        if exercise:
+            messages.success(request, f'Exercise "{exercise.title}" generated successfully!')
+            return redirect('exercises:detail', exercise_id=exercise.id)
+        
+        messages.error(request, f'The AI could not generate a valid exercise on "{topic}". Please try again.')
     
     return redirect('exercises:list')
 
+@require_POST
+@login_required
+@admission_controlled(task="exercise", concurrency=False)
+def generate_exercise_job(request):
+    """
+    Queues an exercise generation (see apps.agents.jobs) and returns its job id right away:
+    the browser is notified on ws/jobs/ when it is done, or polls the status URL.
+    """
+    topic = request.POST.get('topic', '').strip()
+    difficulty = request.POST.get('difficulty', 'beginner')
+    if not topic:
+        return JsonResponse({'error': 'Please specify a topic for the exercise.'}, status=400)
+    if difficulty not in dict(Exercise.DIFFICULTY_CHOICES):
+        difficulty = 'beginner'
+    
+    job = enqueue_job(request.user, 'exercise', {
+        'topic': topic,
+        'difficulty': difficulty,
+        'from_course': request.POST.get('from_course') == '1',
+    })
+    return JsonResponse({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': reverse('agents:job_status', args=[job.id]),
+    }, status=202)
+
 @login_required
+@admission_controlled(task="exercise")
 def generate_exercise_from_course(request):
     """Generate an exercise based on a course topic"""
     
@@ -493,243 +272,17 @@ def generate_exercise_from_course(request):
         messages.error(request, 'No topic specified to generate the exercise.')
         return redirect('exercises:list')
     
-    try:
-        # Use AI orchestrator to generate exercise
-        orchestrator = get_orchestrator(request.user)
-        
-        # Specialized prompt for course-based exercises
-        prompt = f"""
-        Generate a practical Python programming exercise based on the course: "{topic}" (level {difficulty})
-        
-        MANDATORY STEPS:
-        1. Define ONE clear main function related to the course topic
-        2. Write the complete solution that actually works
-        3. Create starter_code with # TODO to complete
-        4. Generate tests that call EXACTLY this function
-        5. Verify that expected results are correct
-        
-        CRITICAL RULES:
-        - Tests must call the SAME function as defined in the solution
-        - "expected" values must be the REAL result of your function
-        - Test varied cases: normal, edge, error
-        - Exercise should allow practicing concepts from course "{topic}"
-        
-        CONSISTENCY EXAMPLE for decorators:
-        If your solution defines "def my_decorator(func):" and a function "calculate(a,b)",
-        then your tests should be "calculate(2, 3)" with the correct expected result.
-        
-        STRICT JSON Format:
-        {{
-            "title": "Practical exercise title",
-            "description": "Detailed exercise description",
-            "starter_code": "Starting code with # TODO",
-            "solution": "Complete solution code",
-            "tests": [
-                {{"input": "my_function(2, 3)", "expected": "5"}},
-                {{"input": "my_function(-1, 1)", "expected": "0"}},
-                {{"input": "my_function(0, 0)", "expected": "0"}}
-            ]
-        }}
-        
-        FINAL VERIFICATION: Make sure that if I execute your solution then your tests, 
-        the results exactly match the "expected" values.
-        """
-        
-        result = orchestrator.answer_question(prompt)
-        
-        if result['success']:
-            try:
-                # Parse JSON response with robust cleaning
-                answer = result['answer'].strip()
-                print(f"🔍 Raw response received: {answer[:500]}...")
-                
-                # Clean response from markdown code blocks
-                if '```json' in answer:
-                    start_marker = answer.find('```json') + 7
-                    end_marker = answer.find('```', start_marker)
-                    if end_marker != -1:
-                        json_content = answer[start_marker:end_marker].strip()
-                    else:
-                        json_content = answer[start_marker:].strip()
-                else:
-                    # Extract JSON if there's text before/after
-                    start_idx = answer.find('{')
-                    end_idx = answer.rfind('}') + 1
-                    if start_idx != -1 and end_idx != -1:
-                        json_content = answer[start_idx:end_idx]
-                    else:
-                        raise json.JSONDecodeError("No JSON found", answer, 0)
-                
-                print(f"🧹 Extracted JSON: {json_content[:300]}...")
-                
-                # Clean Python triple quotes in JSON
-                json_content = json_content.replace('"""', '"')
-                json_content = json_content.replace("'''", '"')
-                
-                # Clean line breaks in strings
-                import re
-                json_content = re.sub(r':\s*"([^"]*)\n([^"]*)"', r': "\1\\n\2"', json_content, flags=re.MULTILINE)
-                
-                print(f"🔧 Cleaned JSON: {json_content[:300]}...")
-                
-                # Parse cleaned JSON
-                exercise_data = json.loads(json_content)
-                
-                # Check that all required keys are present
-                required_keys = ['title', 'description', 'starter_code', 'solution', 'tests']
-                for key in required_keys:
-                    if key not in exercise_data:
-                        raise KeyError(f"Missing key: {key}")
-                
-                # Clean starter_code and solution from triple quotes
-                if isinstance(exercise_data.get('starter_code'), str):
-                    # Clean and format starting code
-                    starter_code = exercise_data['starter_code']
-                    starter_code = starter_code.replace('"""', '').replace("'''", '').strip()
-                    # Replace \n with real line breaks
-                    starter_code = starter_code.replace('\\n', '\n').replace('\\t', '\t')
-                    exercise_data['starter_code'] = starter_code
-                
-                if isinstance(exercise_data.get('solution'), str):
-                    # Clean and format solution
-                    solution = exercise_data['solution']
-                    solution = solution.replace('"""', '').replace("'''", '').strip()
-                    # Replace \n with real line breaks
-                    solution = solution.replace('\\n', '\n').replace('\\t', '\t')
-                    exercise_data['solution'] = solution
-                
-                print(f"✅ Exercise parsed: {exercise_data['title']}")
-                
-                # Create exercise
-                exercise = Exercise.objects.create(
-                    title=exercise_data['title'],
-                    description=exercise_data['description'],
-                    difficulty=difficulty,
-                    topic=topic,
-                    starter_code=exercise_data['starter_code'],
-                    solution=exercise_data['solution'],
-                    tests=exercise_data['tests'],
-                    created_by=request.user
-                )
-                
-                print(f"✅ Exercise created successfully: {exercise.title} (ID: {exercise.id})")
-                messages.success(request, f'Exercise "{exercise.title}" generated successfully from course!')
-                return redirect('exercises:detail', exercise_id=exercise.id)
-                
-            except (json.JSONDecodeError, KeyError, ValueError) as e:
-                print(f"❌ JSON parsing error: {e}")
-                print(f"Response received: {result['answer'][:500]}...")
-                
-                # Try more aggressive parsing
-                try:
-                    # Alternative method: manually extract values
-                    answer = result['answer']
-                    
-                    # Extract title
-                    title_match = re.search(r'"title":\s*"([^"]*(?:\\.[^"]*)*)"', answer)
-                    title = title_match.group(1) if title_match else f"Practical exercise: {topic}"
-                    
-                    # Extract description
-                    desc_match = re.search(r'"description":\s*"([^"]*(?:\\.[^"]*)*)"', answer)
-                    description = desc_match.group(1) if desc_match else f"Practical exercise based on the course '{topic}'. Complete the code below to practice the learned concepts."
-                    
-                    # Extract starter_code (between quotes or in a block)
-                    starter_match = re.search(r'"starter_code":\s*"([^"]*(?:\\.[^"]*)*)"', answer, re.DOTALL)
-                    if not starter_match:
-                        # Look in a code block
-                        starter_match = re.search(r'"starter_code":\s*```python\n(.*?)```', answer, re.DOTALL)
-                    
-                    starter_code = starter_match.group(1) if starter_match else f"# Exercise based on course: {topic}\n# TODO: Implement your solution\n\ndef my_function():\n    # Your code here\n    pass"
-                    
-                    # Extract solution
-                    solution_match = re.search(r'"solution":\s*"([^"]*(?:\\.[^"]*)*)"', answer, re.DOTALL)
-                    if not solution_match:
-                        solution_match = re.search(r'"solution":\s*```python\n(.*?)```', answer, re.DOTALL)
-                    
-                    solution = solution_match.group(1) if solution_match else f"# Example solution for {topic}\n\ndef my_function():\n    return 'Hello World'"
-                    
-                    # Clean escapes
-                    starter_code = starter_code.replace('\\n', '\n').replace('\\t', '\t').replace('\\"', '"')
-                    solution = solution.replace('\\n', '\n').replace('\\t', '\t').replace('\\"', '"')
-                    
-                    # Default tests if not found
-                    tests = [
-                        {"input": "my_function()", "expected": "Hello World"}
-                    ]
-                    
-                    # Try to extract tests
-                    tests_match = re.search(r'"tests":\s*\[(.*?)\]', answer, re.DOTALL)
-                    if tests_match:
-                        try:
-                            tests_str = '[' + tests_match.group(1) + ']'
-                            tests = json.loads(tests_str)
-                        except:
-                            pass  # Keep default tests
-                    
-                    print(f"✅ Manual parsing successful: {title}")
-                    
-                    # Create exercise with extracted data
-                    exercise = Exercise.objects.create(
-                        title=title,
-                        description=description,
-                        difficulty=difficulty,
-                        topic=topic,
-                        starter_code=starter_code,
-                        solution=solution,
-                        tests=tests,
-                        created_by=request.user
-                    )
-                    
-                    print(f"✅ Exercise created with manual parsing: {exercise.title} (ID: {exercise.id})")
-                    messages.success(request, f'Exercise "{exercise.title}" generated successfully from course!')
-                    return redirect('exercises:detail', exercise_id=exercise.id)
-                    
-                except Exception as manual_error:
-                    print(f"❌ Manual parsing failed: {manual_error}")
-                
-                # Create basic fallback exercise
-                fallback_exercise = Exercise.objects.create(
-                    title=f"Practical exercise: {topic}",
-                    description=f"Practical exercise based on the course '{topic}'. Complete the code below to practice the learned concepts.",
-                    difficulty=difficulty,
-                    topic=topic,
-                    starter_code=f"# Exercise based on course: {topic}\n# TODO: Implement your solution\n\ndef my_function():\n    # Your code here\n    pass\n",
-                    solution=f"# Example solution for {topic}\n\ndef my_function():\n    return 'Hello World'\n",
-                    tests=[
-                        {"input": "my_function()", "expected": "Hello World"}
-                    ],
-                    created_by=request.user
-                )
-                
-                messages.warning(request, f'AI generated a malformed response. Basic exercise created on "{topic}".')
-                return redirect('exercises:detail', exercise_id=fallback_exercise.id)
-        else:
-            print(f"❌ Orchestrator error: {result.get('error', 'Unknown error')}")
-            messages.error(request, f'Generation error: {result.get("error", "Unknown error")}')
-            
-    except Exception as e:
-        print(f"❌ Exception during generation: {str(e)}")
-        
-        # Create fallback exercise in case of total error
-        try:
-            fallback_exercise = Exercise.objects.create(
-                title=f"Practical exercise: {topic}",
-                description=f"Practical exercise based on the course '{topic}'. Complete the code below.",
-                difficulty=difficulty,
-                topic=topic,
-                starter_code=f"# TODO: Implement your solution for {topic}\n\ndef my_function():\n    # Your code here\n    pass\n",
-                solution=f"# Example solution for {topic}\n\ndef my_function():\n    return 'Hello World'\n",
-                tests=[
-                    {"input": "my_function()", "expected": "Hello World"}
-                ],
-                created_by=request.user
-            )
-            
-            messages.warning(request, f'AI generation error. Basic exercise created on "{topic}".')
-            return redirect('exercises:detail', exercise_id=fallback_exercise.id)
-        except Exception as fallback_error:
-            messages.error(request, f'Generation error: {str(e)}')
+    # Generated in the background while the course was being read, when prefetching is on
+    prefetched = take_prefetched_exercise(request.user, topic, difficulty)
+    if prefetched:
+        exercise = save_generated_exercise(request.user, topic, difficulty, prefetched)
+    else:
+        exercise = create_generated_exercise(request.user, topic, difficulty, from_course=True)
+    if exercise:
+        messages.success(request, f'Exercise "{exercise.title}" generated successfully from course!')
+        return redirect('exercises:detail', exercise_id=exercise.id)
     
+    messages.error(request, f'The AI could not generate a valid exercise on "{topic}". Please try again.')
     return redirect('exercises:list')
 
 @login_required
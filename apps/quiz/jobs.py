@@ -0,0 +1,24 @@
+# apps/quiz/jobs.py
+
+from apps.agents.agent_coach import generate_quiz_questions
+from .models import QuizBank
+
+
+def run_quiz_job(job):
+    """
+    Quiz question bank generation (job params: topic, num_questions, language, section).
+    The questions replace the topic's QuizBank, from which quizzes of up to
+    num_questions questions are then drawn (see AIOrchestrator._banked_questions).
+    """
+    topic = job.params['topic']
+    num_questions = job.params.get('num_questions', 20)
+    language = job.params.get('language', 'fr')
+    quiz = generate_quiz_questions(topic, num_questions, language)
+    if not quiz:
+        raise RuntimeError(f'The AI could not generate a quiz on "{topic}"')
+    bank, _ = QuizBank.objects.update_or_create(
+        topic=topic,
+        language=language,
+        defaults={'questions': quiz['questions'], 'section': job.params.get('section', '')},
+    )
+    return {'topic': topic, 'language': language, 'bank_id': bank.id, 'questions': len(quiz['questions'])}
@@ -120,3 +120,33 @@ class GameAnswer(models.Model):
     
     def __str__(self):
         return f"{self.participant.user.username} - Q{self.question.question_number}"
+
+class QuizBank(models.Model):
+    """
+    Pre-generated questions on a topic, in one language (see the pregenerate_content
+    command). Solo and multiplayer quizzes on the topic are drawn from it instead
+    of being generated, as long as it holds enough questions.
+    """
+    
+    topic = models.CharField(max_length=200)
+    language = models.CharField(max_length=10, default='fr')
+    section = models.CharField(max_length=200, blank=True)  # Catalog section, "module/section"
+    questions = models.JSONField(default=list)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['topic', 'language']
+        ordering = ['topic', 'language']
+    
+    def __str__(self):
+        return f"{self.topic} ({self.language}, {len(self.questions)} questions)"
+    
+    @classmethod
+    def draw(cls, topic, language, num_questions):
+        """`num_questions` questions picked at random from the topic's bank, or None if it has fewer"""
+        bank = cls.objects.filter(topic=topic, language=language).first()
+        if bank is None or len(bank.questions) < num_questions:
+            return None
+        return random.sample(bank.questions, num_questions)
@@ -1,3 +1,341 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from apps.agents import agent_coach
+from apps.agents.agent_orchestrator import AIOrchestrator
+from apps.agents.agent_coach import _split_batches, dedupe_questions
+from apps.agents.testing import (
+    FakeChain, aread_sse, question, quiz_text, temp_admission_controller, temp_response_cache,
+)
+from apps.agents.utils import QuizStreamParser, parse_text_quiz
+from apps.quiz.jobs import run_quiz_job
+from apps.quiz.models import QuizBank
+
+QUIZ_TEXT = """Here is your quiz:
+
+Q1. What is the output of the following code?
+```python
+print(2 * 3)
+```
+A. 5
+B. 6
+C. 23
+D. Error
+Answer: B
+Explanation: 2 * 3 is 6.
+
+Q2. Which keyword defines a function?
+A. func
+B. def
+C. lambda
+D. fn
+Réponse: b
+Explication: def définit une fonction.
+"""
+
+
+class QuizStreamParserTests(SimpleTestCase):
+
+    def test_parses_questions_with_code_and_both_languages(self):
+        questions = parse_text_quiz(QUIZ_TEXT)["questions"]
+
+        self.assertEqual(len(questions), 2)
+        self.assertIn("print(2 * 3)", questions[0]["question"])
+        self.assertEqual(questions[0]["options"], ["5", "6", "23", "Error"])
+        self.assertEqual(questions[0]["correct_answer"], 1)
+        self.assertEqual(questions[0]["explanation"], "2 * 3 is 6.")
+        self.assertEqual(questions[1]["correct_answer"], 1)
+        self.assertEqual(questions[1]["explanation"], "def définit une fonction.")
+
+    def test_emits_a_question_once_its_explanation_line_ends(self):
+        parser = QuizStreamParser()
+        end = QUIZ_TEXT.index("Explanation: 2 * 3 is 6.") + len("Explanation: 2 * 3 is 6.")
+
+        self.assertEqual(parser.feed(QUIZ_TEXT[:end]), [])
+        emitted = parser.feed(QUIZ_TEXT[end:end + 1])
+        self.assertEqual(len(emitted), 1)
+        self.assertEqual(emitted[0]["correct_answer"], 1)
+
+    def test_chunk_boundaries_do_not_change_the_result(self):
+        expected = parse_text_quiz(QUIZ_TEXT)["questions"]
+        for size in (1, 7, 64):
+            with self.subTest(chunk_size=size):
+                parser = QuizStreamParser()
+                questions = []
+                for start in range(0, len(QUIZ_TEXT), size):
+                    questions.extend(parser.feed(QUIZ_TEXT[start:start + size]))
+                questions.extend(parser.close())
+                self.assertEqual(questions, expected)
+
+    def test_drops_malformed_blocks(self):
+        text = (
+            "Q1. No options here\nAnswer: A\nExplanation: nothing to choose from.\n"
+            "Q2. No answer\nA. yes\nB. no\nExplanation: the answer line is missing.\n"
+            "Q3. Valid?\nA. yes\nB. no\nAnswer: A\nExplanation: it is.\n"
+        )
+        questions = parse_text_quiz(text)["questions"]
+
+        self.assertEqual([q["question"].strip() for q in questions], ["Valid?"])
+
+    def test_question_without_explanation_is_emitted_at_the_next_one_or_at_close(self):
+        parser = QuizStreamParser()
+
+        self.assertEqual(parser.feed("Q1. First\nA. x\nB. y\nAnswer: B\n"), [])
+        self.assertEqual(len(parser.feed("Q2. Second\n")), 1)
+        self.assertEqual(parser.feed("A. x\nB. y\nAnswer: A"), [])
+        self.assertEqual([q["correct_answer"] for q in parser.close()], [0])
+
+
+class QuizBatchTests(SimpleTestCase):
+
+    def test_dedupe_drops_near_identical_questions_and_keeps_order(self):
+        questions = [
+            question("Which keyword defines a function?", ("func", "def", "lambda", "fn")),
+            question("Which keyword defines a class?", ("class", "def", "struct", "type")),
+            question("which keyword DEFINES a function ?", ("func", "def", "lambda", "fn")),
+        ]
+        kept = dedupe_questions(questions)
+
+        self.assertEqual(kept, questions[:2])
+
+    def test_dedupe_compares_options_too(self):
+        first = question("Which value is truthy?", ("0", "''", "[]", "[0]"))
+        second = question("Which value is truthy?", ("None", "False", "{}", "'a'"))
+
+        self.assertEqual(len(dedupe_questions([first, second])), 2)
+
+    def test_dedupe_threshold(self):
+        questions = [
+            question("What is printed by print(1 + 1)?", ("1", "2", "11", "Error")),
+            question("What is printed by print(2 * 3)?", ("5", "6", "23", "Error")),
+        ]
+
+        self.assertEqual(len(dedupe_questions(questions)), 2)
+        self.assertEqual(len(dedupe_questions(questions, threshold=0.8)), 1)
+
+    def test_split_batches(self):
+        self.assertEqual(_split_batches(12, 5), [5, 5, 2])
+        self.assertEqual(_split_batches(5, 5), [5])
+        self.assertEqual(_split_batches(0, 5), [])
+
+
+class QuizGenerationTests(SimpleTestCase):
+
+    def setUp(self):
+        self.chain = mock.Mock()
+        patcher = mock.patch.object(agent_coach, "get_coach_chain", return_value=self.chain)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        env = mock.patch.dict("os.environ", {"AI_QUIZ_BATCH_SIZE": "2", "AI_QUIZ_MAX_PARALLEL": "3"})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def _batch_output(self, topic, num_questions, language):
+        # Each batch writes its own questions, plus one every batch repeats
+        set_number = topic.split("question set ")[1].split(" ")[0]
+        topics = {"1": "stable sort", "2": "key functions", "3": "reverse order"}
+        questions = [question(f"What is true about {topics[set_number]}?", (f"{topics[set_number]} {n}", "no", "maybe", "never"))
+                     for n in range(num_questions - 1)]
+        return quiz_text(questions + [question("What does sorted() return?", ("a list", "a tuple", "None", "a set"))])
+
+    @mock.patch.dict("os.environ", {"AI_QUIZ_TOPUP_RETRIES": "0"})
+    def test_large_quiz_is_generated_in_batches_merged_and_deduplicated(self):
+        self.chain.run.side_effect = self._batch_output
+
+        quiz = agent_coach._run_quiz_chain("sorting", 6, "en")
+
+        self.assertEqual(self.chain.run.call_count, 3)
+        texts = [q["question"] for q in quiz["questions"]]
+        self.assertEqual(texts.count("What does sorted() return?"), 1)
+        self.assertEqual(len(texts), 4)
+
+    def test_unreadable_batch_output_gives_no_questions(self):
+        self.chain.run.return_value = "Sorry, I can't write a quiz today."
+
+        self.assertEqual(agent_coach._run_quiz_batch("sorting", 2, "en"), [])
+
+    def test_model_errors_are_raised_to_the_caller(self):
+        self.chain.run.side_effect = ConnectionError("provider down")
+
+        with self.assertRaises(ConnectionError):
+            agent_coach._run_quiz_batch("sorting", 2, "en")
+        with self.assertRaises(ConnectionError):
+            agent_coach._run_quiz_chain("sorting", 6, "en")
+
+
+class QuizTopUpTests(SimpleTestCase):
+
+    def setUp(self):
+        self.chain = mock.Mock()
+        self.get_chain = self.enterContext(mock.patch.object(agent_coach, "get_coach_chain", return_value=self.chain))
+        self.enterContext(mock.patch.dict("os.environ", {"AI_QUIZ_BATCH_SIZE": "10", "AI_QUIZ_TOPUP_RETRIES": "2"}))
+
+    def test_short_quiz_asks_only_for_the_missing_questions(self):
+        first = [question("What does len() return?", ("a count", "a list", "None", "a str")),
+                 question("Which brackets make a list?", ("[]", "()", "{}", "<>"))]
+        malformed = "Q3. A question without options\n"
+        extra = [question("What does append() do?", ("adds an item", "sorts", "copies", "clears"))]
+        self.chain.run.side_effect = [quiz_text(first) + "\n" + malformed, quiz_text(extra)]
+
+        quiz = agent_coach._run_quiz_chain("lists", 3, "en")
+
+        self.assertEqual([q["question"] for q in quiz["questions"]], [q["question"] for q in first + extra])
+        top_up = self.chain.run.call_args_list[1].kwargs
+        self.assertEqual(top_up["num_questions"], 1)
+        self.assertIn("- What does len() return?", top_up["excluded_questions"])
+        self.assertEqual(self.get_chain.call_args_list[1].kwargs, {"with_exclusions": True})
+
+    def test_top_ups_are_bounded(self):
+        one = [question("What does len() return?", ("a count", "a list", "None", "a str"))]
+        self.chain.run.side_effect = [quiz_text(one)] + ["nothing usable"] * 5
+
+        quiz = agent_coach._run_quiz_chain("lists", 3, "en")
+
+        self.assertEqual(len(quiz["questions"]), 1)
+        self.assertEqual(self.chain.run.call_count, 3)
+
+    def test_no_top_up_when_nothing_was_accepted(self):
+        self.chain.run.return_value = "nothing usable"
+
+        self.assertIsNone(agent_coach._run_quiz_chain("lists", 3, "en"))
+        self.assertEqual(self.chain.run.call_count, 1)
+
+
+class StreamQuizTests(SimpleTestCase):
+
+    QUESTIONS = [
+        question("What does len() return?", ("a count", "a list", "None", "a str")),
+        question("Which brackets make a list?", ("[]", "()", "{}", "<>")),
+    ]
+
+    def setUp(self):
+        self.enterContext(temp_response_cache())
+        text = quiz_text(self.QUESTIONS)
+        self.chain = FakeChain(tokens=[text[i:i + 5] for i in range(0, len(text), 5)], result={'text': text})
+        self.enterContext(mock.patch.object(agent_coach, "get_coach_chain", return_value=self.chain))
+
+    def test_questions_are_yielded_then_served_from_the_cache(self):
+        streamed = list(agent_coach.stream_quiz("lists", 2, "en"))
+        cached = list(agent_coach.stream_quiz("lists", 2, "en"))
+
+        self.assertEqual([q["question"] for q in streamed], [q["question"] for q in self.QUESTIONS])
+        self.assertEqual(cached, streamed)
+        self.assertEqual(len(self.chain.calls), 1)
+
+
+class QuizBankTests(TestCase):
+
+    def setUp(self):
+        self.questions = [question(f"Question {i}?") for i in range(5)]
+        QuizBank.objects.create(topic="Lists", language="en", questions=self.questions)
+        self.orchestrator = AIOrchestrator(engine=mock.Mock())
+        self.orchestrator._user_language = lambda: "en"
+
+    def test_draw_picks_distinct_questions_of_the_bank(self):
+        drawn = QuizBank.draw("Lists", "en", 3)
+
+        self.assertEqual(len(drawn), 3)
+        self.assertEqual(len({q['question'] for q in drawn}), 3)
+        self.assertTrue(all(q in self.questions for q in drawn))
+
+    def test_no_draw_from_a_small_bank_or_another_language(self):
+        self.assertIsNone(QuizBank.draw("Lists", "en", 6))
+        self.assertIsNone(QuizBank.draw("Lists", "fr", 3))
+
+    def test_banked_quiz_is_ready_without_generation(self):
+        with mock.patch("apps.agents.agent_orchestrator.take_prefetched_quiz", return_value=None):
+            quiz = self.orchestrator.take_ready_quiz("Lists", 4)
+
+        self.assertEqual((len(quiz['questions']), quiz['language'], quiz['session_id']), (4, "en", None))
+        self.assertIsNone(self.orchestrator.take_ready_quiz("Tuples", 4))
+
+    def test_streamed_quiz_is_drawn_from_the_bank(self):
+        with mock.patch("apps.agents.agent_orchestrator.stream_quiz") as stream_quiz:
+            events = list(self.orchestrator.stream_quiz("Lists", 2))
+
+        stream_quiz.assert_not_called()
+        self.assertEqual([event for event, _ in events], ['question', 'question', 'done'])
+
+    def test_quiz_job_replaces_the_bank(self):
+        fresh = [question("Fresh question?")] * 20
+        job = mock.Mock(params={'topic': "Lists", 'language': "en", 'num_questions': 20, 'section': "python/lists"})
+
+        with mock.patch("apps.quiz.jobs.generate_quiz_questions", return_value={"questions": fresh}) as generate:
+            result = run_quiz_job(job)
+
+        generate.assert_called_once_with("Lists", 20, "en")
+        bank = QuizBank.objects.get(topic="Lists", language="en")
+        self.assertEqual((bank.questions, bank.section), (fresh, "python/lists"))
+        self.assertEqual(result, {'topic': "Lists", 'language': "en", 'bank_id': bank.id, 'questions': 20})
+
+
+class QuizStartViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="ada", email="ada@example.com", password="pw")
+
+    async def _start(self, quiz):
+        orchestrator = mock.Mock(take_ready_quiz=mock.Mock(return_value=quiz))
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        with mock.patch("apps.quiz.views.get_orchestrator", return_value=orchestrator):
+            response = await client.get(reverse("quiz:start"), {"topic": "lists", "num_questions": 2})
+        orchestrator.take_ready_quiz.assert_called_once_with("lists", 2)
+        return response
+
+    async def test_ready_quiz_is_served_with_the_page(self):
+        quiz = {"questions": [question("What does len() return?")], "language": "fr", "session_id": None}
+
+        response = await self._start(quiz)
+
+        self.assertEqual(response.context['ready_quiz'], quiz)
+        self.assertContains(response, 'id="quiz-ready"')
+        self.assertContains(response, "What does len() return?")
+
+    async def test_without_one_the_quiz_is_streamed(self):
+        response = await self._start(None)
+
+        self.assertIsNone(response.context['ready_quiz'])
+        self.assertContains(response, reverse("quiz:stream"))
+
+
+class QuizStreamViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="ada", email="ada@example.com", password="pw")
+
+    def setUp(self):
+        self.enterContext(temp_admission_controller())
+
+    async def _stream(self, events):
+        async def astream_quiz(topic, num_questions):
+            for event in events:
+                yield event
+
+        orchestrator = mock.Mock(astream_quiz=mock.Mock(side_effect=astream_quiz))
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        with mock.patch("apps.quiz.views.get_orchestrator", return_value=orchestrator):
+            response = await client.get(reverse("quiz:stream"), {"topic": "lists", "num_questions": 2})
+            return orchestrator, await aread_sse(response)
+
+    async def test_questions_are_sent_as_they_are_generated(self):
+        first = question("What does len() return?")
+        orchestrator, events = await self._stream([
+            ('question', first),
+            ('done', {'count': 1, 'topic': "lists", 'language': "fr", 'session_id': None}),
+        ])
+
+        self.assertEqual(events[0], ('question', first))
+        self.assertEqual(events[-1][0], 'done')
+        orchestrator.astream_quiz.assert_called_once_with("lists", 2)
+
+    async def test_errors_are_not_leaked_to_the_page(self):
+        _, events = await self._stream([('error', "Traceback: provider key invalid")])
+
+        self.assertEqual(events, [('error', {'error': "⚠️ No quiz could be generated."})])
@@ -6,6 +6,7 @@ app_name = 'quiz'
 urlpatterns = [
     path('lobby/', views.quiz_lobby, name='lobby'),
     path('start/', views.quiz_start, name='start'),
+    path('api/stream/', views.quiz_stream, name='stream'),
     path('submit/', views.submit_quiz, name='submit'),
     path('result/', views.quiz_result, name='result'),
     
@@ -1,9 +1,13 @@
 from django.shortcuts import render
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+from asgiref.sync import sync_to_async
 from apps.agents.agent_orchestrator import get_orchestrator
+from apps.agents.tools.streaming import format_sse
+from apps.agents.tools.admission import admission_controlled
 from .models import GameRoom, GameParticipant, GameQuestion, GameAnswer
 from django.shortcuts import get_object_or_404
 from django.contrib import messages
@@ -70,6 +74,7 @@ def create_room(request):
     return render(request, 'quiz/create_room.html')
 
 @login_required
+@admission_controlled(task="quiz", methods=("POST",))
 def start_multiplayer_game(request, room_code):
     """Start multiplayer game (host only)"""
     room = get_object_or_404(GameRoom, code=room_code)
@@ -363,32 +368,66 @@ def multiplayer_game(request, room_code):
     }
     
     return render(request, 'quiz/multiplayer_game.html', context)
-@login_required
-def quiz_start(request):
-    mode = request.GET.get('mode', 'solo')
-    topic = request.GET.get('topic', 'General Python')
-
-    # Generate quiz with AI
-    orchestrator = get_orchestrator(request.user)
+def _get_num_questions(request):
     try:
         num_questions = int(request.GET.get('num_questions', 10))
         if num_questions < 1 or num_questions > 50:
             num_questions = 10
     except (TypeError, ValueError):
         num_questions = 10
-        
-    result = orchestrator.create_quiz(topic, num_questions)
+    return num_questions
+
+@login_required
+async def quiz_start(request):
+    """
+    Renders the quiz page right away: questions are streamed by quiz_stream,
+    so question 1 is shown while the others are still being generated.
+    """
+    mode = request.GET.get('mode', 'solo')
+    topic = request.GET.get('topic', 'General Python')
+    num_questions = _get_num_questions(request)
 
-    # Check that questions were actually returned
-    quiz_data = result if result and "questions" in result and result["questions"] else None
+    # A quiz prefetched after a course view, or drawn from a pre-generated bank,
+    # is served with the page, without streaming
+    orchestrator = get_orchestrator(await request.auser())
+    ready_quiz = await sync_to_async(orchestrator.take_ready_quiz)(topic, num_questions)
 
     context = {
         'mode': mode,
         'topic': topic,
-        'quiz_data': quiz_data,
-        'error': None if quiz_data else "⚠️ No quiz could be generated."
+        'num_questions': num_questions,
+        'ready_quiz': ready_quiz,
     }
-    return render(request, 'quiz/quiz_start.html', context)
+    # The template reads request.user: render outside the event loop
+    return await sync_to_async(render)(request, 'quiz/quiz_start.html', context)
+
+@login_required
+@require_GET
+@admission_controlled(task="quiz")
+async def quiz_stream(request):
+    """
+    Quiz generation as Server-Sent Events:
+    one 'question' event per question as soon as it is parsed, then 'done' or 'error'.
+    Async: the batches stream on the event loop, no worker thread is held per quiz.
+    """
+    topic = request.GET.get('topic', 'General Python')
+    num_questions = _get_num_questions(request)
+    orchestrator = get_orchestrator(await request.auser())
+
+    async def events():
+        try:
+            async for event, payload in orchestrator.astream_quiz(topic, num_questions):
+                if event == 'error':
+                    payload = {'error': "⚠️ No quiz could be generated."}
+                yield format_sse(event, payload)
+        except Exception as e:
+            print(f"Error streaming quiz: {e}")
+            yield format_sse('error', {'error': "⚠️ No quiz could be generated."})
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
 
 @csrf_exempt
 @login_required
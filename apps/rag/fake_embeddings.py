@@ -0,0 +1,40 @@
+# apps/rag/fake_embeddings.py
+
+import hashlib
+import math
+import re
+from typing import List
+from langchain_core.embeddings import Embeddings
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Offline stand-in for the Ollama embeddings, for benchmarks and load tests.
+    Vectors are deterministic: each word is hashed to a dimension and a sign
+    (feature hashing), and the vector is normalized. Texts sharing words get
+    close vectors, so retrieval and the semantic cache behave plausibly.
+    Also usable as a Chroma embedding function (see __call__).
+    """
+
+    def __init__(self, dimensions=1024):
+        # mxbai-embed-large vectors have 1024 dimensions: same size as an index built with it
+        self.dimensions = dimensions
+
+    def _embed(self, text):
+        vector = [0.0] * self.dimensions
+        for word in re.findall(r"\w+", text.lower()) or [text]:
+            digest = hashlib.sha256(word.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "big") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def __call__(self, input):
+        # chromadb EmbeddingFunction protocol
+        return self.embed_documents(list(input))
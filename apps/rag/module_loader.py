@@ -151,6 +151,12 @@ class ModuleLoader:
         
         return description
     
+    def format_section_name(self, section_key: str) -> str:
+        """
+        Formats section name for display (also the topic of pre-generated content)
+        """
+        return section_key.replace('_', ' ').replace(section_key.split('_')[0] + '_', '').title()
+
     def get_module_sections(self, module_key: str) -> Dict[str, List[str]]:
         """
         Returns sections of a specific module
@@ -3,5 +3,7 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 def get_splitter(chunk_size=1000, chunk_overlap=200):
     return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap
+        chunk_overlap=chunk_overlap,
+        # Position of each chunk in its document, used to merge adjacent chunks at query time
+        add_start_index=True
     )
@@ -0,0 +1,103 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.agents.tools.circuit_breaker import CircuitBreaker, CircuitOpen
+from apps.rag import utils
+from apps.rag.fake_embeddings import FakeEmbeddings
+from apps.rag.splitter import get_splitter
+
+
+class SharedObjectsTests(SimpleTestCase):
+
+    def setUp(self):
+        utils.reset_vectorstore()
+        self.addCleanup(utils.reset_vectorstore)
+
+    def test_object_is_built_once(self):
+        calls = []
+        build = lambda: calls.append(1) or object()
+        self.assertIs(utils._get_shared("thing", build), utils._get_shared("thing", build))
+        self.assertEqual(len(calls), 1)
+
+    def test_factory_may_use_another_shared_object(self):
+        # The store factory needs the embeddings: the lock must be reentrant
+        inner = object()
+        outer = utils._get_shared("outer", lambda: (utils._get_shared("inner", lambda: inner),))
+        self.assertIs(outer[0], inner)
+
+
+class BreakerEmbeddingsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker("ollama", window=2, min_calls=2, open_seconds=60)
+        patcher = mock.patch.object(utils, "get_breaker", return_value=self.breaker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.inner = mock.Mock()
+        self.embeddings = utils.BreakerEmbeddings(self.inner, "ollama")
+
+    def test_calls_go_through_and_are_recorded(self):
+        self.inner.embed_query.return_value = [0.1, 0.2]
+
+        self.assertEqual(self.embeddings.embed_query("lists"), [0.1, 0.2])
+        self.assertEqual(self.breaker.stats()['calls'], 1)
+
+    def test_failures_open_the_circuit_and_later_calls_fail_fast(self):
+        self.inner.embed_query.side_effect = ConnectionError("ollama down")
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                self.embeddings.embed_query("lists")
+
+        with self.assertRaises(CircuitOpen):
+            self.embeddings.embed_query("lists")
+        self.assertEqual(self.inner.embed_query.call_count, 2)
+
+    async def test_async_calls_are_guarded_too(self):
+        self.inner.aembed_documents = mock.AsyncMock(return_value=[[0.1]])
+
+        self.assertEqual(await self.embeddings.aembed_documents(["lists"]), [[0.1]])
+        self.assertEqual(self.breaker.stats()['calls'], 1)
+
+
+class SplitterTests(SimpleTestCase):
+
+    def test_chunks_record_their_position_for_merging(self):
+        text = "Lists grow as needed. " * 20
+        chunks = get_splitter(chunk_size=200, chunk_overlap=50).create_documents([text])
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            start = chunk.metadata['start_index']
+            self.assertEqual(text[start:start + len(chunk.page_content)], chunk.page_content)
+
+
+class FakeEmbeddingsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.embeddings = FakeEmbeddings(dimensions=64)
+
+    def test_vectors_are_deterministic_and_normalized(self):
+        vector = self.embeddings.embed_query("Python lists are mutable")
+
+        self.assertEqual(vector, FakeEmbeddings(dimensions=64).embed_query("Python lists are mutable"))
+        self.assertEqual(len(vector), 64)
+        self.assertAlmostEqual(sum(value * value for value in vector), 1.0)
+
+    def test_texts_sharing_words_are_closer(self):
+        query, close, far = self.embeddings.embed_documents(
+            ["Python lists are mutable", "Are Python lists mutable?", "Dictionaries map keys to values"]
+        )
+        similarity = lambda a, b: sum(x * y for x, y in zip(a, b))
+
+        self.assertGreater(similarity(query, close), similarity(query, far))
+
+    def test_enabled_fake_embeddings_replace_ollama(self):
+        utils.reset_vectorstore()
+        self.addCleanup(utils.reset_vectorstore)
+        with mock.patch.dict("os.environ", {"AI_FAKE_EMBEDDINGS": "1", "AI_FAKE_EMBEDDINGS_DIM": "32"}):
+            embeddings = utils.load_embedding_function()
+
+        self.assertIsInstance(embeddings, FakeEmbeddings)
+        self.assertEqual(embeddings.dimensions, 32)
+
@@ -1,30 +1,141 @@
+import os
+import threading
+from langchain_core.embeddings import Embeddings
 from langchain_community.embeddings import OllamaEmbeddings
 from langchain_community.vectorstores import Chroma
 import chromadb
 from chromadb.utils import embedding_functions
+from apps.agents.tools.circuit_breaker import get_breaker
 
 
 
 CHROMA_PATH = "apps/rag/chroma"
+COLLECTION_NAME = "eduai_knowledge_base"
+
+_shared = {}
+# Reentrant: a factory may itself need a shared object (the store needs the embeddings)
+_shared_lock = threading.RLock()
+
+
+def _get_shared(name, factory):
+    """Builds a process-wide object once, on first use"""
+    obj = _shared.get(name)
+    if obj is None:
+        with _shared_lock:
+            obj = _shared.get(name)
+            if obj is None:
+                obj = factory()
+                _shared[name] = obj
+    return obj
+
+
+def is_fake_embeddings_enabled():
+    return os.getenv("AI_FAKE_EMBEDDINGS", "0") == "1"
+
+
+class BreakerEmbeddings(Embeddings):
+    """
+    Embeddings behind the circuit breaker of their provider (see circuit_breaker.py):
+    calls report their outcome to it and raise CircuitOpen while it is open,
+    so retrieval and the semantic cache fail fast when Ollama is down.
+    """
+
+    def __init__(self, embeddings, provider):
+        self.embeddings = embeddings
+        self.provider = provider
+
+    def _call(self, method, *args):
+        breaker = get_breaker(self.provider)
+        breaker.before_call()
+        try:
+            result = method(*args)
+        except Exception:
+            breaker.record(False)
+            raise
+        breaker.record(True)
+        return result
+
+    async def _acall(self, method, *args):
+        breaker = get_breaker(self.provider)
+        breaker.before_call()
+        try:
+            result = await method(*args)
+        except Exception:
+            breaker.record(False)
+            raise
+        breaker.record(True)
+        return result
+
+    def embed_documents(self, texts):
+        return self._call(self.embeddings.embed_documents, texts)
+
+    def embed_query(self, text):
+        return self._call(self.embeddings.embed_query, text)
+
+    async def aembed_documents(self, texts):
+        return await self._acall(self.embeddings.aembed_documents, texts)
+
+    async def aembed_query(self, text):
+        return await self._acall(self.embeddings.aembed_query, text)
+
+
+def _build_embeddings():
+    if is_fake_embeddings_enabled():
+        from apps.rag.fake_embeddings import FakeEmbeddings
+        print("🧪 Using fake embeddings")
+        return FakeEmbeddings(dimensions=int(os.getenv("AI_FAKE_EMBEDDINGS_DIM", "1024")))
+    return BreakerEmbeddings(OllamaEmbeddings(model="mxbai-embed-large"), "ollama")
+
 
 # === For LangChain (used in agent_researcher.py) ===
 def load_embedding_function():
-    return OllamaEmbeddings(model="mxbai-embed-large")
+    """
+    Shared embeddings: Ollama mxbai-embed-large behind the Ollama circuit breaker,
+    or the fake ones when AI_FAKE_EMBEDDINGS=1
+    """
+    return _get_shared("embeddings", _build_embeddings)
+
+def get_vectorstore():
+    """Shared LangChain Chroma store over the knowledge base"""
+    embeddings = load_embedding_function()
+    return _get_shared("vectorstore", lambda: Chroma(
+        persist_directory=CHROMA_PATH,
+        embedding_function=embeddings,
+        collection_name=COLLECTION_NAME
+    ))
+
+def reset_vectorstore():
+    """Forgets the shared store and embeddings (after a Chroma rebuild)"""
+    with _shared_lock:
+        _shared.clear()
+
+def get_index_version():
+    """
+    Version stamp of the Chroma index: modification time of its SQLite file.
+    Changes whenever the index is rebuilt or documents are added.
+    """
+    try:
+        return os.stat(os.path.join(CHROMA_PATH, "chroma.sqlite3")).st_mtime
+    except OSError:
+        return 0.0
 
 def get_chroma_collection_langchain():
     return Chroma(
         persist_directory=CHROMA_PATH,
-        collection_name="eduai_knowledge_base"
+        collection_name=COLLECTION_NAME
     )
 
 
 # === For native Chroma (used in prepare_chroma.py) ===
 def get_chroma_collection_native():
-    embedding_fn = embedding_functions.OllamaEmbeddingFunction(
-        model_name="mxbai-embed-large"
-    )
+    if is_fake_embeddings_enabled():
+        embedding_fn = load_embedding_function()
+    else:
+        embedding_fn = embedding_functions.OllamaEmbeddingFunction(
+            model_name="mxbai-embed-large"
+        )
     client = chromadb.PersistentClient(path=CHROMA_PATH)
     return client.get_or_create_collection(
-        name="eduai_knowledge_base",
+        name=COLLECTION_NAME,
         embedding_function=embedding_fn
-    )
\ No newline at end of file
+    )
@@ -17,13 +17,17 @@ django_asgi_app = get_asgi_application()
 
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
-from apps.quiz import routing
+from apps.quiz import routing as quiz_routing
+from apps.chat import routing as chat_routing
+from apps.agents import routing as agents_routing
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(
-            routing.websocket_urlpatterns
+            quiz_routing.websocket_urlpatterns
+            + chat_routing.websocket_urlpatterns
+            + agents_routing.websocket_urlpatterns
         )
     ),
 })
\ No newline at end of file
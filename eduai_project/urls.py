@@ -20,6 +20,7 @@ from django.views.i18n import set_language
 from django.shortcuts import redirect
 from django.conf import settings
 from django.conf.urls.static import static
+from apps.agents.views import metrics
 
 def redirect_to_login(request):
     """Redirects to default login page"""
@@ -45,6 +46,8 @@ urlpatterns = [
     path('chat/', include('apps.chat.urls')),
     path('tracker/', include('apps.tracker.urls')),
     path('exercises/', include('apps.exercises.urls')),
+    path('ai/', include('apps.agents.urls')),
+    path('metrics', metrics, name='metrics'),          # Prometheus scraping
 ]
 
 # Serve static and media files in development